@@ -1,37 +1,66 @@
+import asyncio
+import contextlib
 import functools
-import io
 import logging
-from typing import Any, Awaitable, Callable
+from typing import Any, AsyncIterator, Awaitable, Callable
 
-from jinja2 import Environment, FileSystemLoader, select_autoescape
 from starlette.applications import Starlette
-from starlette.background import BackgroundTask
 from starlette.datastructures import UploadFile
-from starlette.requests import Request
-from starlette.responses import FileResponse, HTMLResponse, RedirectResponse
-from starlette.routing import Mount, Route
-from starlette.staticfiles import StaticFiles
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.requests import HTTPConnection, Request
+from starlette.responses import (
+    FileResponse,
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    Response,
+)
+from starlette.routing import Mount, Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
 
+from ajolt import AsyncJolt
 from app import config
-from domain.llm_service import LLMService
-from domain.repository import RecipeVectorRepository
-from domain.services import create_recipe, search_recipes
+from app.caching import (
+    RECIPE_CACHE_CONTROL,
+    CachedStaticFiles,
+    conditional_html,
+    etag,
+    not_modified,
+)
+from app.middleware import MetricsMiddleware, limit_body
+from app.providers import Providers, job_handlers
+from app.templates import Templates
+from domain.events import DONE, EventHub
+from domain.images import ImageProcessor
+from domain.jobs import JobWorker
+from domain.metrics import REGISTRY, record_cache
+from domain.rendering import RENDERER
+from domain.search_cache import CachedSearch, SearchResultCache
+from domain.services import enqueue_create_recipe, search_summaries
+from domain.typeahead import PrefixIndex
 
 
 # https://www.youtube.com/watch?v=UfOQyurFHAo
 # https://www.youtube.com/watch?v=S1NRL9-xOdU
 
 
+logger = logging.getLogger(__name__)
+
+
 CONFIG = config.Config()
+JOB_POLL_INTERVAL = 2.0
+UPLOAD_READ_SIZE = 64 * 1024
+STARTUP_RETRY_MAX = 30.0
 
 
-# Async?
-# Looks like we cache stuff
-# Can always copy this, subclass BaseLoader, and make it do what I want.
-TEMPLATES = Environment(
-    loader=FileSystemLoader(CONFIG.html_dir),
-    autoescape=select_autoescape(),
-)
+# Templates only change on disk while developing locally.
+TEMPLATES = Templates(CONFIG.html_dir, auto_reload=CONFIG.env == config.Env.local)
+
+
+def providers(conn: HTTPConnection) -> Providers:
+    return conn.app.state.providers
 
 
 def aHTMLResponse(route: Callable[..., Awaitable[str | tuple[str, int]]]):
@@ -51,28 +80,77 @@ async def favicon(request: Request) -> FileResponse:
     return FileResponse(CONFIG.images_dir / "favicon.ico")
 
 
-@aHTMLResponse
-async def homepage(request: Request) -> str:
-    return TEMPLATES.get_template("index.html").render()
+async def homepage(request: Request) -> Response:
+    tag = etag("index.html", TEMPLATES.version)
+    if not_modified(request, tag):
+        return conditional_html(request, "", tag=tag)
+    html = await TEMPLATES.fragment("index.html", "index")
+    return conditional_html(request, html, tag=tag)
 
 
 @aHTMLResponse
 async def search(request: Request) -> str:
     content = request.query_params["content"]
     n = min(20, int(request.query_params.get("n") or 5))
-    recipes = await search_recipes(
+    if request.query_params.get("submitted"):
+        # Searches after a typing pause are often partial words.
+        typeahead: PrefixIndex = request.app.state.typeahead
+        typeahead.record_query(content)
+    cache: SearchResultCache = request.app.state.search_cache
+    await cache.sync()
+    cached = cache.get(content, n)
+    if cached is not None:
+        return cached.fragment
+    version = cache.version
+    built = providers(request)
+    recipes = await search_summaries(
         content,
-        repository=app.state.repo,
-        llm=app.state.llm,
+        repository=await built.repository(),
+        llm=await built.llm(),
         n=n,
+        lexical=await built.lexical(),
+    )
+    cards = await TEMPLATES.fragments_for("recipe-card.html", recipes)
+    html = await TEMPLATES.render("recipe-list.html", cards=cards)
+    cache.set(
+        content,
+        n,
+        CachedSearch(ids=[r.id for r in recipes], fragment=html),
+        version=version,
     )
-    return TEMPLATES.get_template("recipe-list.html").render(recipes=recipes)
+    return html
+
+
+@aHTMLResponse
+async def suggest(request: Request) -> str:
+    typeahead: PrefixIndex = request.app.state.typeahead
+    lexical = await providers(request).lexical()
+    if lexical is not None:
+        # Picking up recipes stored since the last lookup reads SQLite.
+        async with AsyncJolt():
+            await asyncio.to_thread(typeahead.update_names, lexical)
+    suggestions = typeahead.suggest(request.query_params.get("content", ""))
+    return await TEMPLATES.render("suggestions.html", suggestions=suggestions)
 
 
 @aHTMLResponse
 async def create_page(request: Request) -> str:
     description = request.query_params.get("description", "")
-    return TEMPLATES.get_template("create.html").render(description=description)
+    return await TEMPLATES.render("create.html", description=description)
+
+
+async def read_upload(upload: UploadFile, *, max_bytes: int) -> bytes:
+    """Read a parsed upload into memory, refusing it if it is over `max_bytes`.
+
+    The file has already been received by then. The request body as a whole is
+    capped while it is parsed, by `limit_body`.
+    """
+    data = bytearray()
+    while chunk := await upload.read(UPLOAD_READ_SIZE):
+        data += chunk
+        if len(data) > max_bytes:
+            raise HTTPException(status_code=413, detail="Image is too large.")
+    return bytes(data)
 
 
 async def create(request: Request) -> HTMLResponse | RedirectResponse:
@@ -80,9 +158,10 @@ async def create(request: Request) -> HTMLResponse | RedirectResponse:
         case "get":
             description = request.query_params.get("description", "")
             return HTMLResponse(
-                TEMPLATES.get_template("create.html").render(description=description)
+                await TEMPLATES.render("create.html", description=description)
             )
         case "post":
+            request = limit_body(request, max_bytes=CONFIG.max_upload_bytes)
             async with request.form() as form:
                 if "content" in form:
                     description = str(form.get("content", ""))
@@ -94,44 +173,217 @@ async def create(request: Request) -> HTMLResponse | RedirectResponse:
                     if image.size:
                         # Read these because otherwise trying to do stuff on a file
                         # handle that does not exist.
-                        image_files.append(await image.read())
+                        image_files.append(
+                            await read_upload(image, max_bytes=CONFIG.max_image_bytes)
+                        )
 
-            repo: RecipeVectorRepository = request.app.state.repo
-            llm: LLMService = request.app.state.llm
-            task = BackgroundTask(
-                create_recipe,
+            images: ImageProcessor = request.app.state.images
+            try:
+                image_files = await images.prepare(image_files)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e)) from e
+            job_id = await enqueue_create_recipe(
                 description=description,
-                images=[io.BytesIO(i) for i in image_files],
-                repository=repo,
-                llm=llm,
+                images=image_files,
+                queue=await providers(request).jobs(),
+                max_attempts=CONFIG.job_max_attempts,
             )
-            return RedirectResponse("/", status_code=303, background=task)
+            return RedirectResponse(f"/jobs/{job_id}", status_code=303)
         case _:
             raise ValueError("Unsupported method.")
 
 
-@aHTMLResponse
-async def recipe_detail(request: Request) -> str:
+async def recipe_detail(request: Request) -> Response:
     id = request.path_params["id"]
-    repo: RecipeVectorRepository = request.app.state.repo
+    # Recipes never change, so a revalidation needs no lookup at all.
+    tag = etag("recipe-detail.html", id, TEMPLATES.version)
+    cache_control = RECIPE_CACHE_CONTROL
+    if not_modified(request, tag):
+        return conditional_html(request, "", tag=tag, cache_control=cache_control)
+    repo = await providers(request).repository()
     recipe = await repo.get(id)
-    return TEMPLATES.get_template("recipe-detail.html").render(recipe=recipe)
+    html = await TEMPLATES.fragment("recipe-detail.html", id, recipe=recipe)
+    return conditional_html(request, html, tag=tag, cache_control=cache_control)
+
+
+async def job_detail(request: Request) -> HTMLResponse | JSONResponse:
+    queue = await providers(request).jobs()
+    job = await queue.get(request.path_params["id"])
+    if job is None:
+        raise HTTPException(status_code=404)
+    if "application/json" in request.headers.get("accept", ""):
+        return JSONResponse(job.to_dict())
+    return HTMLResponse(await TEMPLATES.render("job-detail.html", job=job))
+
+
+async def job_events(websocket: WebSocket) -> None:
+    """Push a job's progress and recipe text to the page as htmx oob swaps.
+
+    Events come from workers in this process. The job is also polled, so jobs
+    run by a separate worker process still finish on the page.
+    """
+    id = websocket.path_params["id"]
+    queue = await providers(websocket).jobs()
+    events: EventHub = websocket.app.state.events
+    await websocket.accept()
+    subscription = events.subscribe(id)
+    try:
+        while True:
+            event = await subscription.get(timeout=JOB_POLL_INTERVAL)
+            if event is None:
+                job = await queue.get(id)
+                if job is None:
+                    break
+                if job.done:
+                    html = await TEMPLATES.render("job.html", job=job, oob=True)
+                    await websocket.send_text(html)
+                    break
+                continue
+            html = await TEMPLATES.render("job-event.html", event=event)
+            await websocket.send_text(html)
+            if event.kind == DONE:
+                break
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
+
+
+async def metrics(request: Request) -> PlainTextResponse:
+    """Prometheus text exposition of the process's metrics."""
+    search_cache: SearchResultCache = request.app.state.search_cache
+    record_cache("search", hits=search_cache.hits, misses=search_cache.misses)
+    record_cache("render", hits=RENDERER.hits, misses=RENDERER.misses)
+    fragments = TEMPLATES.fragments
+    record_cache("fragment", hits=fragments.hits, misses=fragments.misses)
+    images: ImageProcessor = request.app.state.images
+    record_cache("image", hits=images.hits, misses=images.misses)
+    llm = providers(request).peek("llm")
+    if llm is not None and llm.embedding_cache is not None:
+        embedding_cache = llm.embedding_cache
+        record_cache(
+            "embedding", hits=embedding_cache.hits, misses=embedding_cache.misses
+        )
+    if llm is not None and llm.content_cache is not None:
+        content_cache = llm.content_cache
+        # A revalidated page is served from the cache too.
+        record_cache(
+            "content",
+            hits=content_cache.hits + content_cache.revalidations,
+            misses=content_cache.misses,
+        )
+    return PlainTextResponse(
+        REGISTRY.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+async def live(request: Request) -> PlainTextResponse:
+    """Liveness: the process is up and serving."""
+    return PlainTextResponse("ok")
+
+
+async def ready(request: Request) -> PlainTextResponse:
+    """Readiness: every provider is built and the job worker is running."""
+    startup: asyncio.Task[None] = request.app.state.startup
+    if not startup.done() or startup.cancelled():
+        return PlainTextResponse("starting", status_code=503)
+    if startup.exception() is not None:
+        return PlainTextResponse("failed", status_code=503)
+    return PlainTextResponse("ready")
+
+
+def startup_done(task: asyncio.Task[None]) -> None:
+    # Building providers is retried inside `start`, so this is anything after
+    # it, such as setting up the job worker, and is not going to fix itself.
+    if not task.cancelled() and (error := task.exception()) is not None:
+        logger.error("Startup failed.", exc_info=error)
+
+
+async def start(app: Starlette) -> None:
+    """Build everything in the background, retrying until it all succeeds."""
+    async with AsyncJolt():
+        await asyncio.to_thread(TEMPLATES.precompile)
+    built: Providers = app.state.providers
+    delay = 1.0
+    while True:
+        try:
+            await built.warm()
+            break
+        except Exception:
+            logger.exception("Startup failed, retrying in %.0fs.", delay)
+            await asyncio.sleep(delay)
+            delay = min(STARTUP_RETRY_MAX, delay * 2)
+    if CONFIG.job_workers:
+        queue = await built.jobs()
+        app.state.worker = JobWorker(
+            queue,
+            job_handlers(
+                queue=queue,
+                repository=await built.repository(),
+                llm=await built.llm(),
+                search_cache=app.state.search_cache,
+                lexical=await built.lexical(),
+                structured=CONFIG.structured_creation,
+                events=app.state.events,
+            ),
+            concurrency=CONFIG.job_workers,
+        )
+        app.state.worker.start()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette) -> AsyncIterator[None]:
+    # Nothing slow happens before serving, so the app starts in well under a
+    # second; requests that arrive early wait for what they need to be built.
+    app.state.providers = Providers(CONFIG)
+    app.state.worker = None
+    app.state.startup = asyncio.create_task(start(app))
+    app.state.startup.add_done_callback(startup_done)
+    try:
+        yield
+    finally:
+        app.state.startup.cancel()
+        # A startup failure has already been logged by `startup_done`.
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await app.state.startup
+        worker: JobWorker | None = app.state.worker
+        if worker is not None:
+            await worker.stop()
+        await app.state.providers.aclose()
+        app.state.images.close()
+        app.state.search_cache.close()
 
 
 app = Starlette(
     debug=True if CONFIG.env == config.Env.local else False,
+    lifespan=lifespan,
+    middleware=[Middleware(MetricsMiddleware)],
     routes=[
         Route("/", homepage),
         Route("/create", create, methods=["GET", "POST"]),
         Route("/recipes/", search),
+        Route("/recipes/suggest", suggest),
         Route("/recipes/{id}", recipe_detail),
+        Route("/jobs/{id}", job_detail),
+        WebSocketRoute("/jobs/{id}/ws", job_events),
         Route("/favicon.ico", favicon),
-        Mount("/assets", StaticFiles(directory="assets")),
+        Route("/metrics", metrics),
+        Route("/healthz", live),
+        Route("/readyz", ready),
+        Mount("/assets", CachedStaticFiles(directory="assets")),
     ],
 )
 
-app.state.llm = LLMService()
-app.state.repo = RecipeVectorRepository()
+app.state.search_cache = SearchResultCache(
+    max_entries=CONFIG.search_cache_size,
+    ttl=CONFIG.search_cache_ttl,
+    path=CONFIG.search_cache_path,
+)
+app.state.events = EventHub()
+app.state.typeahead = PrefixIndex()
+app.state.images = ImageProcessor(max_workers=CONFIG.image_workers)
 
 
 logging.basicConfig(level="INFO")
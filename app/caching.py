@@ -0,0 +1,66 @@
+import hashlib
+import os
+
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+
+# Pages are revalidated on every view, which is a 304 when nothing changed.
+PAGE_CACHE_CONTROL = "no-cache"
+# Recipes never change, so their pages can be reused for a while unasked.
+RECIPE_CACHE_CONTROL = "public, max-age=3600"
+STATIC_CACHE_CONTROL = "public, max-age=86400"
+
+
+def etag(*parts: str) -> str:
+    digest = hashlib.blake2b("\0".join(parts).encode(), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def not_modified(request: Request, tag: str) -> bool:
+    """Whether the client's `If-None-Match` already names `tag`."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return tag in (t.strip().removeprefix("W/") for t in if_none_match.split(","))
+
+
+def conditional_html(
+    request: Request,
+    html: str,
+    *,
+    tag: str,
+    cache_control: str = PAGE_CACHE_CONTROL,
+) -> Response:
+    headers = {"etag": tag, "cache-control": cache_control}
+    if not_modified(request, tag):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(html, headers=headers)
+
+
+class CachedStaticFiles(StaticFiles):
+    """`StaticFiles`, which already answers 304s, telling browsers to cache."""
+
+    def __init__(
+        self,
+        *args: object,
+        cache_control: str = STATIC_CACHE_CONTROL,
+        **kwargs: object,
+    ) -> None:
+        super().__init__(*args, **kwargs)  # pyright: ignore[reportArgumentType]
+        self.cache_control = cache_control
+
+    def file_response(
+        self,
+        full_path: str | os.PathLike[str],
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["cache-control"] = self.cache_control
+        return response
@@ -10,8 +10,67 @@ class Env(Enum):
     prod = "prod"
 
 
+class VectorBackend(Enum):
+    pinecone = "pinecone"
+    local = "local"
+    memory = "memory"
+
+
+class LLMBackend(Enum):
+    openai = "openai"
+    fake = "fake"
+
+
+class Quantization(Enum):
+    none = "none"
+    int8 = "int8"
+    pq = "pq"
+
+
 class Config(BaseSettings):
     env: Env = Env.local
     html_dir: Path = Path("assets/html")
     images_dir: Path = Path("assets/img")
     initial_search: str = "Warming winter stew"
+    llm_backend: LLMBackend = LLMBackend.openai
+    fake_llm_latency: float = 0.0
+    embedding_cache_size: int = 10_000
+    embedding_cache_ttl: float | None = None
+    embedding_cache_path: Path | None = None
+    embedding_cache_disk_size: int = 100_000
+    embedding_batch_window: float | None = 0.005
+    content_cache_path: Path | None = Path(".colunch/content.db")
+    content_cache_bytes: int = 256 * 1024 * 1024
+    content_cache_ttl: float | None = 24 * 60 * 60
+    vector_backend: VectorBackend = VectorBackend.pinecone
+    local_index_path: Path | None = Path(".colunch/index")
+    summary_store_path: Path | None = Path(".colunch/summaries.db")
+    # The lexical index only holds recipes stored since it was enabled, and
+    # queries it can answer alone skip the vector search, so only enable it
+    # when every recipe has been stored through it.
+    hybrid_search: bool = False
+    lexical_index_path: Path | None = Path(".colunch/lexical.db")
+    ann_nlist: int | None = None
+    ann_nprobe: int = 16
+    quantization: Quantization = Quantization.none
+    pq_subspaces: int = 96
+    rerank_factor: int = 4
+    search_cache_size: int = 1024
+    search_cache_ttl: float | None = 300
+    search_cache_path: Path | None = Path(".colunch/search.db")
+    job_queue_path: Path | None = Path(".colunch/jobs.db")
+    job_workers: int = 2
+    job_max_attempts: int = 3
+    image_workers: int = 2
+    max_image_bytes: int = 20 * 1024 * 1024
+    max_upload_bytes: int = 64 * 1024 * 1024
+    structured_creation: bool = False
+    http2: bool = True
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30
+    openai_chat_concurrency: int = 16
+    openai_embeddings_concurrency: int = 8
+    openai_audio_concurrency: int = 4
+    openai_interactive_reserve: int = 2
+    openai_max_retries: int = 5
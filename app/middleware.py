@@ -0,0 +1,66 @@
+import time
+
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from domain.metrics import REQUEST_SECONDS
+
+
+class MetricsMiddleware:
+    """Time each HTTP request into `REQUEST_SECONDS`.
+
+    Requests are labelled by route template, not path, so `/recipes/{id}` is
+    one series however many recipes there are.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(scope.get("route"), "path", "unmatched"),
+                status=status,
+            )
+
+
+def limit_body(request: Request, *, max_bytes: int) -> Request:
+    """`request`, refused with a 413 as soon as its body passes `max_bytes`.
+
+    A declared Content-Length is checked up front, and the bytes are counted as
+    they arrive otherwise, so an oversized upload is refused while it is being
+    parsed rather than after it has been spooled to disk.
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise HTTPException(status_code=413, detail="Upload is too large.")
+    received = 0
+
+    async def receive() -> Message:
+        nonlocal received
+        message = await request.receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise HTTPException(status_code=413, detail="Upload is too large.")
+        return message
+
+    return Request(request.scope, receive)
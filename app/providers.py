@@ -0,0 +1,227 @@
+import asyncio
+import functools
+import logging
+from typing import TYPE_CHECKING, Any, Callable, TypeVar
+
+from ajolt import AsyncJolt
+from app import config
+from domain.content_cache import ContentCache
+from domain.events import EventHub
+from domain.jobs import JobHandler, JobQueue
+from domain.lexical import LexicalIndex
+from domain.rate_limit import RateLimits
+from domain.repository import RecipeRepository, RecipeVectorRepository
+from domain.search_cache import SearchResultCache
+from domain.summary_store import SummaryStore
+from domain.services import CREATE_RECIPE_JOB, run_create_recipe_job
+
+
+if TYPE_CHECKING:
+    # These import the OpenAI SDK or numpy, which are slow, so the factories
+    # import them.
+    from domain.clients import ClientRegistry
+    from domain.embedding_cache import EmbeddingCache
+    from domain.llm_service import LLMService
+    from domain.vectors import VectorCodec
+
+
+logger = logging.getLogger(__name__)
+
+
+T = TypeVar("T")
+
+
+def clients_factory(conf: config.Config) -> "ClientRegistry":
+    from domain.clients import ClientRegistry
+
+    return ClientRegistry(
+        http2=conf.http2,
+        max_connections=conf.http_max_connections,
+        max_keepalive_connections=conf.http_max_keepalive_connections,
+        keepalive_expiry=conf.http_keepalive_expiry,
+        rate_limits=RateLimits(
+            chat=conf.openai_chat_concurrency,
+            embeddings=conf.openai_embeddings_concurrency,
+            audio=conf.openai_audio_concurrency,
+            reserve=conf.openai_interactive_reserve,
+            max_retries=conf.openai_max_retries,
+        ),
+    )
+
+
+def embedding_cache_factory(conf: config.Config) -> "EmbeddingCache":
+    from domain.embedding_cache import (
+        EmbeddingCache,
+        MemoryEmbeddingStore,
+        SqliteEmbeddingStore,
+    )
+
+    return EmbeddingCache(
+        memory=MemoryEmbeddingStore(
+            max_entries=conf.embedding_cache_size,
+            ttl=conf.embedding_cache_ttl,
+        ),
+        disk=(
+            None
+            if conf.embedding_cache_path is None
+            else SqliteEmbeddingStore(
+                conf.embedding_cache_path,
+                max_entries=conf.embedding_cache_disk_size,
+                ttl=conf.embedding_cache_ttl,
+            )
+        ),
+    )
+
+
+def llm_factory(conf: config.Config, clients: "ClientRegistry") -> "LLMService":
+    from domain.llm_service import LLMService
+
+    if conf.llm_backend == config.LLMBackend.fake:
+        from domain.fakes import FakeLLMService
+
+        return FakeLLMService(
+            latency=conf.fake_llm_latency,
+            embedding_cache=embedding_cache_factory(conf),
+        )
+    return LLMService(
+        openai_client=clients.openai,
+        http_client=clients.openai_http,
+        web_client=clients.web,
+        content_cache=ContentCache(
+            conf.content_cache_path,
+            max_bytes=conf.content_cache_bytes,
+            ttl=conf.content_cache_ttl,
+        ),
+        embedding_cache=embedding_cache_factory(conf),
+        embedding_batch_window=conf.embedding_batch_window,
+    )
+
+
+def lexical_factory(conf: config.Config) -> LexicalIndex | None:
+    return LexicalIndex(conf.lexical_index_path) if conf.hybrid_search else None
+
+
+def codec_factory(conf: config.Config) -> "VectorCodec | None":
+    from domain.vectors import Int8Codec, ProductQuantizer
+
+    match conf.quantization:
+        case config.Quantization.none:
+            return None
+        case config.Quantization.int8:
+            return Int8Codec()
+        case config.Quantization.pq:
+            return ProductQuantizer(m=conf.pq_subspaces)
+
+
+def repository_factory(conf: config.Config) -> RecipeRepository:
+    match conf.vector_backend:
+        case config.VectorBackend.pinecone:
+            return RecipeVectorRepository(
+                summaries=SummaryStore(conf.summary_store_path)
+            )
+        case config.VectorBackend.local:
+            from domain.ann import IVFIndex
+            from domain.local_repository import LocalRecipeVectorRepository
+
+            return LocalRecipeVectorRepository(
+                conf.local_index_path,
+                ann=(
+                    None
+                    if conf.ann_nlist is None
+                    else IVFIndex(nlist=conf.ann_nlist, nprobe=conf.ann_nprobe)
+                ),
+                codec=codec_factory(conf),
+                rerank_factor=conf.rerank_factor,
+            )
+        case config.VectorBackend.memory:
+            from domain.fakes import InMemoryRecipeVectorRepository
+
+            return InMemoryRecipeVectorRepository()
+
+
+def job_handlers(
+    *,
+    queue: JobQueue,
+    repository: RecipeRepository,
+    llm: "LLMService",
+    search_cache: SearchResultCache | None = None,
+    lexical: LexicalIndex | None = None,
+    structured: bool = False,
+    events: EventHub | None = None,
+) -> dict[str, JobHandler]:
+    return {
+        CREATE_RECIPE_JOB: functools.partial(
+            run_create_recipe_job,
+            queue=queue,
+            repository=repository,
+            llm=llm,
+            search_cache=search_cache,
+            lexical=lexical,
+            structured=structured,
+            events=events,
+        ),
+    }
+
+
+class Providers:
+    """Builds the app's clients, stores and services on first use.
+
+    Importing and connecting happen off the event loop and only when something
+    needs them, so the app serves health checks straight away. A failed build,
+    such as a network blip looking up the Pinecone index, raises to the caller
+    and is tried again by the next one rather than killing the worker.
+    """
+
+    def __init__(self, conf: config.Config) -> None:
+        self.conf = conf
+        self._built: dict[str, Any] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def _get(self, name: str, build: Callable[[], T]) -> T:
+        if name not in self._built:
+            async with self._locks.setdefault(name, asyncio.Lock()):
+                if name not in self._built:
+                    async with AsyncJolt():
+                        self._built[name] = await asyncio.to_thread(build)
+                    logger.info("Built %s.", name)
+        return self._built[name]
+
+    def peek(self, name: str) -> Any | None:
+        """What has been built as `name` so far, without building it."""
+        return self._built.get(name)
+
+    async def clients(self) -> "ClientRegistry":
+        return await self._get("clients", lambda: clients_factory(self.conf))
+
+    async def llm(self) -> "LLMService":
+        clients = await self.clients()
+        return await self._get("llm", lambda: llm_factory(self.conf, clients))
+
+    async def repository(self) -> RecipeRepository:
+        return await self._get("repository", lambda: repository_factory(self.conf))
+
+    async def lexical(self) -> LexicalIndex | None:
+        return await self._get("lexical", lambda: lexical_factory(self.conf))
+
+    async def jobs(self) -> JobQueue:
+        return await self._get("jobs", lambda: JobQueue(self.conf.job_queue_path))
+
+    @property
+    def ready(self) -> bool:
+        names = ("clients", "llm", "repository", "lexical", "jobs")
+        return all(name in self._built for name in names)
+
+    async def warm(self) -> None:
+        await asyncio.gather(self.llm(), self.repository(), self.lexical(), self.jobs())
+
+    async def aclose(self) -> None:
+        """Close everything built so far, the HTTP clients last."""
+        for name in ("llm", "repository", "lexical", "jobs"):
+            built = self.peek(name)
+            if built is not None:
+                # Closing the local repository flushes its vectors to disk.
+                async with AsyncJolt():
+                    await asyncio.to_thread(built.close)
+        clients: ClientRegistry | None = self.peek("clients")
+        if clients is not None:
+            await clients.aclose()
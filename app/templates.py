@@ -0,0 +1,127 @@
+from collections import OrderedDict
+import hashlib
+from pathlib import Path
+from typing import Any, Hashable, Iterable
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """Bounded LRU of rendered HTML fragments.
+
+    Only for fragments of things that never change once stored, such as a
+    recipe's card or page, so entries are never invalidated, only evicted.
+    """
+
+    def __init__(self, *, max_entries: int = 2048) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, Markup] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Markup | None:
+        html = self._entries.get(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return html
+
+    def set(self, key: Hashable, html: Markup) -> None:
+        self._entries[key] = html
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class Templates:
+    """Async Jinja rendering with every template compiled up front.
+
+    Without `auto_reload` templates are compiled once, by `precompile`, and
+    never checked for changes again. `version` is a hash of the template
+    sources, which keys the fragment cache and ETags, so a deploy that changes
+    a template never serves pages rendered with the old one. With
+    `auto_reload` it is only recomputed when a template's mtime or size changes.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        auto_reload: bool = False,
+        fragments: FragmentCache | None = None,
+    ) -> None:
+        self.directory = directory
+        self.auto_reload = auto_reload
+        self.fragments = FragmentCache() if fragments is None else fragments
+        self.loader = FileSystemLoader(directory)
+        self.env = Environment(
+            loader=self.loader,
+            autoescape=select_autoescape(),
+            enable_async=True,
+            auto_reload=auto_reload,
+            # Keep every template; there are only a handful.
+            cache_size=-1,
+        )
+        self._version: str | None = None
+        self._stamps: list[tuple[str, int, int]] = []
+
+    def _stat(self) -> list[tuple[str, int, int]]:
+        stamps: list[tuple[str, int, int]] = []
+        for name in self.env.list_templates():
+            stat = (self.directory / name).stat()
+            stamps.append((name, stat.st_mtime_ns, stat.st_size))
+        return stamps
+
+    @property
+    def version(self) -> str:
+        if self.auto_reload:
+            # Only re-read and re-hash the sources when a file has changed.
+            stamps = self._stat()
+            if stamps != self._stamps:
+                self._stamps = stamps
+                self._version = None
+        if self._version is None:
+            digest = hashlib.blake2b(digest_size=8)
+            for name in self.env.list_templates():
+                source, _, _ = self.loader.get_source(self.env, name)
+                digest.update(name.encode())
+                digest.update(source.encode())
+            self._version = digest.hexdigest()
+        return self._version
+
+    def precompile(self) -> None:
+        for name in self.env.list_templates():
+            self.env.get_template(name)
+        self._version = None
+
+    async def render(self, name: str, **context: Any) -> str:
+        return await self.env.get_template(name).render_async(**context)
+
+    async def fragment(self, name: str, key: Hashable, **context: Any) -> Markup:
+        """Render `name`, or reuse the HTML last rendered for `key` with it."""
+        cache_key = (name, key, self.version)
+        html = self.fragments.get(cache_key)
+        if html is None:
+            html = Markup(await self.render(name, **context))
+            self.fragments.set(cache_key, html)
+        return html
+
+    async def fragments_for(
+        self,
+        name: str,
+        items: Iterable[Any],
+        *,
+        key: str = "id",
+        variable: str = "recipe",
+    ) -> list[Markup]:
+        """One cached fragment per item, keyed by its `key` attribute."""
+        return [
+            await self.fragment(name, getattr(item, key), **{variable: item})
+            for item in items
+        ]
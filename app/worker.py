@@ -0,0 +1,59 @@
+"""Standalone job worker, for running recipe creation apart from the web app.
+
+    python -m app.worker
+
+Set `JOB_WORKERS=0` on the web service so only this process claims jobs.
+Both processes must share `SEARCH_CACHE_PATH`, which is how recipes stored
+here invalidate the web service's search cache.
+"""
+
+import asyncio
+import logging
+
+from app import config
+from app.providers import (
+    clients_factory,
+    job_handlers,
+    lexical_factory,
+    llm_factory,
+    repository_factory,
+)
+from domain.jobs import JobQueue, JobWorker
+from domain.search_cache import SearchResultCache
+
+
+async def main() -> None:
+    conf = config.Config()
+    queue = JobQueue(conf.job_queue_path)
+    # Only used to bump the shared version, it never holds results here.
+    search_cache = SearchResultCache(max_entries=0, path=conf.search_cache_path)
+    repository = repository_factory(conf)
+    lexical = lexical_factory(conf)
+    async with clients_factory(conf) as clients:
+        llm = llm_factory(conf, clients)
+        worker = JobWorker(
+            queue,
+            job_handlers(
+                queue=queue,
+                repository=repository,
+                llm=llm,
+                search_cache=search_cache,
+                lexical=lexical,
+                structured=conf.structured_creation,
+            ),
+            concurrency=max(1, conf.job_workers),
+        )
+        try:
+            await worker.run()
+        finally:
+            llm.close()
+            repository.close()
+            if lexical is not None:
+                lexical.close()
+            queue.close()
+            search_cache.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO")
+    asyncio.run(main())
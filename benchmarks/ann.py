@@ -0,0 +1,96 @@
+"""Recall@k against queries-per-second for the IVF index versus exact search.
+
+    python -m benchmarks.ann --n 200000 --nlist 1024 --nprobe 4 8 16 32 64
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import numpy.typing as npt
+
+from domain.ann import IVFIndex
+
+
+def synthetic(
+    n: int,
+    dim: int,
+    *,
+    clusters: int,
+    rng: np.random.Generator,
+) -> npt.NDArray[np.float32]:
+    centres = rng.standard_normal((clusters, dim), dtype=np.float32)
+    data = centres[rng.integers(clusters, size=n)]
+    data += 0.5 * rng.standard_normal((n, dim), dtype=np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data
+
+
+def exact(
+    queries: npt.NDArray[np.float32],
+    vectors: npt.NDArray[np.float32],
+    k: int,
+) -> list[set[int]]:
+    truth: list[set[int]] = []
+    for q in queries:
+        scores = vectors @ q
+        truth.append(set(np.argpartition(-scores, k - 1)[:k].tolist()))
+    return truth
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--nlist", type=int, default=512)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = synthetic(args.n, args.dim, clusters=args.clusters, rng=rng)
+    queries = synthetic(args.queries, args.dim, clusters=args.clusters, rng=rng)
+
+    start = time.perf_counter()
+    truth = exact(queries, vectors, args.k)
+    exact_qps = args.queries / (time.perf_counter() - start)
+
+    index = IVFIndex(nlist=args.nlist, seed=args.seed)
+    start = time.perf_counter()
+    index.train(vectors)
+    train_seconds = time.perf_counter() - start
+
+    results = []
+    for nprobe in args.nprobe:
+        hits = 0
+        start = time.perf_counter()
+        for q, expected in zip(queries, truth):
+            rows, _ = index.search(q, vectors, n=args.k, nprobe=nprobe)
+            hits += len(expected & set(rows.tolist()))
+        elapsed = time.perf_counter() - start
+        results.append(
+            {
+                "nprobe": nprobe,
+                "recall_at_k": hits / (args.k * args.queries),
+                "qps": args.queries / elapsed,
+            }
+        )
+
+    report = {
+        "n": args.n,
+        "dim": args.dim,
+        "k": args.k,
+        "nlist": args.nlist,
+        "train_seconds": train_seconds,
+        "exact_qps": exact_qps,
+        "ivf": results,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
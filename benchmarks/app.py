@@ -0,0 +1,327 @@
+"""Throughput and latency of the ASGI app against fake LLM and vector backends.
+
+    python -m benchmarks.app --recipes 10000 --output report.json
+    python -m benchmarks.app --baseline report.json --tolerance 0.2
+
+Runs offline: the LLM is a `FakeLLMService` that sleeps `--latency` seconds per
+call and the vectors live in memory, unless VECTOR_BACKEND says otherwise.
+Reports are flat JSON. Metrics ending `_qps` are better higher and those ending
+`_seconds` or `_bytes` better lower, which is how `--baseline` finds
+regressions. Must be run from the repository root.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+
+WORDS = (
+    "beef chicken tofu lentil bean tomato potato onion garlic ginger chilli "
+    "lemon lime basil thyme rosemary mushroom spinach pepper aubergine rice "
+    "noodle pasta bread pastry cheese cream butter yoghurt coconut curry stew "
+    "soup salad roast bake pie tart cake crumble risotto lasagne chowder"
+).split()
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_metrics(prefix: str, latencies: list[float], elapsed: float) -> dict:
+    return {
+        f"{prefix}_qps": len(latencies) / elapsed,
+        f"{prefix}_p50_seconds": percentile(latencies, 0.5),
+        f"{prefix}_p95_seconds": percentile(latencies, 0.95),
+        f"{prefix}_p99_seconds": percentile(latencies, 0.99),
+    }
+
+
+async def drive(
+    requests: list[Callable[[], Awaitable[None]]],
+    *,
+    concurrency: int,
+) -> tuple[list[float], float]:
+    """Run `requests` with at most `concurrency` in flight; time each one."""
+    latencies: list[float] = []
+    pending = iter(requests)
+
+    async def worker() -> None:
+        for request in pending:
+            start = time.perf_counter()
+            await request()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+def phrase(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_recipes(n: int, rng: random.Random) -> list[Any]:
+    from domain.models import Recipe
+    from domain.rendering import render_markdown
+
+    recipes: list[Recipe] = []
+    for i in range(n):
+        name = phrase(rng, 3).title()
+        content = (
+            f"# {name}\n\n## Ingredients\n\n"
+            + "\n".join(f"- {w}" for w in phrase(rng, 8).split())
+            + "\n\n## Method\n\n1. Cook.\n"
+        )
+        recipes.append(
+            Recipe(
+                id=f"bench-{i}",
+                name=name,
+                summary=phrase(rng, 12),
+                content=content,
+                rendered_html=render_markdown(content),
+            )
+        )
+    return recipes
+
+
+async def warm_caches(app: Any, n: int, *, seed: int) -> None:
+    """Embed and render the recipes `seed_recipes` will store.
+
+    This fills the fake LLM's token vectors and the embedding and render
+    caches, so they do not count towards the memory of storing recipes.
+    """
+    llm = await app.state.providers.llm()
+    for recipe in make_recipes(n, random.Random(seed)):
+        await llm.embeddings(recipe)
+
+
+async def seed_recipes(app: Any, n: int, *, seed: int) -> list[str]:
+    from domain.services import store_recipe
+
+    providers = app.state.providers
+    ids: list[str] = []
+    for recipe in make_recipes(n, random.Random(seed)):
+        await store_recipe(
+            recipe,
+            repository=await providers.repository(),
+            llm=await providers.llm(),
+            lexical=await providers.lexical(),
+        )
+        ids.append(recipe.id)
+    return ids
+
+
+async def bench_search(
+    client: httpx.AsyncClient,
+    rng: random.Random,
+    *,
+    queries: int,
+    concurrency: int,
+) -> dict:
+    async def search(content: str) -> None:
+        resp = await client.get("/recipes/", params={"content": content, "n": 5})
+        resp.raise_for_status()
+
+    metrics: dict = {}
+    # Unique queries miss the search cache; a small repeated set hits it.
+    cold = [phrase(rng, rng.randint(1, 5)) + f" {i}" for i in range(queries)]
+    warm = [phrase(rng, 2) for _ in range(10)]
+    for name, contents in (
+        ("search_cold", cold),
+        ("search_warm", [warm[i % len(warm)] for i in range(queries)]),
+    ):
+        latencies, elapsed = await drive(
+            [lambda c=c: search(c) for c in contents], concurrency=concurrency
+        )
+        metrics.update(latency_metrics(name, latencies, elapsed))
+    return metrics
+
+
+async def bench_detail(
+    client: httpx.AsyncClient,
+    ids: list[str],
+    rng: random.Random,
+    *,
+    requests: int,
+    concurrency: int,
+) -> dict:
+    async def detail(id: str) -> None:
+        resp = await client.get(f"/recipes/{id}")
+        resp.raise_for_status()
+
+    latencies, elapsed = await drive(
+        [lambda id=rng.choice(ids): detail(id) for _ in range(requests)],
+        concurrency=concurrency,
+    )
+    return latency_metrics("detail", latencies, elapsed)
+
+
+async def bench_create(
+    client: httpx.AsyncClient,
+    rng: random.Random,
+    *,
+    jobs: int,
+    concurrency: int,
+) -> dict:
+    async def create(description: str) -> None:
+        resp = await client.post("/create", data={"description": description})
+        location = resp.headers["location"]
+        while True:
+            resp = await client.get(location, headers={"accept": "application/json"})
+            status = resp.json()["status"]
+            if status == "failed":
+                raise RuntimeError(f"Job failed: {resp.json()['error']}")
+            if status == "succeeded":
+                return
+            await asyncio.sleep(0.005)
+
+    descriptions = [phrase(rng, 6) for _ in range(jobs)]
+    latencies, elapsed = await drive(
+        [lambda d=d: create(d) for d in descriptions], concurrency=concurrency
+    )
+    return latency_metrics("create", latencies, elapsed)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from app.app import app
+
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = random.Random(args.seed)
+    metrics: dict = {"recipes": args.recipes}
+    async with app.router.lifespan_context(app):
+        await warm_caches(app, args.recipes, seed=args.seed)
+        gc.collect()
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        ids = await seed_recipes(app, args.recipes, seed=args.seed)
+        seed_seconds = time.perf_counter() - start
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # The recipes and what the repository and lexical index keep for them.
+        # Python and numpy allocations only; SQLite's own cache is not traced.
+        metrics["memory_per_10k_recipes_bytes"] = (after - before) / args.recipes * 1e4
+        metrics["seed_per_recipe_seconds"] = seed_seconds / args.recipes
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            metrics.update(
+                await bench_search(
+                    client, rng, queries=args.searches, concurrency=args.concurrency
+                )
+            )
+            metrics.update(
+                await bench_detail(
+                    client,
+                    ids,
+                    rng,
+                    requests=args.details,
+                    concurrency=args.concurrency,
+                )
+            )
+            metrics.update(
+                await bench_create(
+                    client, rng, jobs=args.creations, concurrency=args.concurrency
+                )
+            )
+    return metrics
+
+
+def regressions(
+    metrics: dict[str, float],
+    baseline: dict[str, float],
+    *,
+    tolerance: float,
+) -> list[str]:
+    found: list[str] = []
+    for name, value in metrics.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        change = (value - old) / old
+        if name.endswith("_qps"):
+            change = -change
+        elif not name.endswith(("_seconds", "_bytes")):
+            continue
+        if change > tolerance:
+            found.append(f"{name}: {old:.6g} -> {value:.6g} ({change:+.0%} worse)")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--recipes", type=int, default=10_000)
+    parser.add_argument("--searches", type=int, default=500)
+    parser.add_argument("--details", type=int, default=500)
+    parser.add_argument("--creations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="colunch-bench-"))
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    os.environ.setdefault("VECTOR_BACKEND", "memory")
+    os.environ["FAKE_LLM_LATENCY"] = str(args.latency)
+    # Room for every seeded recipe, so none is embedded again while measured.
+    os.environ.setdefault("EMBEDDING_CACHE_SIZE", str(args.recipes))
+    # The OpenAI client is still built, though the fake never uses it.
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+    for name, file in (
+        ("LOCAL_INDEX_PATH", "index"),
+        ("SUMMARY_STORE_PATH", "summaries.db"),
+        ("LEXICAL_INDEX_PATH", "lexical.db"),
+        ("CONTENT_CACHE_PATH", "content.db"),
+        ("JOB_QUEUE_PATH", "jobs.db"),
+        ("SEARCH_CACHE_PATH", "search.db"),
+    ):
+        os.environ[name] = str(workdir / file)
+
+    metrics = asyncio.run(run(args))
+    report = {
+        "benchmark": "app",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "llm_backend": os.environ["LLM_BACKEND"],
+        "vector_backend": os.environ["VECTOR_BACKEND"],
+        "params": {k: str(v) for k, v in vars(args).items()},
+        "metrics": metrics,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(text)
+    print(text)
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())["metrics"]
+        found = regressions(metrics, baseline, tolerance=args.tolerance)
+        for line in found:
+            print(f"Regression: {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
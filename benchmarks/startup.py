@@ -0,0 +1,151 @@
+"""Cold-start time of the ASGI app: importing it, starting it and becoming ready.
+
+    python -m benchmarks.startup --runs 10 --output report.json
+    python -m benchmarks.startup --baseline report.json --tolerance 0.2
+
+Each run is a fresh interpreter, as a new container or worker would be, so
+nothing is already imported. `import` is `import app.app`, `startup` until the
+lifespan has started, which is when uvicorn starts accepting connections, and
+`ready` until /readyz answers 200, all from interpreter start. What the app
+imports directly is listed by cumulative import time, from
+`python -X importtime`. Runs offline against the fake LLM and in-memory
+vectors, unless LLM_BACKEND or VECTOR_BACKEND say otherwise. Must be run from
+the repository root.
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.app import regressions
+
+
+CHILD = """
+import asyncio, json, logging, time
+start = time.perf_counter()
+from app.app import app
+imported = time.perf_counter()
+
+async def run():
+    import httpx
+
+    logging.getLogger().setLevel(logging.WARNING)
+    async with app.router.lifespan_context(app):
+        started = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://s") as c:
+            while (await c.get("/readyz")).status_code != 200:
+                await asyncio.sleep(0.005)
+        ready = time.perf_counter()
+    print(json.dumps({
+        "import_seconds": imported - start,
+        "startup_seconds": started - start,
+        "ready_seconds": ready - start,
+    }))
+
+asyncio.run(run())
+"""
+IMPORTTIME_PATTERN = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)")
+
+
+def run_once() -> dict[str, float]:
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        capture_output=True,
+        text=True,
+        check=True,
+        timeout=120,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(n: int) -> list[tuple[str, float]]:
+    """What `app.app` imports directly, by cumulative import time."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.app"],
+        capture_output=True,
+        text=True,
+        check=True,
+        timeout=120,
+    )
+    # A module's imports are listed, one level deeper, just before it.
+    children: list[tuple[str, float]] = []
+    for match in IMPORTTIME_PATTERN.finditer(result.stderr):
+        cumulative, indent, name = match.groups()
+        if len(indent) == 3:
+            children.append((name, int(cumulative) / 1e6))
+        elif len(indent) == 1:
+            if name == "app.app":
+                return sorted(children, key=lambda item: -item[1])[:n]
+            children = []
+    return []
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="colunch-startup-"))
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    os.environ.setdefault("VECTOR_BACKEND", "memory")
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+    os.environ.setdefault("JOB_WORKERS", "0")
+    for name, file in (
+        ("LOCAL_INDEX_PATH", "index"),
+        ("SUMMARY_STORE_PATH", "summaries.db"),
+        ("LEXICAL_INDEX_PATH", "lexical.db"),
+        ("CONTENT_CACHE_PATH", "content.db"),
+        ("JOB_QUEUE_PATH", "jobs.db"),
+        ("SEARCH_CACHE_PATH", "search.db"),
+    ):
+        os.environ[name] = str(workdir / file)
+
+    # The first run warms the OS file cache, as a restarted worker would find it.
+    run_once()
+    runs = [run_once() for _ in range(args.runs)]
+    metrics: dict[str, float] = {}
+    for name in runs[0]:
+        values = [run[name] for run in runs]
+        stem = name.removesuffix("_seconds")
+        metrics[f"{stem}_median_seconds"] = statistics.median(values)
+        metrics[f"{stem}_max_seconds"] = max(values)
+    report = {
+        "benchmark": "startup",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "llm_backend": os.environ["LLM_BACKEND"],
+        "vector_backend": os.environ["VECTOR_BACKEND"],
+        "params": {k: str(v) for k, v in vars(args).items()},
+        "metrics": metrics,
+        "slowest_imports": dict(slowest_imports(args.top)),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(text)
+    print(text)
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())["metrics"]
+        found = regressions(metrics, baseline, tolerance=args.tolerance)
+        for line in found:
+            print(f"Regression: {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
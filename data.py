@@ -1,32 +1,108 @@
 import asyncio
 import logging
-from pathlib import Path
-import uuid
 
-import bs4
 import httpx
-from pytube import YouTube  # pyright: ignore[reportMissingTypeStubs]
 
 from ajolt import AsyncJolt
+from domain.content_cache import ContentCache
+from domain.extraction import decode_html, extract_text
+from domain.metrics import FETCHED_BYTES, traced
 
 
 logger = logging.getLogger(__name__)
 
 
-async def text_from_webpage(url: str) -> str:
-    resp = await httpx.AsyncClient(timeout=20).get(url)
-    resp.raise_for_status
-    text = resp.text
-    soup = bs4.BeautifulSoup(text, features="html.parser")
-    return soup.text
+# Recipe pages are rarely more than a few hundred KiB; anything past this is
+# not worth downloading, let alone sending to the model.
+MAX_PAGE_BYTES = 2 * 1024 * 1024
 
 
-async def audio_from_youtube_url(
+def page_text(body: bytes, *, content_type: str, encoding: str | None) -> str:
+    textual = content_type.startswith("text/") or "html" in content_type
+    if content_type and not textual:
+        raise ValueError(f"Unsupported content type {content_type!r}.")
+    text = decode_html(body, encoding)
+    # Plenty of servers label HTML as text/plain.
+    if "html" in content_type or text.lstrip()[:1] == "<":
+        return extract_text(text)
+    return text
+
+
+async def fetch_page(
+    url: str,
+    *,
+    http_client: httpx.AsyncClient,
+    headers: dict[str, str] | None = None,
+    max_bytes: int = MAX_PAGE_BYTES,
+) -> tuple[httpx.Response, bytes]:
+    """Stream at most `max_bytes` of a page's body.
+
+    A 304 is returned with an empty body; other error statuses raise.
+    """
+    body = bytearray()
+    async with http_client.stream("GET", url, headers=headers) as resp:
+        if resp.status_code == 304:
+            return resp, b""
+        resp.raise_for_status()
+        async for chunk in resp.aiter_bytes():
+            body += chunk[: max_bytes - len(body)]
+            if len(body) >= max_bytes:
+                logger.info("Truncated %s at %s bytes.", url, max_bytes)
+                break
+    FETCHED_BYTES.inc(len(body), source="webpage")
+    return resp, bytes(body)
+
+
+async def _page_text(resp: httpx.Response, body: bytes) -> str:
+    content_type = resp.headers.get("content-type", "").split(";")[0].strip().lower()
+    async with AsyncJolt():
+        return await asyncio.to_thread(
+            page_text,
+            body,
+            content_type=content_type,
+            encoding=resp.charset_encoding,
+        )
+
+
+@traced("fetch")
+async def text_from_webpage(
     url: str,
-    base_path: Path | None = None,
-) -> Path:
+    *,
+    http_client: httpx.AsyncClient,
+    cache: ContentCache | None = None,
+) -> str:
+    if cache is None:
+        resp, body = await fetch_page(url, http_client=http_client)
+        return await _page_text(resp, body)
+
+    async with cache.lock(url):
+        cached = await cache.get(url)
+        if cached is not None and cache.is_fresh(cached):
+            return cached.text
+        headers = {} if cached is None else cached.validators()
+        resp, body = await fetch_page(url, http_client=http_client, headers=headers)
+        if resp.status_code == 304:
+            if cached is None:
+                raise ValueError(f"Unexpected 304 for {url}.")
+            await cache.refresh(url)
+            return cached.text
+        text = await _page_text(resp, body)
+        await cache.set(
+            url,
+            text,
+            etag=resp.headers.get("etag"),
+            last_modified=resp.headers.get("last-modified"),
+        )
+        return text
+
+
+@traced("fetch")
+async def audio_url_from_youtube_url(url: str) -> str:
+    """The URL of a video's audio-only stream, for ffmpeg to read directly."""
+    # Imported here, as it is slow and only videos need it.
+    from pytube import YouTube  # pyright: ignore[reportMissingTypeStubs]
+
     logger.info(url)
-    base_path = Path("/tmp") if base_path is None else base_path
     yt = YouTube(url)
 
     logger.info("Getting audio")
@@ -35,11 +111,4 @@ async def audio_from_youtube_url(
 
     if not audio:
         raise ValueError("No audio.")
-
-    audio_path = base_path / f"{uuid.uuid4().hex}.mp4"
-
-    async with AsyncJolt():
-        await asyncio.to_thread(audio.download, filename=str(audio_path))
-
-    logger.info("Got audio.")
-    return audio_path
+    return audio.url
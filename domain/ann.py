@@ -0,0 +1,205 @@
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+
+ASSIGN_CHUNK = 4096
+
+
+def nearest_centroids(
+    data: npt.NDArray[np.float32],
+    centroids: npt.NDArray[np.float32],
+    *,
+    spherical: bool = True,
+) -> npt.NDArray[np.int32]:
+    # For unnormalized data, argmin |x - c|^2 is argmax x.c - |c|^2 / 2.
+    bias = 0 if spherical else 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(data), dtype=np.int32)
+    for i in range(0, len(data), ASSIGN_CHUNK):
+        labels[i : i + ASSIGN_CHUNK] = np.argmax(
+            data[i : i + ASSIGN_CHUNK] @ centroids.T - bias, axis=1
+        )
+    return labels
+
+
+def kmeans(
+    data: npt.NDArray[np.float32],
+    k: int,
+    *,
+    iterations: int = 20,
+    seed: int = 0,
+    spherical: bool = True,
+) -> npt.NDArray[np.float32]:
+    """K-means over the rows of `data`.
+
+    Spherical k-means expects L2-normalized rows and returns normalized centroids,
+    otherwise centroids are plain Euclidean means.
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = nearest_centroids(data, centroids, spherical=spherical)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        counts = np.bincount(labels, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+            counts[empty] = 1
+        if spherical:
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = (sums / np.where(norms == 0, 1, norms)).astype(np.float32)
+        else:
+            centroids = (sums / counts[:, None]).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index with a k-means coarse quantizer.
+
+    The index only stores row numbers, vectors stay in the caller's matrix.
+    A search scores the `nprobe` closest centroids and then only the rows in
+    those lists, so raising `nprobe` trades latency for recall.
+    """
+
+    def __init__(
+        self,
+        *,
+        nlist: int = 1024,
+        nprobe: int = 16,
+        train_factor: int = 39,
+        max_train_size: int = 256 * 1024,
+        seed: int = 0,
+    ) -> None:
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_factor = train_factor
+        self.max_train_size = max_train_size
+        self.seed = seed
+        self.centroids: npt.NDArray[np.float32] | None = None
+        self.trained_on = 0
+        self._labels = np.full(0, -1, dtype=np.int32)
+        self._lists: list[list[int]] = []
+        self._arrays: dict[int, npt.NDArray[np.int64]] = {}
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._labels >= 0))
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def needs_training(self, count: int) -> bool:
+        if self.centroids is None:
+            return count >= self.train_factor * self.nlist
+        return count >= 4 * self.trained_on
+
+    def fit(
+        self,
+        vectors: npt.NDArray[np.float32],
+    ) -> tuple[npt.NDArray[np.float32], npt.NDArray[np.int32]]:
+        """Compute centroids and labels for `vectors` without changing the index."""
+        rng = np.random.default_rng(self.seed)
+        sample = vectors
+        if len(vectors) > self.max_train_size:
+            idx = rng.choice(len(vectors), self.max_train_size, replace=False)
+            sample = vectors[np.sort(idx)]
+        centroids = kmeans(np.asarray(sample), self.nlist, seed=self.seed)
+        return centroids, nearest_centroids(np.asarray(vectors), centroids)
+
+    def install(
+        self,
+        centroids: npt.NDArray[np.float32],
+        labels: npt.NDArray[np.int32],
+    ) -> None:
+        """Replace the quantizer and lists with the output of `fit`."""
+        self.centroids = centroids
+        self.trained_on = len(labels)
+        self._set_labels(labels)
+
+    def train(self, vectors: npt.NDArray[np.float32]) -> None:
+        """Fit the coarse quantizer on `vectors` and assign every row to a list."""
+        self.install(*self.fit(vectors))
+
+    def _set_labels(self, labels: npt.NDArray[np.int32]) -> None:
+        assert self.centroids is not None
+        self._labels = labels
+        self._lists = [[] for _ in range(len(self.centroids))]
+        self._arrays = {}
+        for row, label in enumerate(labels.tolist()):
+            if label >= 0:
+                self._lists[label].append(row)
+
+    def add(self, rows: list[int], vectors: npt.NDArray[np.float32]) -> None:
+        if self.centroids is None:
+            return
+        labels = nearest_centroids(vectors.reshape(len(rows), -1), self.centroids)
+        if max(rows) >= len(self._labels):
+            grown = np.full(max(2 * len(self._labels), max(rows) + 1), -1, np.int32)
+            grown[: len(self._labels)] = self._labels
+            self._labels = grown
+        for row, label in zip(rows, labels.tolist()):
+            previous = int(self._labels[row])
+            if previous >= 0:
+                self._lists[previous].remove(row)
+                self._arrays.pop(previous, None)
+            self._labels[row] = label
+            self._lists[label].append(row)
+            self._arrays.pop(label, None)
+
+    def _list_array(self, label: int) -> npt.NDArray[np.int64]:
+        arr = self._arrays.get(label)
+        if arr is None:
+            arr = np.fromiter(self._lists[label], dtype=np.int64)
+            self._arrays[label] = arr
+        return arr
+
+    def candidates(
+        self,
+        query: npt.NDArray[np.float32],
+        *,
+        nprobe: int | None = None,
+    ) -> npt.NDArray[np.int64]:
+        if self.centroids is None:
+            raise ValueError("Index is not trained.")
+        nprobe = min(self.nprobe if nprobe is None else nprobe, len(self.centroids))
+        sims = self.centroids @ query
+        probe = np.argpartition(-sims, nprobe - 1)[:nprobe]
+        return np.concatenate([self._list_array(int(i)) for i in probe])
+
+    def search(
+        self,
+        query: npt.NDArray[np.float32],
+        vectors: npt.NDArray[np.float32],
+        *,
+        n: int = 3,
+        nprobe: int | None = None,
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float32]]:
+        rows = self.candidates(query, nprobe=nprobe)
+        if not len(rows) or n <= 0:
+            return rows[:0], np.empty(0, dtype=np.float32)
+        scores = vectors[rows] @ query
+        k = min(n, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+
+    def save(self, path: Path) -> None:
+        if self.centroids is None:
+            return
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                labels=self._labels,
+                trained_on=np.int64(self.trained_on),
+            )
+
+    def load(self, path: Path) -> None:
+        with np.load(path) as data:
+            self.centroids = data["centroids"]
+            self.trained_on = int(data["trained_on"])
+            labels = data["labels"]
+        self._set_labels(labels)
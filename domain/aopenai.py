@@ -3,6 +3,8 @@ import os
 import httpx
 import openai
 
+from domain.metrics import record_usage
+
 
 OPENAI_TOKEN = os.environ.get("OPENAI_API_KEY")
 MAX_TOKENS = 3000
@@ -10,30 +12,40 @@ TIMEOUT = 60 * 2
 DEFAULT_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4-turbo-preview")
 
 
-def openai_client_factory(token: str | None = None) -> httpx.AsyncClient:
+def openai_client_factory(
+    token: str | None = None,
+    *,
+    http2: bool = False,
+    limits: httpx.Limits | None = None,
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> httpx.AsyncClient:
+    """With a `transport`, it is used as is and `http2` and `limits` are ignored."""
     token = OPENAI_TOKEN if token is None else token
     return httpx.AsyncClient(
         base_url="https://api.openai.com/v1/",
         headers={
-            "Authorization": f"Bearer {OPENAI_TOKEN}",
+            "Authorization": f"Bearer {token}",
             "Content-Type": "application/json",
             "OpenAI-Beta": "assistants=v1",
         },
         timeout=TIMEOUT,
+        http2=http2,
+        limits=httpx.Limits() if limits is None else limits,
+        transport=transport,
     )
 
 
 async def quick_chat(
     msg: str,
     *,
-    openai_client: openai.AsyncClient | None = None,
+    openai_client: openai.AsyncClient,
     model: str | None = None,
 ) -> str:
-    openai_client = openai.AsyncClient() if openai_client is None else openai_client
     model = DEFAULT_MODEL if model is None else model
     resp = await openai_client.chat.completions.create(
         model=DEFAULT_MODEL,
         messages=[{"role": "user", "content": msg}],
     )
+    record_usage(resp.usage, model=resp.model)
     ans = resp.choices[0].message.content or ""
     return ans.strip()
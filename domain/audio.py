@@ -0,0 +1,183 @@
+import asyncio
+import contextlib
+import io
+import logging
+from typing import AsyncGenerator, Awaitable, Callable, TypeVar
+import wave
+
+import numpy as np
+import numpy.typing as npt
+
+
+logger = logging.getLogger(__name__)
+
+
+T = TypeVar("T")
+
+SAMPLE_RATE = 16_000
+# 16 kHz mono 16-bit WAV is 32 KB/s, so a chunk is about 7.7 MB, well under
+# the 25 MB Whisper upload limit.
+CHUNK_SECONDS = 240.0
+# Chunks are cut at the quietest moment in this many seconds before the target.
+SILENCE_SEARCH_SECONDS = 10.0
+SILENCE_FRAME_SECONDS = 0.25
+MIN_CHUNK_SECONDS = 0.5
+MAX_PARALLEL = 4
+READ_SIZE = 64 * 1024
+
+Samples = npt.NDArray[np.int16]
+
+
+class PcmChunker:
+    """Splits a stream of 16-bit mono PCM into chunks of about `chunk_seconds`.
+
+    Each chunk ends at the quietest frame of the last `search_seconds` before
+    its target length, so cuts fall between words where there is a pause.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate: int = SAMPLE_RATE,
+        chunk_seconds: float = CHUNK_SECONDS,
+        search_seconds: float = SILENCE_SEARCH_SECONDS,
+        frame_seconds: float = SILENCE_FRAME_SECONDS,
+    ) -> None:
+        self.rate = rate
+        self.chunk_samples = int(chunk_seconds * rate)
+        self.frame_samples = max(1, int(frame_seconds * rate))
+        search = int(min(search_seconds, chunk_seconds / 2) * rate)
+        self.search_samples = max(1, search // self.frame_samples) * self.frame_samples
+        self._pending = bytearray()
+
+    def _cut(self, samples: Samples) -> int:
+        window = samples[-self.search_samples :].astype(np.float32)
+        frames = window.reshape(-1, self.frame_samples)
+        quietest = int(np.argmin(np.mean(frames * frames, axis=1)))
+        start = len(samples) - self.search_samples
+        return start + quietest * self.frame_samples + self.frame_samples // 2
+
+    def feed(self, data: bytes) -> list[Samples]:
+        """Add PCM bytes and return any chunks that are now complete."""
+        self._pending += data
+        chunks: list[Samples] = []
+        size = self.chunk_samples * 2
+        while len(self._pending) >= size:
+            samples = np.frombuffer(
+                bytes(self._pending[:size]), dtype="<i2", count=self.chunk_samples
+            )
+            cut = self._cut(samples)
+            chunks.append(samples[:cut])
+            del self._pending[: cut * 2]
+        return chunks
+
+    def flush(self) -> Samples | None:
+        """The remaining audio, unless it is too short to be worth sending."""
+        count = len(self._pending) // 2
+        samples = np.frombuffer(bytes(self._pending[: count * 2]), dtype="<i2")
+        self._pending = bytearray()
+        if count < MIN_CHUNK_SECONDS * self.rate:
+            return None
+        return samples
+
+
+def wav_bytes(samples: Samples, *, rate: int = SAMPLE_RATE) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+async def decode_pcm(
+    source: str,
+    *,
+    rate: int = SAMPLE_RATE,
+) -> AsyncGenerator[bytes, None]:
+    """Decode an audio or video URL or path to mono PCM with ffmpeg.
+
+    ffmpeg streams the source itself, so decoding starts with the first bytes
+    downloaded and nothing is written to disk.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-i",
+        source,
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(rate),
+        "-f",
+        "s16le",
+        "pipe:1",
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    assert proc.stdout is not None and proc.stderr is not None
+    try:
+        while data := await proc.stdout.read(READ_SIZE):
+            yield data
+        stderr = await proc.stderr.read()
+        if await proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace')}")
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+
+async def wav_chunks(
+    pcm: AsyncGenerator[bytes, None],
+    *,
+    rate: int = SAMPLE_RATE,
+    chunk_seconds: float = CHUNK_SECONDS,
+) -> AsyncGenerator[bytes, None]:
+    """Re-chunk a PCM stream into silence-aligned in-memory WAV files."""
+    chunker = PcmChunker(rate=rate, chunk_seconds=chunk_seconds)
+    async with contextlib.aclosing(pcm):
+        async for data in pcm:
+            for samples in chunker.feed(data):
+                yield wav_bytes(samples, rate=rate)
+    if (samples := chunker.flush()) is not None:
+        yield wav_bytes(samples, rate=rate)
+
+
+async def map_ordered(
+    items: AsyncGenerator[bytes, None],
+    fn: Callable[[int, bytes], Awaitable[T]],
+    *,
+    max_parallel: int = MAX_PARALLEL,
+) -> list[T]:
+    """Apply `fn` to items as they arrive, `max_parallel` at a time, in order.
+
+    Waiting for a free slot stops `items` being consumed, so at most
+    `max_parallel` items are held in memory however long the stream is.
+    """
+    slots = asyncio.Semaphore(max_parallel)
+    tasks: list[asyncio.Task[T]] = []
+
+    async def run(i: int, item: bytes) -> T:
+        try:
+            return await fn(i, item)
+        finally:
+            slots.release()
+
+    try:
+        async with contextlib.aclosing(items):
+            async for item in items:
+                await slots.acquire()
+                tasks.append(asyncio.create_task(run(len(tasks), item)))
+                if any(t.done() and t.exception() is not None for t in tasks):
+                    break
+        return list(await asyncio.gather(*tasks))
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
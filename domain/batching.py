@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Generic, Sequence, TypeVar
+
+
+logger = logging.getLogger(__name__)
+
+
+T = TypeVar("T")
+
+
+class Coalescer(Generic[T]):
+    """Merges concurrent single-item requests into batched upstream calls.
+
+    Items submitted within `window` seconds of the first pending item are sent
+    to `fn` together, deduplicated, and each caller receives its own result.
+    A batch is flushed early once `max_batch` distinct items are pending.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[list[str]], Awaitable[Sequence[T]]],
+        *,
+        window: float = 0.005,
+        max_batch: int = 256,
+    ) -> None:
+        self.fn = fn
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.items = 0
+        self._pending: dict[str, list[asyncio.Future[T]]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def submit(self, item: str) -> T:
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future[T] = loop.create_future()
+        self._pending.setdefault(item, []).append(fut)
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict[str, list[asyncio.Future[T]]]) -> None:
+        items = list(batch)
+        self.batches += 1
+        self.items += sum(len(futs) for futs in batch.values())
+        logger.debug("Flushing batch of %s items.", len(items))
+        try:
+            results = await self.fn(items)
+            if len(results) != len(items):
+                raise ValueError(f"Expected {len(items)} results, got {len(results)}.")
+        except Exception as e:
+            for futs in batch.values():
+                for fut in futs:
+                    if not fut.done():
+                        fut.set_exception(e)
+            return
+        for item, result in zip(items, results):
+            for fut in batch[item]:
+                if not fut.done():
+                    fut.set_result(result)
@@ -0,0 +1,73 @@
+from typing import Any
+
+import httpx
+import openai
+
+from domain.aopenai import TIMEOUT, openai_client_factory
+from domain.rate_limit import RateLimitedTransport, RateLimits
+
+
+WEB_TIMEOUT = 20
+
+
+class ClientRegistry:
+    """Owns the pooled HTTP clients shared by every outbound call.
+
+    `web` fetches arbitrary pages, `openai_http` makes raw OpenAI API calls and
+    `openai` is the SDK client. Each keeps its connections alive between
+    requests and is closed by `aclose`, normally from the app's lifespan.
+    With `rate_limits` both OpenAI clients share one `RateLimitedTransport`,
+    which does the retrying, so the SDK's own retries are turned off.
+    """
+
+    def __init__(
+        self,
+        *,
+        http2: bool = True,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30,
+        rate_limits: RateLimits | None = None,
+    ) -> None:
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.web = httpx.AsyncClient(
+            http2=http2,
+            limits=limits,
+            timeout=WEB_TIMEOUT,
+            follow_redirects=True,
+        )
+        self.rate_limits = rate_limits
+        transport = (
+            None
+            if rate_limits is None
+            else RateLimitedTransport(
+                httpx.AsyncHTTPTransport(http2=http2, limits=limits), rate_limits
+            )
+        )
+        self.openai_http = openai_client_factory(
+            http2=http2, limits=limits, transport=transport
+        )
+        self._openai_transport = httpx.AsyncClient(
+            http2=http2, limits=limits, timeout=TIMEOUT, transport=transport
+        )
+        self.openai = openai.AsyncClient(
+            http_client=self._openai_transport,
+            max_retries=0 if rate_limits is not None else openai.DEFAULT_MAX_RETRIES,
+        )
+
+    async def aclose(self) -> None:
+        # The SDK closes `_openai_transport` itself. Both OpenAI clients then
+        # close the shared `RateLimitedTransport`, which only closes once.
+        await self.openai.close()
+        await self.openai_http.aclose()
+        await self.web.aclose()
+
+    async def __aenter__(self) -> "ClientRegistry":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.aclose()
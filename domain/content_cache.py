@@ -0,0 +1,208 @@
+import asyncio
+from dataclasses import dataclass
+import logging
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+import weakref
+
+from ajolt import AsyncJolt
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_url(url: str) -> str:
+    """Drop the fragment and lowercase the scheme and host."""
+    parts = urlsplit(url.strip())
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, "")
+    )
+
+
+@dataclass(frozen=True)
+class CachedContent:
+    url: str
+    text: str
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+
+    def validators(self) -> dict[str, str]:
+        """Conditional request headers for revalidating this entry."""
+        headers: dict[str, str] = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ContentCache:
+    """Persistent cache of the text extracted from source URLs.
+
+    Entries older than `ttl` are stale: callers should revalidate them with
+    `CachedContent.validators` and call `refresh` on a 304. Entries stored with
+    `expires=False`, such as video transcripts, never go stale. Least recently
+    used entries are evicted once the stored text exceeds `max_bytes`, counted
+    across every process sharing `path`.
+
+    A fresh entry from `get` counts as a hit, a `refresh` as a revalidation and
+    a `set` as a miss, as text is only stored after fetching it.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        *,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: float | None = 24 * 60 * 60,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._url_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+        if path is None:
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS content ("
+            "url TEXT PRIMARY KEY, text TEXT NOT NULL, etag TEXT, "
+            "last_modified TEXT, expires INTEGER NOT NULL, size INTEGER NOT NULL, "
+            "fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _stored_bytes(self) -> int:
+        # Read each time, as other processes sharing the file add and evict too.
+        (size,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM content"
+        ).fetchone()
+        return size
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return self._stored_bytes()
+
+    def lock(self, url: str) -> asyncio.Lock:
+        """Per-URL lock so concurrent submissions of a link fetch it once."""
+        key = normalize_url(url)
+        lock = self._url_locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._url_locks[key] = lock
+        return lock
+
+    def is_fresh(self, entry: CachedContent) -> bool:
+        return self.ttl is None or time.time() - entry.fetched_at <= self.ttl
+
+    def _get(self, url: str) -> CachedContent | None:
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, etag, last_modified, expires, fetched_at "
+                "FROM content WHERE url = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE content SET accessed_at = ? WHERE url = ?", (now, key)
+            )
+            self._conn.commit()
+        text, etag, last_modified, expires, fetched_at = row
+        return CachedContent(
+            url=key,
+            text=text,
+            etag=etag,
+            last_modified=last_modified,
+            fetched_at=fetched_at if expires else float("inf"),
+        )
+
+    def _set(
+        self,
+        url: str,
+        text: str,
+        etag: str | None,
+        last_modified: str | None,
+        expires: bool,
+    ) -> None:
+        key = normalize_url(url)
+        now = time.time()
+        size = len(text.encode())
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO content VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, text, etag, last_modified, int(expires), size, now, now),
+            )
+            stored = self._stored_bytes()
+            while stored > self.max_bytes:
+                row = self._conn.execute(
+                    "SELECT url, size FROM content ORDER BY accessed_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    break
+                self._conn.execute("DELETE FROM content WHERE url = ?", (row[0],))
+                stored -= row[1]
+            self._conn.commit()
+
+    def _refresh(self, url: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE content SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                (now, now, normalize_url(url)),
+            )
+            self._conn.commit()
+
+    async def get(self, url: str) -> CachedContent | None:
+        """The cached entry for `url`, whether fresh or stale."""
+        async with AsyncJolt():
+            entry = await asyncio.to_thread(self._get, url)
+        if entry is not None and self.is_fresh(entry):
+            self.hits += 1
+        return entry
+
+    async def set(
+        self,
+        url: str,
+        text: str,
+        *,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        expires: bool = True,
+    ) -> None:
+        self.misses += 1
+        async with AsyncJolt():
+            await asyncio.to_thread(self._set, url, text, etag, last_modified, expires)
+
+    async def refresh(self, url: str) -> None:
+        """Mark a stale entry fresh again after the origin answered 304."""
+        self.revalidations += 1
+        async with AsyncJolt():
+            await asyncio.to_thread(self._refresh, url)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "revalidations": self.revalidations,
+            "misses": self.misses,
+            "bytes": self.size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
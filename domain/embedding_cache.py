@@ -0,0 +1,208 @@
+import asyncio
+from collections import OrderedDict
+import hashlib
+import logging
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Protocol
+
+import numpy as np
+
+from ajolt import AsyncJolt
+from domain.text import normalize_text
+from domain.vectors import Vector, as_vector
+
+
+logger = logging.getLogger(__name__)
+
+
+def embedding_key(model: str, text: str) -> str:
+    digest = hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingStore(Protocol):
+    def get(self, key: str) -> Vector | None: ...
+
+    def set(self, key: str, vector: Vector) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class MemoryEmbeddingStore:
+    """In-process LRU tier. Entries older than `ttl` seconds are treated as misses."""
+
+    def __init__(self, *, max_entries: int = 10_000, ttl: float | None = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Vector]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Vector | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, vector = entry
+        if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return vector
+
+    def set(self, key: str, vector: Vector) -> None:
+        vector = as_vector(vector).copy()
+        vector.setflags(write=False)
+        self._entries[key] = (time.monotonic(), vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteEmbeddingStore:
+    """On-disk tier storing vectors as packed float32 blobs.
+
+    Least recently used rows are evicted once `max_entries` is exceeded.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_entries: int = 100_000,
+        ttl: float | None = None,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, "
+            "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        (self._count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM embeddings"
+        ).fetchone()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, key: str) -> Vector | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, stored_at FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            blob, stored_at = row
+            if self.ttl is not None and now - stored_at > self.ttl:
+                self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._conn.commit()
+                self._count -= 1
+                return None
+            self._conn.execute(
+                "UPDATE embeddings SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return np.frombuffer(blob, dtype=np.float32)
+
+    def set(self, key: str, vector: Vector) -> None:
+        now = time.time()
+        blob = as_vector(vector).tobytes()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?)",
+                (key, blob, now, now),
+            )
+            if cur.rowcount:
+                self._count += 1
+            else:
+                self._conn.execute(
+                    "UPDATE embeddings SET vector = ?, stored_at = ?, accessed_at = ? "
+                    "WHERE key = ?",
+                    (blob, now, now, key),
+                )
+            if self._count > self.max_entries:
+                excess = self._count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    "SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+                    (excess,),
+                )
+                self._count -= excess
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache keyed by model and normalized text.
+
+    Checks the in-process tier first and falls back to the optional disk tier,
+    promoting disk hits into memory.
+    """
+
+    def __init__(
+        self,
+        memory: MemoryEmbeddingStore | None = None,
+        disk: EmbeddingStore | None = None,
+    ) -> None:
+        self.memory = MemoryEmbeddingStore() if memory is None else memory
+        self.disk = disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio,
+            "memory_entries": len(self.memory),
+        }
+
+    async def get(self, model: str, text: str) -> Vector | None:
+        key = embedding_key(model, text)
+        vector = self.memory.get(key)
+        if vector is None and self.disk is not None:
+            async with AsyncJolt():
+                vector = await asyncio.to_thread(self.disk.get, key)
+            if vector is not None:
+                self.disk_hits += 1
+                self.memory.set(key, vector)
+        if vector is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return vector
+
+    async def set(self, model: str, text: str, vector: Vector) -> None:
+        key = embedding_key(model, text)
+        self.memory.set(key, vector)
+        if self.disk is not None:
+            async with AsyncJolt():
+                await asyncio.to_thread(self.disk.set, key, vector)
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
@@ -0,0 +1,117 @@
+import asyncio
+from dataclasses import dataclass
+import time
+from typing import Callable
+
+
+STAGE = "stage"
+TOKEN = "token"
+RESET = "reset"
+ERROR = "error"
+DONE = "done"
+
+
+@dataclass(frozen=True)
+class Event:
+    """Progress of a long running task.
+
+    `kind` is one of `STAGE` (data names the stage), `TOKEN` (data is generated
+    text), `RESET` (discard the text so far), `ERROR` or `DONE` (data is the
+    result).
+    """
+
+    kind: str
+    data: str = ""
+
+
+Emit = Callable[[Event], None]
+
+
+class _Channel:
+    def __init__(self) -> None:
+        self.events: list[Event] = []
+        self.resets = 0
+        self.subscribers = 0
+        self.updated_at = time.monotonic()
+        self.changed = asyncio.Event()
+
+    def publish(self, event: Event) -> None:
+        if event.kind == RESET:
+            self.events = [e for e in self.events if e.kind != TOKEN]
+            self.resets += 1
+        self.events.append(event)
+        self.updated_at = time.monotonic()
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class Subscription:
+    """Replays a channel's events from the start, then follows new ones."""
+
+    def __init__(self, hub: "EventHub", channel: _Channel) -> None:
+        self._hub = hub
+        self._channel = channel
+        self._index = 0
+        self._resets = channel.resets
+
+    async def get(self, timeout: float | None = None) -> Event | None:
+        """The next event, or `None` if none arrives within `timeout`."""
+        channel = self._channel
+        if self._index >= len(channel.events) and self._resets == channel.resets:
+            try:
+                await asyncio.wait_for(channel.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self._resets != channel.resets:
+            # The tokens before the reset are gone, so resume from the reset.
+            self._resets = channel.resets
+            self._index = max(
+                i for i, e in enumerate(channel.events) if e.kind == RESET
+            )
+        event = channel.events[self._index]
+        self._index += 1
+        return event
+
+    def close(self) -> None:
+        self._channel.subscribers -= 1
+        self._hub.prune()
+
+
+class EventHub:
+    """In-process fan-out of task events to any number of subscribers.
+
+    Events are buffered per key so late subscribers catch up. A channel with no
+    subscribers is dropped after `retention` seconds without events.
+    """
+
+    def __init__(self, *, retention: float = 60) -> None:
+        self.retention = retention
+        self._channels: dict[str, _Channel] = {}
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def _channel(self, key: str) -> _Channel:
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._channels[key] = _Channel()
+        return channel
+
+    def publish(self, key: str, event: Event) -> None:
+        self._channel(key).publish(event)
+        self.prune()
+
+    def emitter(self, key: str) -> Emit:
+        return lambda event: self.publish(key, event)
+
+    def subscribe(self, key: str) -> Subscription:
+        channel = self._channel(key)
+        channel.subscribers += 1
+        return Subscription(self, channel)
+
+    def prune(self) -> None:
+        cutoff = time.monotonic() - self.retention
+        for key, channel in list(self._channels.items()):
+            idle = not channel.events or channel.updated_at < cutoff
+            if channel.subscribers <= 0 and idle:
+                del self._channels[key]
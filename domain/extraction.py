@@ -0,0 +1,249 @@
+from html.parser import HTMLParser
+import json
+import re
+from typing import Any, Iterator
+
+
+MAX_TEXT_CHARS = 20_000
+# A page whose <main> or <article> has less text than this is treated as
+# having neither, as some sites wrap only a teaser in them.
+MIN_MAIN_CHARS = 200
+MAX_LINK_DENSITY = 0.5
+JSON_LD_PATTERN = re.compile(
+    r"<script[^>]*type\s*=\s*[\"']?application/ld\+json[\"']?[^>]*>(.*?)</script>",
+    re.IGNORECASE | re.DOTALL,
+)
+META_CHARSET_PATTERN = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?([\w-]+)", re.I)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+BOILERPLATE_PATTERN = re.compile(
+    r"(^|[\s_-])(nav|navbar|menu|footer|sidebar|breadcrumbs?|comments?|"
+    r"advert|ads?|promo|social|share|sharing|cookies?|newsletter|related|"
+    r"popup|modal|subscribe)($|[\s_-])",
+    re.IGNORECASE,
+)
+SKIPPED_TAGS = frozenset(
+    "script style noscript template svg canvas iframe nav footer aside "
+    "form button select head".split()
+)
+BLOCK_TAGS = frozenset(
+    "p div section article main li ul ol dl dt dd h1 h2 h3 h4 h5 h6 table tr "
+    "td th blockquote pre figure figcaption br hr".split()
+)
+VOID_TAGS = frozenset(
+    "area base br col embed hr img input link meta source track wbr".split()
+)
+HEADING_TAGS = frozenset("h1 h2 h3 h4 h5 h6".split())
+# Headers are only chrome at page level: inside content they often hold the
+# recipe's title.
+CONTENT_TAGS = frozenset("main article section".split())
+HEADER_PATTERN = re.compile(r"(^|[\s_-])(header|masthead)($|[\s_-])", re.IGNORECASE)
+
+
+def decode_html(body: bytes, encoding: str | None = None) -> str:
+    """Decode with the HTTP charset, else a <meta> charset, else UTF-8."""
+    if encoding is None:
+        match = META_CHARSET_PATTERN.search(body[:4096])
+        encoding = match.group(1).decode("ascii") if match else None
+    try:
+        return body.decode(encoding or "utf-8", errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+def _clean(text: Any) -> str:
+    if not isinstance(text, str):
+        return ""
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def _types(node: dict[str, Any]) -> list[str]:
+    types = node.get("@type", [])
+    return [types] if isinstance(types, str) else list(types)
+
+
+def _walk(data: Any) -> Iterator[dict[str, Any]]:
+    if isinstance(data, list):
+        for item in data:
+            yield from _walk(item)
+    elif isinstance(data, dict):
+        yield data
+        for key in ("@graph", "mainEntity", "mainEntityOfPage"):
+            if key in data:
+                yield from _walk(data[key])
+
+
+def _instructions(data: Any) -> Iterator[str]:
+    if isinstance(data, str):
+        # Some sites put every step in one string, possibly as HTML.
+        yield from filter(None, (_clean(s) for s in re.split(r"<[^>]+>|\n", data)))
+    elif isinstance(data, list):
+        for item in data:
+            yield from _instructions(item)
+    elif isinstance(data, dict):
+        if "HowToSection" in _types(data):
+            if name := _clean(data.get("name")):
+                yield f"{name}:"
+            yield from _instructions(data.get("itemListElement", []))
+        elif text := _clean(data.get("text") or data.get("name")):
+            yield text
+
+
+def json_ld_recipe(html: str) -> dict[str, Any] | None:
+    """The first schema.org `Recipe` in the page's JSON-LD, if there is one."""
+    for match in JSON_LD_PATTERN.finditer(html):
+        try:
+            data = json.loads(match.group(1))
+        except ValueError:
+            continue
+        for node in _walk(data):
+            if "Recipe" in _types(node):
+                return node
+    return None
+
+
+def format_recipe(recipe: dict[str, Any]) -> str:
+    lines: list[str] = []
+    if name := _clean(recipe.get("name")):
+        lines.append(f"# {name}")
+    if description := _clean(recipe.get("description")):
+        lines.append(description)
+    servings = recipe.get("recipeYield")
+    if isinstance(servings, list):
+        servings = ", ".join(str(s) for s in servings)
+    for label, value in (
+        ("Serves", servings),
+        ("Prep time", recipe.get("prepTime")),
+        ("Cook time", recipe.get("cookTime")),
+        ("Total time", recipe.get("totalTime")),
+    ):
+        if value := _clean(str(value) if value is not None else None):
+            lines.append(f"{label}: {value}")
+    ingredients = recipe.get("recipeIngredient") or recipe.get("ingredients") or []
+    if isinstance(ingredients, str):
+        ingredients = [ingredients]
+    if ingredients:
+        lines.append("## Ingredients")
+        lines.extend(f"- {_clean(i)}" for i in ingredients if _clean(i))
+    steps = list(_instructions(recipe.get("recipeInstructions", [])))
+    if steps:
+        lines.append("## Method")
+        lines.extend(f"{i}. {step}" for i, step in enumerate(steps, 1))
+    return "\n".join(lines)
+
+
+class _MainContentParser(HTMLParser):
+    """Collects a page's text blocks, leaving out chrome and boilerplate.
+
+    Skips scripts, navigation, page-level headers, footers, forms and any
+    element whose class or id looks like boilerplate. Text inside <main> or <article> is
+    also collected on its own, as it is usually the content without the rest.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.blocks: list[tuple[str, bool]] = []
+        self._stack: list[str] = []
+        self._skip_depth: int | None = None
+        self._main_depth: int | None = None
+        self._text: list[str] = []
+        self._link_chars = 0
+        self._in_link = 0
+        self._heading = False
+
+    def _flush(self) -> None:
+        text = _clean("".join(self._text))
+        if text:
+            if self._heading:
+                text = f"## {text}"
+            density = self._link_chars / len(text)
+            if density <= MAX_LINK_DENSITY:
+                self.blocks.append((text, self._main_depth is not None))
+        self._text = []
+        self._link_chars = 0
+        self._heading = False
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in VOID_TAGS:
+            if tag == "br" and self._skip_depth is None:
+                self._flush()
+            return
+        self._stack.append(tag)
+        if self._skip_depth is not None:
+            return
+        marker = " ".join(v or "" for k, v in attrs if k in ("class", "id", "role"))
+        page_header = not CONTENT_TAGS.intersection(self._stack) and (
+            tag == "header" or HEADER_PATTERN.search(marker) is not None
+        )
+        if tag in SKIPPED_TAGS or page_header or BOILERPLATE_PATTERN.search(marker):
+            self._skip_depth = len(self._stack)
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+            self._heading = tag in HEADING_TAGS
+        if tag in ("main", "article") and self._main_depth is None:
+            self._main_depth = len(self._stack)
+        if tag == "a":
+            self._in_link += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in VOID_TAGS or tag not in self._stack:
+            return
+        # Close any unclosed children too, as browsers do.
+        while self._stack:
+            depth = len(self._stack)
+            open_tag = self._stack.pop()
+            if self._skip_depth == depth:
+                self._skip_depth = None
+            elif self._skip_depth is None:
+                if open_tag in BLOCK_TAGS:
+                    self._flush()
+                if open_tag == "a":
+                    self._in_link = max(0, self._in_link - 1)
+                if self._main_depth == depth:
+                    self._flush()
+                    self._main_depth = None
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data: str) -> None:
+        if self._skip_depth is not None:
+            return
+        self._text.append(data)
+        if self._in_link:
+            self._link_chars += len(data.strip())
+
+    def close(self) -> None:
+        super().close()
+        self._flush()
+
+
+def main_content(html: str) -> str:
+    parser = _MainContentParser()
+    parser.feed(html)
+    parser.close()
+    main = [text for text, in_main in parser.blocks if in_main]
+    if sum(len(text) for text in main) >= MIN_MAIN_CHARS:
+        blocks = main
+    else:
+        blocks = [text for text, _ in parser.blocks]
+    lines: list[str] = []
+    for text in blocks:
+        if not lines or lines[-1] != text:
+            lines.append(text)
+    return "\n".join(lines)
+
+
+def extract_text(html: str, *, max_chars: int = MAX_TEXT_CHARS) -> str:
+    """The recipe-relevant text of a page, at most `max_chars` long.
+
+    Uses the page's schema.org `Recipe` JSON-LD when there is one, which most
+    recipe sites publish for search engines, and the main content otherwise.
+    """
+    recipe = json_ld_recipe(html)
+    if recipe is not None and (
+        recipe.get("recipeIngredient") or recipe.get("recipeInstructions")
+    ):
+        text = format_recipe(recipe)
+    else:
+        text = main_content(html)
+    return text[:max_chars]
@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import random
+from typing import BinaryIO, Sequence
+
+import httpx
+import numpy as np
+import openai
+
+from domain.embedding_cache import EmbeddingCache
+from domain.events import STAGE, TOKEN, Emit, Event
+from domain.lexical import tokenize
+from domain.links import extract_links, strip_links
+from domain.llm_service import LLMService, Model
+from domain.metrics import traced
+from domain.models import GeneratedRecipe, Recipe, RecipeRecord, RecipeSummary
+from domain.vectors import Vector, as_vector, normalize
+
+
+PHRASES = (
+    "Warming winter stew",
+    "Quick weeknight noodles",
+    "Crispy roast potatoes",
+    "Zesty lemon tart",
+    "Smoky bean chilli",
+)
+
+
+def _refuse(request: httpx.Request) -> httpx.Response:
+    raise RuntimeError(f"FakeLLMService tried to reach {request.url}.")
+
+
+class FakeLLMService(LLMService):
+    """Deterministic `LLMService` that makes no network calls.
+
+    Every call that would reach the API sleeps for `latency` seconds instead.
+    Embeddings are hashed bags of words, so texts sharing words are similar and
+    search results are meaningful, and the same `seed` always gives the same
+    vectors.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        dim: int = 1536,
+        seed: int = 0,
+        embedding_cache: EmbeddingCache | None = None,
+        max_tokens: int = 3000,
+    ) -> None:
+        # Clients that fail any request, so whatever `LLMService` sets up is
+        # there, and anything not faked fails loudly instead of going online.
+        offline = httpx.AsyncClient(transport=httpx.MockTransport(_refuse))
+        super().__init__(
+            openai_client=openai.AsyncClient(api_key="fake", http_client=offline),
+            http_client=offline,
+            web_client=offline,
+            max_tokens=max_tokens,
+            embedding_cache=embedding_cache,
+        )
+        self.latency = latency
+        self.dim = dim
+        self.seed = seed
+        self._token_vectors: dict[str, Vector] = {}
+
+    async def _call(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _token_vector(self, token: str) -> Vector:
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            digest = hashlib.blake2b(
+                token.encode(), digest_size=8, key=self.seed.to_bytes(8, "little")
+            ).digest()
+            rng = np.random.default_rng(int.from_bytes(digest, "little"))
+            vector = rng.standard_normal(self.dim, dtype=np.float32)
+            self._token_vectors[token] = vector
+        return vector
+
+    def embed_text(self, text: str) -> Vector:
+        tokens = tokenize(text) or [""]
+        return normalize(as_vector(sum(self._token_vector(t) for t in tokens)))
+
+    @traced("llm")
+    async def qa(self, q: str, *, model: Model = Model.GPT_4) -> str:
+        await self._call()
+        return f"Answer to: {q[:40]}"
+
+    @traced("llm")
+    async def expand_description(
+        self,
+        description: str,
+        *,
+        local_links: bool = False,
+        emit: Emit | None = None,
+    ) -> str:
+        links = extract_links(description)
+        if not links:
+            return description
+        if emit is not None:
+            for _ in links:
+                emit(Event(STAGE, "scraping"))
+        await self._call()
+        return "\n".join([strip_links(description)] + [f"Page {l}" for l in links])
+
+    def _recipe(self, text: str, images: Sequence[BinaryIO]) -> str:
+        title = " ".join(text.split()[:6]) or f"Recipe from {len(images)} images"
+        return (
+            f"# {title}\n\n"
+            "Serves 4.\n\n"
+            "## Ingredients\n\n"
+            f"- {text.strip() or 'Whatever is pictured'}\n"
+            "- Salt\n\n"
+            "## Instructions\n\n"
+            "1. Combine the ingredients.\n"
+            "2. Cook until done.\n"
+        )
+
+    def _stream(self, content: str, emit: Emit) -> None:
+        emit(Event(STAGE, "generating"))
+        for word in content.split(" "):
+            emit(Event(TOKEN, word + " "))
+
+    @traced("llm")
+    async def generate_recipe(
+        self,
+        *,
+        text: str,
+        images: Sequence[BinaryIO],
+        emit: Emit | None = None,
+    ) -> str:
+        await self._call()
+        content = self._recipe(text, images)
+        if emit is not None:
+            self._stream(content, emit)
+        return content
+
+    @traced("llm")
+    async def generate_structured_recipe(
+        self,
+        *,
+        text: str,
+        images: Sequence[BinaryIO],
+        emit: Emit | None = None,
+    ) -> GeneratedRecipe:
+        await self._call()
+        content = self._recipe(text, images)
+        if emit is not None:
+            self._stream(content, emit)
+        return GeneratedRecipe(
+            name=self._name(content),
+            summary=self._summary(content),
+            content=content,
+        )
+
+    def _name(self, recipe: str) -> str:
+        return recipe.splitlines()[0].lstrip("# ").strip() or "Untitled"
+
+    def _summary(self, recipe: str) -> str:
+        return f"A simple take on {self._name(recipe).lower()}."
+
+    @traced("llm")
+    async def recipe_name(self, recipe: str) -> str:
+        await self._call()
+        return self._name(recipe)
+
+    @traced("llm")
+    async def recipe_summary(self, recipe: str) -> str:
+        await self._call()
+        return self._summary(recipe)
+
+    @traced("llm")
+    async def _create_embeddings(self, texts: list[str]) -> list[Vector]:
+        await self._call()
+        return [self.embed_text(text) for text in texts]
+
+    @traced("llm")
+    async def random_phrase(self) -> str:
+        await self._call()
+        return random.Random(self.seed).choice(PHRASES)
+
+
+class InMemoryRecipeVectorRepository:
+    """Exact search over recipes held in a dict, for tests and benchmarks.
+
+    Has the same interface as `RecipeVectorRepository` without any service.
+    """
+
+    def __init__(self) -> None:
+        self._recipes: dict[str, Recipe] = {}
+        self._rows: dict[str, int] = {}
+        self._ids: list[str] = []
+        self._vectors: list[Vector] = []
+        self._matrix: Vector | None = None
+
+    def __len__(self) -> int:
+        return len(self._recipes)
+
+    @traced("repository")
+    async def add(self, *, recipe: Recipe, vector: Vector) -> None:
+        vector = normalize(as_vector(vector))
+        row = self._rows.get(recipe.id)
+        if row is None:
+            self._rows[recipe.id] = len(self._ids)
+            self._ids.append(recipe.id)
+            self._vectors.append(vector)
+        else:
+            self._vectors[row] = vector
+        self._recipes[recipe.id] = recipe
+        self._matrix = None
+
+    @traced("repository")
+    async def get(self, id: str) -> Recipe:
+        return self._recipes[id]
+
+    def _search(self, vector: Vector, n: int) -> list[str]:
+        if not self._ids:
+            return []
+        if self._matrix is None:
+            self._matrix = np.stack(self._vectors)
+        scores = self._matrix @ normalize(as_vector(vector))
+        n = min(n, len(self._ids))
+        top = np.argpartition(-scores, n - 1)[:n]
+        return [self._ids[i] for i in top[np.argsort(-scores[top])]]
+
+    @traced("repository")
+    async def search(self, vector: Vector, *, n: int = 3) -> list[RecipeRecord]:
+        return [self._recipes[id] for id in self._search(vector, n)]
+
+    @traced("repository")
+    async def search_summaries(
+        self,
+        vector: Vector,
+        *,
+        n: int = 3,
+    ) -> list[RecipeSummary]:
+        return [self._recipes[id].to_summary() for id in self._search(vector, n)]
+
+    def close(self) -> None:
+        pass
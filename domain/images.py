@@ -0,0 +1,156 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import io
+import logging
+import multiprocessing
+from typing import Sequence
+
+from domain.metrics import traced
+
+
+logger = logging.getLogger(__name__)
+
+
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+# The vision model fits images in 2048x2048 and then scales the short side to
+# 768, so any more detail than that is uploaded only to be thrown away.
+MAX_LONG_SIDE = 2048
+MAX_SHORT_SIDE = 768
+JPEG_QUALITY = 85
+# Refuse decompression bombs well before Pillow's own, much larger, limit.
+MAX_PIXELS = 64_000_000
+SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def image_mime(data: bytes) -> str:
+    """The MIME type of an image from its first bytes; JPEG if unrecognised."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, mime in SIGNATURES:
+        if data.startswith(signature):
+            return mime
+    return "image/jpeg"
+
+
+def _target_size(width: int, height: int) -> tuple[int, int]:
+    scale = min(
+        1.0,
+        MAX_LONG_SIDE / max(width, height),
+        MAX_SHORT_SIDE / min(width, height),
+    )
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def prepare_image(data: bytes) -> bytes:
+    """Downscale an image to what the vision model uses and re-encode it.
+
+    Photos become JPEG and images with transparency PNG. An upright image in a
+    format the model accepts is kept as it is if that is smaller still.
+    Raises `ValueError` if `data` is not a readable image.
+    """
+    # Imported here, in the worker process, so the app does not load Pillow.
+    from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        width, height = image.size
+        if width * height > MAX_PIXELS:
+            raise ValueError(f"Image is too large: {width}x{height}.")
+        size = _target_size(width, height)
+        # JPEGs can be decoded at a fraction of their size, which is much faster.
+        image.draft("RGB", size)
+        original_format = image.format
+        rotated = image.getexif().get(ExifTags.Base.Orientation, 1) != 1
+        oriented = ImageOps.exif_transpose(image)
+        target = _target_size(*oriented.size)
+        if oriented.size != target:
+            oriented = oriented.resize(target, Image.Resampling.LANCZOS)
+        transparent = oriented.mode in ("RGBA", "LA", "PA") or (
+            oriented.mode == "P" and "transparency" in oriented.info
+        )
+        buffer = io.BytesIO()
+        if transparent:
+            oriented.save(buffer, format="PNG", optimize=True)
+        else:
+            oriented.convert("RGB").save(
+                buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True
+            )
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ValueError("Not a readable image.") from e
+    encoded = buffer.getvalue()
+    # The model scales a larger image down itself, so only the bytes matter.
+    if (
+        not rotated
+        and original_format in ("JPEG", "PNG", "WEBP")
+        and len(data) <= len(encoded)
+    ):
+        return data
+    return encoded
+
+
+class ImageProcessor:
+    """Prepares uploaded images in a process pool, once per distinct image.
+
+    Images are keyed by a hash of their bytes, so the same photo uploaded twice
+    in one request is sent once, and one uploaded again later is not decoded
+    again. Decoding and resizing are CPU bound, hence processes, not threads.
+    """
+
+    def __init__(self, *, max_workers: int | None = 2, max_entries: int = 256) -> None:
+        self.max_workers = max_workers
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._pool: ProcessPoolExecutor | None = None
+        self._prepared: OrderedDict[str, bytes] = OrderedDict()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Forking a process with running threads can deadlock the child.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    async def _prepare(self, digest: str, data: bytes) -> bytes:
+        prepared = self._prepared.get(digest)
+        if prepared is not None:
+            self._prepared.move_to_end(digest)
+            self.hits += 1
+            return prepared
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        prepared = await loop.run_in_executor(self._executor(), prepare_image, data)
+        logger.info("Prepared image: %d bytes -> %d bytes.", len(data), len(prepared))
+        self._prepared[digest] = prepared
+        while len(self._prepared) > self.max_entries:
+            self._prepared.popitem(last=False)
+        return prepared
+
+    @traced("images")
+    async def prepare(self, images: Sequence[bytes]) -> list[bytes]:
+        """The distinct images, prepared for the vision model, in upload order.
+
+        Raises `ValueError` if any of them is not a readable image.
+        """
+        unique: dict[str, bytes] = {}
+        for data in images:
+            unique.setdefault(hashlib.sha256(data).hexdigest(), data)
+        return list(
+            await asyncio.gather(
+                *(self._prepare(digest, data) for digest, data in unique.items())
+            )
+        )
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,414 @@
+import asyncio
+from dataclasses import dataclass
+from enum import Enum
+import json
+import logging
+from pathlib import Path
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable
+import uuid
+
+from ajolt import AsyncJolt
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+@dataclass(frozen=True)
+class Job:
+    id: str
+    kind: str
+    status: JobStatus
+    payload: dict[str, Any]
+    attempts: int
+    max_attempts: int
+    error: str | None
+    result: str | None
+    created_at: float
+    updated_at: float
+
+    @property
+    def done(self) -> bool:
+        return self.status in (JobStatus.succeeded, JobStatus.failed)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status.value,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+LEASE_EXPIRED_ERROR = "The job's lease expired on its last attempt."
+
+JOB_COLUMNS = (
+    "id, kind, status, payload, attempts, max_attempts, error, result, "
+    "created_at, updated_at"
+)
+
+
+def _job(row: tuple[Any, ...]) -> Job:
+    return Job(
+        id=row[0],
+        kind=row[1],
+        status=JobStatus(row[2]),
+        payload=json.loads(row[3]),
+        attempts=row[4],
+        max_attempts=row[5],
+        error=row[6],
+        result=row[7],
+        created_at=row[8],
+        updated_at=row[9],
+    )
+
+
+class JobQueue:
+    """Persistent SQLite job queue.
+
+    A claimed job is leased for `lease` seconds. Jobs whose lease runs out, for
+    example because the process was killed mid-run, become claimable again,
+    and count as a failed attempt. The queue can be shared by several
+    processes: claiming takes SQLite's write lock, so each job is claimed once.
+    """
+
+    def __init__(self, path: Path | None = None, *, lease: float = 15 * 60) -> None:
+        self.path = path
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._wakeup: asyncio.Event | None = None
+        if path is None:
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+            "payload TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "max_attempts INTEGER NOT NULL, error TEXT, result TEXT, "
+            "run_at REAL NOT NULL, lease_expires REAL, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_at);"
+            "CREATE TABLE IF NOT EXISTS job_blobs ("
+            "job_id TEXT NOT NULL, idx INTEGER NOT NULL, data BLOB NOT NULL, "
+            "PRIMARY KEY (job_id, idx));"
+        )
+        self._conn.commit()
+
+    def _enqueue(
+        self,
+        kind: str,
+        payload: dict[str, Any],
+        blobs: list[bytes],
+        max_attempts: int,
+    ) -> str:
+        id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, max_attempts, run_at, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    id,
+                    kind,
+                    JobStatus.queued.value,
+                    json.dumps(payload),
+                    max_attempts,
+                    now,
+                    now,
+                    now,
+                ),
+            )
+            self._conn.executemany(
+                "INSERT INTO job_blobs VALUES (?, ?, ?)",
+                [(id, i, blob) for i, blob in enumerate(blobs)],
+            )
+            self._conn.commit()
+        return id
+
+    def _claim(self) -> Job | None:
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock before reading, so two
+            # processes can never pick the same row.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, lease_expires = NULL, "
+                    "updated_at = ? "
+                    "WHERE status = ? AND lease_expires < ? "
+                    "AND attempts >= max_attempts RETURNING id",
+                    (
+                        JobStatus.failed.value,
+                        LEASE_EXPIRED_ERROR,
+                        now,
+                        JobStatus.running.value,
+                        now,
+                    ),
+                ).fetchall()
+                self._conn.executemany(
+                    "DELETE FROM job_blobs WHERE job_id = ?", expired
+                )
+                row = self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, "
+                    "lease_expires = ?, updated_at = ? "
+                    "WHERE id = ("
+                    "SELECT id FROM jobs "
+                    "WHERE (status = ? AND run_at <= ?) "
+                    "OR (status = ? AND lease_expires < ?) "
+                    "ORDER BY run_at LIMIT 1"
+                    f") RETURNING {JOB_COLUMNS}",
+                    (
+                        JobStatus.running.value,
+                        now + self.lease,
+                        now,
+                        JobStatus.queued.value,
+                        now,
+                        JobStatus.running.value,
+                        now,
+                    ),
+                ).fetchone()
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return None if row is None else _job(row)
+
+    def _renew(self, id: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND status = ?",
+                (now + self.lease, now, id, JobStatus.running.value),
+            )
+            self._conn.commit()
+
+    def _release(self, id: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), "
+                "run_at = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ?",
+                (JobStatus.queued.value, now, now, id, JobStatus.running.value),
+            )
+            self._conn.commit()
+
+    def _finish(
+        self,
+        id: str,
+        status: JobStatus,
+        *,
+        result: str | None = None,
+        error: str | None = None,
+        run_at: float | None = None,
+    ) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, "
+                "run_at = COALESCE(?, run_at), lease_expires = NULL, updated_at = ? "
+                "WHERE id = ?",
+                (status.value, result, error, run_at, now, id),
+            )
+            if status is not JobStatus.queued:
+                # Nothing will run the job again, so its inputs can go.
+                self._conn.execute("DELETE FROM job_blobs WHERE job_id = ?", (id,))
+            self._conn.commit()
+
+    def _get(self, id: str) -> Job | None:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (id,)
+            ).fetchone()
+        return None if row is None else _job(row)
+
+    def _blobs(self, id: str) -> list[bytes]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM job_blobs WHERE job_id = ? ORDER BY idx", (id,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    async def enqueue(
+        self,
+        kind: str,
+        payload: dict[str, Any],
+        *,
+        blobs: list[bytes] | None = None,
+        max_attempts: int = 3,
+    ) -> str:
+        async with AsyncJolt():
+            id = await asyncio.to_thread(
+                self._enqueue, kind, payload, blobs or [], max_attempts
+            )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return id
+
+    async def claim(self) -> Job | None:
+        async with AsyncJolt():
+            return await asyncio.to_thread(self._claim)
+
+    async def renew(self, id: str) -> None:
+        """Extend the lease on a running job."""
+        async with AsyncJolt():
+            await asyncio.to_thread(self._renew, id)
+
+    async def release(self, id: str) -> None:
+        """Put a running job back in the queue without using up an attempt."""
+        async with AsyncJolt():
+            await asyncio.to_thread(self._release, id)
+
+    async def succeed(self, id: str, result: str | None = None) -> None:
+        async with AsyncJolt():
+            await asyncio.to_thread(
+                self._finish, id, JobStatus.succeeded, result=result
+            )
+
+    async def fail(
+        self,
+        job: Job,
+        error: str,
+        *,
+        retry_in: float | None = None,
+    ) -> None:
+        """Requeue `job` after `retry_in` seconds, or fail it for good."""
+        if retry_in is not None and job.attempts < job.max_attempts:
+            status, run_at = JobStatus.queued, time.time() + retry_in
+        else:
+            status, run_at = JobStatus.failed, None
+        async with AsyncJolt():
+            await asyncio.to_thread(
+                self._finish, job.id, status, error=error, run_at=run_at
+            )
+
+    async def get(self, id: str) -> Job | None:
+        async with AsyncJolt():
+            return await asyncio.to_thread(self._get, id)
+
+    async def blobs(self, id: str) -> list[bytes]:
+        async with AsyncJolt():
+            return await asyncio.to_thread(self._blobs, id)
+
+    async def wait(self, timeout: float) -> None:
+        """Sleep until a job is enqueued in this process or `timeout` passes."""
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+JobHandler = Callable[[Job], Awaitable[str | None]]
+
+
+class JobWorker:
+    """Runs up to `concurrency` jobs at a time, retrying failures with backoff."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: dict[str, JobHandler],
+        *,
+        concurrency: int = 2,
+        poll_interval: float = 2.0,
+        backoff_base: float = 10.0,
+        backoff_max: float = 10 * 60,
+    ) -> None:
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._tasks: list[asyncio.Task[None]] = []
+        self._stopping = False
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def run_one(self, job: Job) -> None:
+        handler = self.handlers.get(job.kind)
+        if handler is None:
+            await self.queue.fail(job, f"No handler for {job.kind!r}.")
+            return
+        logger.info("Running job %s (%s), attempt %s.", job.id, job.kind, job.attempts)
+        renewing = asyncio.create_task(self._keep_leased(job.id))
+        try:
+            result = await handler(job)
+        except asyncio.CancelledError:
+            # Stopping, e.g. for a deploy: hand the job to the next worker now
+            # rather than leaving it stuck until its lease runs out.
+            logger.info("Releasing job %s.", job.id)
+            await self.queue.release(job.id)
+            raise
+        except Exception as e:
+            logger.exception("Job %s failed.", job.id)
+            await self.queue.fail(job, repr(e), retry_in=self.backoff(job.attempts))
+        else:
+            await self.queue.succeed(job.id, result)
+        finally:
+            renewing.cancel()
+
+    async def _keep_leased(self, id: str) -> None:
+        interval = max(self.queue.lease / 3, 0.01)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.queue.renew(id)
+            except Exception:
+                logger.exception("Could not renew the lease on job %s.", id)
+
+    async def _loop(self) -> None:
+        while not self._stopping:
+            job = await self.queue.claim()
+            if job is None:
+                await self.queue.wait(self.poll_interval)
+                continue
+            await self.run_one(job)
+
+    def start(self) -> None:
+        self._stopping = False
+        self._tasks = [
+            asyncio.create_task(self._loop()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run(self) -> None:
+        self.start()
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.stop()
@@ -0,0 +1,58 @@
+import json
+import re
+
+
+class JsonStringField:
+    """Incrementally decodes one string value from a JSON object being streamed.
+
+    Feed the raw chunks as they arrive; each call returns the newly decoded part
+    of the field's value, so it can be shown before the object is complete.
+    """
+
+    def __init__(self, key: str) -> None:
+        self._start = re.compile(rf'(?<!\\)"{re.escape(key)}"\s*:\s*"')
+        self._buffer = ""
+        self._pos: int | None = None
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        if self._pos is None:
+            match = self._start.search(self._buffer)
+            if match is None:
+                return ""
+            self._pos = match.end()
+        out: list[str] = []
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer) and not self.done:
+            c = buffer[pos]
+            if c == '"':
+                self.done = True
+                break
+            if c != "\\":
+                end = pos + 1
+                while end < len(buffer) and buffer[end] not in '"\\':
+                    end += 1
+                out.append(buffer[pos:end])
+                pos = end
+                continue
+            size = 6 if buffer[pos + 1 : pos + 2] == "u" else 2
+            escape = buffer[pos : pos + size]
+            if escape.startswith("\\u") and 0xD800 <= _code(escape) < 0xDC00:
+                # A high surrogate only decodes together with its low half.
+                size = 12
+                escape = buffer[pos : pos + size]
+            if len(escape) < size:
+                break
+            out.append(json.loads(f'"{escape}"'))
+            pos += size
+        self._pos = pos
+        return "".join(out)
+
+
+def _code(escape: str) -> int:
+    try:
+        return int(escape[2:6], 16)
+    except ValueError:
+        return 0
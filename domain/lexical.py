@@ -0,0 +1,243 @@
+from collections import Counter, defaultdict
+import heapq
+import math
+from pathlib import Path
+import re
+import sqlite3
+import threading
+
+from domain.models import RecipeSummary
+from domain.text import normalize_text
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the to with".split()
+)
+# Endings after which a plural "es" is dropped, rather than just the "s".
+ES_PLURALS = ("sses", "xes", "zes", "ches", "shes", "oes")
+HEADING_PATTERN = re.compile(r"^\s*#{1,6}\s+(.*)$")
+# Field weights, applied as repeated term frequency.
+NAME_WEIGHT = 3
+SUMMARY_WEIGHT = 1
+INGREDIENTS_WEIGHT = 2
+
+
+def tokenize(text: str) -> list[str]:
+    tokens: list[str] = []
+    for token in TOKEN_PATTERN.findall(normalize_text(text)):
+        if token in STOPWORDS:
+            continue
+        # Fold simple plurals so "tomatoes" finds "tomato" and "cakes" "cake".
+        if len(token) > 4 and token.endswith(ES_PLURALS):
+            token = token[:-2]
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def ingredients(content: str) -> str:
+    """The text of a recipe's ingredients section, or "" if there is none."""
+    lines: list[str] = []
+    inside = False
+    for line in content.splitlines():
+        heading = HEADING_PATTERN.match(line)
+        if heading is not None:
+            inside = "ingredient" in heading.group(1).lower()
+            continue
+        if inside:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], *, k: int = 60) -> list[str]:
+    """Merge rankings of ids, best first, by summing 1 / (k + rank)."""
+    scores: dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, id in enumerate(ranking):
+            scores[id] += 1 / (k + rank + 1)
+    return sorted(scores, key=lambda id: -scores[id])
+
+
+class LexicalIndex:
+    """BM25 inverted index over recipe names, summaries and ingredients.
+
+    Postings are held in memory for search and written through to SQLite, so
+    the index is rebuilt on start without re-reading any recipes, and reloaded
+    when another process, such as a standalone worker, writes to it. It also
+    keeps each recipe's `RecipeSummary`, so lexical results need no other lookup.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        *,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> None:
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings: dict[str, dict[str, int]] = defaultdict(dict)
+        self._lengths: dict[str, int] = {}
+        self._terms: dict[str, list[str]] = defaultdict(list)
+        self._summaries: dict[str, RecipeSummary] = {}
+        self._total_length = 0
+        # Bumped whenever the indexed recipes change.
+        self.generation = 0
+        if path is None:
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "id TEXT PRIMARY KEY, name TEXT NOT NULL, summary TEXT NOT NULL, "
+            "length INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, id TEXT NOT NULL, tf INTEGER NOT NULL, "
+            "PRIMARY KEY (term, id));"
+            "CREATE INDEX IF NOT EXISTS postings_id ON postings (id);"
+        )
+        self._conn.commit()
+        self._data_version = -1
+        self._sync()
+
+    def _sync(self) -> None:
+        """Reload if another connection has changed the database.
+
+        `data_version` only changes for commits made by other connections.
+        """
+        (version,) = self._conn.execute("PRAGMA data_version").fetchone()
+        if version == self._data_version:
+            return
+        self._data_version = version
+        self.generation += 1
+        self._postings.clear()
+        self._lengths.clear()
+        self._terms.clear()
+        self._summaries.clear()
+        self._total_length = 0
+        for id, name, summary, length in self._conn.execute("SELECT * FROM docs"):
+            self._summaries[id] = RecipeSummary(id=id, name=name, summary=summary)
+            self._lengths[id] = length
+            self._total_length += length
+        for term, id, tf in self._conn.execute("SELECT * FROM postings"):
+            self._postings[term][id] = tf
+            self._terms[id].append(term)
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._lengths
+
+    def _remove(self, id: str) -> None:
+        length = self._lengths.pop(id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        del self._summaries[id]
+        for term in self._terms.pop(id, []):
+            del self._postings[term][id]
+            if not self._postings[term]:
+                del self._postings[term]
+        self._conn.execute("DELETE FROM docs WHERE id = ?", (id,))
+        self._conn.execute("DELETE FROM postings WHERE id = ?", (id,))
+
+    def add(self, summary: RecipeSummary, content: str = "") -> None:
+        counts: Counter[str] = Counter()
+        for text, weight in (
+            (summary.name, NAME_WEIGHT),
+            (summary.summary, SUMMARY_WEIGHT),
+            (ingredients(content), INGREDIENTS_WEIGHT),
+        ):
+            for token in tokenize(text):
+                counts[token] += weight
+        length = sum(counts.values())
+        with self._lock:
+            self._sync()
+            self._remove(summary.id)
+            self._summaries[summary.id] = summary
+            self._lengths[summary.id] = length
+            self._total_length += length
+            for term, tf in counts.items():
+                self._postings[term][summary.id] = tf
+            self._terms[summary.id] = list(counts)
+            self.generation += 1
+            self._conn.execute(
+                "INSERT INTO docs VALUES (?, ?, ?, ?)",
+                (summary.id, summary.name, summary.summary, length),
+            )
+            self._conn.executemany(
+                "INSERT INTO postings VALUES (?, ?, ?)",
+                [(term, summary.id, tf) for term, tf in counts.items()],
+            )
+            self._conn.commit()
+
+    def search(
+        self,
+        query: str,
+        *,
+        n: int = 3,
+        require_all: bool = False,
+    ) -> list[tuple[str, float]]:
+        """The best `n` ids for `query` with their BM25 scores.
+
+        With `require_all` only recipes containing every query term count.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            self._sync()
+            if not self._lengths or not terms:
+                return []
+            docs = len(self._lengths)
+            average = self._total_length / docs
+            scores: dict[str, float] = defaultdict(float)
+            matched: Counter[str] = Counter()
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[id] / average)
+                    scores[id] += idf * tf * (self.k1 + 1) / (tf + norm)
+                    matched[id] += 1
+        if require_all:
+            scores = {id: s for id, s in scores.items() if matched[id] == len(terms)}
+        return heapq.nlargest(n, scores.items(), key=lambda item: item[1])
+
+    def refresh(self) -> int:
+        """Pick up writes from other processes and return the generation."""
+        with self._lock:
+            self._sync()
+            return self.generation
+
+    def summaries_after(self, cursor: int) -> tuple[list[RecipeSummary], int]:
+        """Recipes stored after `cursor`, oldest first, and the cursor to pass next.
+
+        Start from a cursor of 0. Rows are read by rowid, so only new recipes
+        are read, including those written by other processes.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid, id, name, summary FROM docs WHERE rowid > ? "
+                "ORDER BY rowid",
+                (cursor,),
+            ).fetchall()
+        summaries = [
+            RecipeSummary(id=id, name=name, summary=s) for _, id, name, s in rows
+        ]
+        return summaries, rows[-1][0] if rows else cursor
+
+    def summaries(self, ids: list[str]) -> list[RecipeSummary]:
+        with self._lock:
+            return [self._summaries[id] for id in ids if id in self._summaries]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,52 @@
+import re
+
+
+URL_PATTERN = re.compile(r"(?:https?://|www\.)[^\s<>\"']+", re.IGNORECASE)
+TRAILING = ".,;:!?'\""
+BRACKETS = {")": "(", "]": "[", "}": "{"}
+
+
+def _trim(url: str) -> str:
+    """Drop trailing punctuation and closing brackets that are not balanced."""
+    while url:
+        last = url[-1]
+        if last in TRAILING:
+            url = url[:-1]
+        elif last in BRACKETS and url.count(last) > url.count(BRACKETS[last]):
+            url = url[:-1]
+        else:
+            break
+    return url
+
+
+def _spans(text: str) -> list[tuple[int, int, str]]:
+    spans: list[tuple[int, int, str]] = []
+    for match in URL_PATTERN.finditer(text):
+        url = _trim(match.group())
+        if "." not in url.split("//", 1)[-1]:
+            continue
+        spans.append((match.start(), match.start() + len(url), url))
+    return spans
+
+
+def extract_links(text: str) -> list[str]:
+    """Find the URLs in `text` in order of first appearance, without duplicates."""
+    links: list[str] = []
+    for _, _, url in _spans(text):
+        if url.lower().startswith("www."):
+            url = f"https://{url}"
+        if url not in links:
+            links.append(url)
+    return links
+
+
+def strip_links(text: str) -> str:
+    """Remove URLs from `text`, leaving the rest of the description."""
+    parts: list[str] = []
+    end = 0
+    for start, stop, _ in _spans(text):
+        parts.append(text[end:start])
+        end = stop
+    parts.append(text[end:])
+    lines = (" ".join(line.split()) for line in "".join(parts).splitlines())
+    return "\n".join(line for line in lines if line).strip()
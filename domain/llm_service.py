@@ -3,9 +3,10 @@ import base64
 from enum import Enum
 import io
 import logging
-from typing import Sequence
+from typing import BinaryIO, Callable, Sequence
 
 import httpx
+import numpy as np
 import openai
 from openai.types.chat import (
     ChatCompletionMessageParam,
@@ -13,19 +14,34 @@ from openai.types.chat import (
     ChatCompletionSystemMessageParam,
 )
 
-from data import audio_from_youtube_url, text_from_webpage
+from data import audio_url_from_youtube_url, text_from_webpage
 from domain.aopenai import openai_client_factory, quick_chat
-from domain.models import Recipe
-from domain.prompts import CREATE_RECIPE_PROMPT
+from domain.audio import decode_pcm, map_ordered, wav_chunks
+from domain.batching import Coalescer
+from domain.content_cache import ContentCache
+from domain.embedding_cache import EmbeddingCache
+from domain.events import STAGE, TOKEN, Emit, Event
+from domain.images import image_mime
+from domain.json_stream import JsonStringField
+from domain.links import extract_links, strip_links
+from domain.metrics import record_usage, traced
+from domain.models import GeneratedRecipe, RecipeRecord
+from domain.pipeline import Pipeline, Stage
+from domain.prompts import CREATE_RECIPE_PROMPT, STRUCTURED_RECIPE_PROMPT
+from domain.vectors import Vector
 
 
 logger = logging.getLogger(__name__)
 
 
+MAX_EMBEDDING_BATCH = 2048
+
+
 class Model(Enum):
     GPT_35_TURBO = "gpt-3.5-turbo"
     GPT_4 = "gpt-4o"
     WHISPER_1 = "whisper-1"
+    TEXT_EMBEDDING_3_SMALL = "text-embedding-3-small"
 
 
 async def parse_links(description: str, openai_client: openai.AsyncClient) -> list[str]:
@@ -59,8 +75,9 @@ async def parse_part_description(
     return text
 
 
+@traced("llm")
 async def transcript_from_audio(
-    audio: io.BufferedReader,
+    audio: io.BufferedReader | tuple[str, bytes, str],
     openai_client: openai.AsyncClient,
 ) -> str:
     resp = await openai_client.audio.transcriptions.create(
@@ -70,17 +87,53 @@ async def transcript_from_audio(
     return resp.text
 
 
-async def link_to_text(link: str, openai_client: openai.AsyncClient) -> str:
+async def transcript_from_youtube_url(
+    link: str,
+    *,
+    openai_client: openai.AsyncClient,
+    cache: ContentCache | None = None,
+) -> str:
+    if cache is None:
+        source = await audio_url_from_youtube_url(link)
+
+        async def transcribe(i: int, chunk: bytes) -> str:
+            logger.info("Transcribing chunk %d of %s", i, link)
+            audio = (f"chunk-{i:03d}.wav", chunk, "audio/wav")
+            return await transcript_from_audio(audio, openai_client=openai_client)
+
+        # Chunks are transcribed while later ones are still downloading.
+        texts = await map_ordered(wav_chunks(decode_pcm(source)), transcribe)
+        return " ".join(text.strip() for text in texts if text.strip())
+
+    # A video's audio does not change, so transcripts never go stale.
+    async with cache.lock(link):
+        cached = await cache.get(link)
+        if cached is not None:
+            return cached.text
+        text = await transcript_from_youtube_url(link, openai_client=openai_client)
+        await cache.set(link, text, expires=False)
+        return text
+
+
+def is_youtube_link(link: str) -> bool:
+    base = link.replace("https://", "").replace("http://", "")
+    return base.lower().startswith("www.youtube.com")
+
+
+async def link_to_text(
+    link: str,
+    openai_client: openai.AsyncClient,
+    http_client: httpx.AsyncClient,
+    cache: ContentCache | None = None,
+) -> str:
     # TODO: This is horrible
     logger.info(link)
-    base = link.replace("https://", "").replace("http://", "")
-    if base.lower().startswith("www.youtube.com"):
-        audio_path = await audio_from_youtube_url(link)
-        logger.info(audio_path)
-        with open(audio_path, "rb") as audio:
-            text = await transcript_from_audio(audio, openai_client=openai_client)
+    if is_youtube_link(link):
+        text = await transcript_from_youtube_url(
+            link, openai_client=openai_client, cache=cache
+        )
     else:
-        text = await text_from_webpage(link)
+        text = await text_from_webpage(link, http_client=http_client, cache=cache)
     return text
 
 
@@ -89,7 +142,11 @@ class LLMService:
         self,
         openai_client: openai.AsyncClient | None = None,
         http_client: httpx.AsyncClient | None = None,
+        web_client: httpx.AsyncClient | None = None,
+        content_cache: ContentCache | None = None,
         max_tokens: int = 3000,
+        embedding_cache: EmbeddingCache | None = None,
+        embedding_batch_window: float | None = None,
     ) -> None:
         self.http_client = (
             openai_client_factory() if http_client is None else http_client
@@ -97,69 +154,184 @@ class LLMService:
         self.openai_client = (
             openai.AsyncClient() if openai_client is None else openai_client
         )
+        self.web_client = (
+            httpx.AsyncClient(timeout=20, follow_redirects=True)
+            if web_client is None
+            else web_client
+        )
+        self.content_cache = content_cache
         self.max_tokens = max_tokens
+        self.embedding_cache = embedding_cache
+        self.embedding_batcher = (
+            None
+            if embedding_batch_window is None
+            else Coalescer(
+                self._create_embeddings,
+                window=embedding_batch_window,
+                max_batch=MAX_EMBEDDING_BATCH,
+            )
+        )
 
+    @traced("llm")
     async def qa(self, q: str, *, model: Model = Model.GPT_4) -> str:
         return await quick_chat(q, openai_client=self.openai_client, model=model.value)
 
-    async def create_recipe(
+    async def _link_texts(
         self,
+        links: list[str],
         *,
+        emit: Emit | None = None,
+    ) -> list[str]:
+        if emit is not None:
+            for link in links:
+                stage = "transcribing" if is_youtube_link(link) else "scraping"
+                emit(Event(STAGE, stage))
+        coros = [
+            link_to_text(
+                link,
+                openai_client=self.openai_client,
+                http_client=self.web_client,
+                cache=self.content_cache,
+            )
+            for link in links
+        ]
+        return await asyncio.gather(*coros)
+
+    @traced("llm")
+    async def expand_description(
+        self,
         description: str,
-        images: Sequence[io.BufferedReader],
+        *,
+        local_links: bool = False,
+        emit: Emit | None = None,
     ) -> str:
-        if not (description or images):
-            raise ValueError("Provide a description or images.")
+        """Replace links in `description` with the text of the pages they point to.
+
+        With `local_links` the links are found by a URL tokenizer instead of two
+        chat completions. Otherwise link parsing and link removal run concurrently,
+        and every link is fetched as soon as the links are known.
+        """
+        if local_links:
+            link_texts = await self._link_texts(extract_links(description), emit=emit)
+            return "\n".join([strip_links(description)] + link_texts)
+
+        pipeline = Pipeline(
+            "expand_description",
+            [
+                Stage(
+                    "links",
+                    lambda: parse_links(description, openai_client=self.openai_client),
+                ),
+                Stage(
+                    "part_description",
+                    lambda: parse_part_description(
+                        description, openai_client=self.openai_client
+                    ),
+                ),
+                Stage(
+                    "link_texts",
+                    lambda links: self._link_texts(links, emit=emit),
+                    deps=("links",),
+                ),
+            ],
+        )
+        run = await pipeline.run()
+        return "\n".join([run["part_description"]] + run["link_texts"])
 
+    def _recipe_messages(
+        self,
+        *,
+        prompt: str,
+        text: str,
+        images: Sequence[BinaryIO],
+    ) -> list[ChatCompletionMessageParam]:
         system_message: ChatCompletionSystemMessageParam = {
             "role": "system",
-            "content": CREATE_RECIPE_PROMPT,
+            "content": prompt,
         }
 
         messages: list[ChatCompletionMessageParam] = [system_message]
 
-        if description:
-            links = await parse_links(description, openai_client=self.openai_client)
-            part_description = await parse_part_description(
-                description, openai_client=self.openai_client
-            )
-            coros = [
-                link_to_text(link, openai_client=self.openai_client) for link in links
-            ]
-            link_texts = await asyncio.gather(*coros)
-            full_description = "\n".join([part_description] + link_texts)
+        if text:
             text_message: ChatCompletionUserMessageParam = {
                 "role": "user",
-                "content": full_description,
+                "content": text,
             }
             messages.append(text_message)
 
+        if images:
+            image_urls: list[str] = []
+            for image_data in images:
+                # Images may be sent more than once, e.g. when falling back.
+                image_data.seek(0)
+                data = image_data.read()
+                encoded = base64.b64encode(data).decode("utf-8")
+                image_urls.append(f"data:{image_mime(data)};base64,{encoded}")
+            image_message: ChatCompletionUserMessageParam = {
+                "role": "user",
+                "content": [
+                    {"type": "image_url", "image_url": {"url": url}}
+                    for url in image_urls
+                ],
+            }
+            messages.append(image_message)
+
+        return messages
+
+    @traced("llm")
+    async def _stream_chat(
+        self,
+        *,
+        messages: list[ChatCompletionMessageParam],
+        on_delta: Callable[[str], None],
+        json_mode: bool = False,
+    ) -> str:
+        """Stream a completion, passing each piece of text to `on_delta`."""
+        stream = await self.openai_client.chat.completions.create(
+            model=Model.GPT_4.value,
+            messages=messages,
+            max_tokens=self.max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+            response_format={"type": "json_object"} if json_mode else openai.omit,
+        )
+        parts: list[str] = []
+        async for chunk in stream:
+            record_usage(chunk.usage, model=chunk.model)
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                on_delta(delta)
+        return "".join(parts)
+
+    @traced("llm")
+    async def generate_recipe(
+        self,
+        *,
+        text: str,
+        images: Sequence[BinaryIO],
+        emit: Emit | None = None,
+    ) -> str:
+        """With `emit` the recipe is streamed as `TOKEN` events while it is written."""
+        messages = self._recipe_messages(
+            prompt=CREATE_RECIPE_PROMPT, text=text, images=images
+        )
+
+        if emit is not None:
+            emit(Event(STAGE, "generating"))
+            return await self._stream_chat(
+                messages=messages,
+                on_delta=lambda delta: emit(Event(TOKEN, delta)),
+            )
+
         if not images:
             resp = await self.openai_client.chat.completions.create(
                 model=Model.GPT_4.value,
                 messages=messages,
             )
-
+            record_usage(resp.usage, model=resp.model)
             return resp.choices[0].message.content or ""
 
-        image_message: ChatCompletionUserMessageParam = {
-            "role": "user",
-            "content": [
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": (
-                            "data:image/jpeg;base64,"
-                            f"{base64.b64encode(image_data.read()).decode('utf-8')}"
-                        ),
-                    },
-                }
-                for image_data in images
-            ],
-        }
-
-        messages.append(image_message)
-
         resp = await self.http_client.post(
             "https://api.openai.com/v1/chat/completions",
             json={
@@ -170,9 +342,65 @@ class LLMService:
         )
 
         data = resp.json()
-
+        record_usage(data.get("usage"), model=data.get("model", "unknown"))
         return data["choices"][0]["message"]["content"] or ""
 
+    @traced("llm")
+    async def generate_structured_recipe(
+        self,
+        *,
+        text: str,
+        images: Sequence[BinaryIO],
+        emit: Emit | None = None,
+    ) -> GeneratedRecipe:
+        """Generate the recipe, its name and its summary in one JSON completion.
+
+        With `emit` the recipe content is streamed as `TOKEN` events, decoded
+        from the JSON as it arrives. Raises `pydantic.ValidationError` if the
+        model's reply does not validate.
+        """
+        messages = self._recipe_messages(
+            prompt=STRUCTURED_RECIPE_PROMPT, text=text, images=images
+        )
+        if emit is not None:
+            emit(Event(STAGE, "generating"))
+            field = JsonStringField("content")
+
+            def on_delta(delta: str) -> None:
+                if decoded := field.feed(delta):
+                    emit(Event(TOKEN, decoded))
+
+            content = await self._stream_chat(
+                messages=messages, on_delta=on_delta, json_mode=True
+            )
+            return GeneratedRecipe.model_validate_json(content)
+
+        resp = await self.openai_client.chat.completions.create(
+            model=Model.GPT_4.value,
+            messages=messages,
+            response_format={"type": "json_object"},
+            max_tokens=self.max_tokens,
+        )
+        record_usage(resp.usage, model=resp.model)
+        content = resp.choices[0].message.content or ""
+        return GeneratedRecipe.model_validate_json(content)
+
+    @traced("llm")
+    async def create_recipe(
+        self,
+        *,
+        description: str,
+        images: Sequence[BinaryIO],
+        emit: Emit | None = None,
+    ) -> str:
+        if not (description or images):
+            raise ValueError("Provide a description or images.")
+        text = (
+            await self.expand_description(description, emit=emit) if description else ""
+        )
+        return await self.generate_recipe(text=text, images=images, emit=emit)
+
+    @traced("llm")
     async def recipe_name(self, recipe: str) -> str:
         msg = (
             "Please provide an informative but concise name for this recipe: "
@@ -180,6 +408,7 @@ class LLMService:
         )
         return await self.qa(msg)
 
+    @traced("llm")
     async def recipe_summary(self, recipe: str) -> str:
         msg = (
             "Please provide an exciting but informative summary of around 25 words "
@@ -187,18 +416,80 @@ class LLMService:
         )
         return await self.qa(msg)
 
-    async def embeddings(self, content: Recipe | str) -> list[float]:
-        if isinstance(content, Recipe):
-            content = content.content
-        emb = await self.openai_client.embeddings.create(
-            input=content,
-            model="text-embedding-3-small",
-        )
-        return emb.data[0].embedding
+    @traced("llm")
+    async def _create_embeddings(self, texts: list[str]) -> list[Vector]:
+        vectors: list[Vector] = []
+        for i in range(0, len(texts), MAX_EMBEDDING_BATCH):
+            # Base64 is packed little-endian float32, which decodes straight into
+            # an array without building a list of Python floats.
+            emb = await self.openai_client.embeddings.create(
+                input=texts[i : i + MAX_EMBEDDING_BATCH],
+                model=Model.TEXT_EMBEDDING_3_SMALL.value,
+                encoding_format="base64",
+            )
+            record_usage(emb.usage, model=emb.model)
+            data = sorted(emb.data, key=lambda d: d.index)
+            vectors.extend(
+                np.frombuffer(
+                    base64.b64decode(
+                        d.embedding  # pyright: ignore[reportArgumentType]
+                    ),
+                    dtype="<f4",
+                )
+                for d in data
+            )
+        return vectors
 
+    @traced("llm")
+    async def embeddings(self, content: RecipeRecord | str) -> Vector:
+        if not isinstance(content, str):
+            content = content.content
+        model = Model.TEXT_EMBEDDING_3_SMALL.value
+        if self.embedding_cache is not None:
+            cached = await self.embedding_cache.get(model, content)
+            if cached is not None:
+                return cached
+        if self.embedding_batcher is None:
+            (vector,) = await self._create_embeddings([content])
+        else:
+            vector = await self.embedding_batcher.submit(content)
+        if self.embedding_cache is not None:
+            await self.embedding_cache.set(model, content, vector)
+        return vector
+
+    @traced("llm")
+    async def embeddings_many(
+        self,
+        contents: Sequence[RecipeRecord | str],
+    ) -> list[Vector]:
+        texts = [c if isinstance(c, str) else c.content for c in contents]
+        model = Model.TEXT_EMBEDDING_3_SMALL.value
+        found: dict[str, Vector] = {}
+        if self.embedding_cache is not None:
+            for text in set(texts):
+                cached = await self.embedding_cache.get(model, text)
+                if cached is not None:
+                    found[text] = cached
+        missing = list(dict.fromkeys(t for t in texts if t not in found))
+        if missing:
+            vectors = await self._create_embeddings(missing)
+            for text, vector in zip(missing, vectors):
+                found[text] = vector
+                if self.embedding_cache is not None:
+                    await self.embedding_cache.set(model, text, vector)
+        return [found[text] for text in texts]
+
+    @traced("llm")
     async def random_phrase(self) -> str:
         msg = (
             "Create a random phrase that might describe a recipe. "
             "Use around five words and return only the phrase."
         )
         return await self.qa(msg)
+
+    def close(self) -> None:
+        """Close the caches. The HTTP clients are closed by whoever made them."""
+        if self.content_cache is not None:
+            self.content_cache.close()
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
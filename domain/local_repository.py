@@ -0,0 +1,390 @@
+import asyncio
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from ajolt import AsyncJolt
+from domain.ann import IVFIndex
+from domain.metrics import traced
+from domain.models import Recipe, RecipeSummary, RecipeView
+from domain.summary_store import SummaryStore
+from domain.vectors import Vector, VectorCodec, as_vector, normalize
+
+
+VECTORS_FILE = "vectors.f32"
+METADATA_FILE = "recipes.db"
+SUMMARIES_FILE = "summaries.db"
+ANN_FILE = "ivf.npz"
+CODEC_FILE = "codec.npy"
+RECIPES_TABLE = (
+    "CREATE TABLE IF NOT EXISTS recipes ("
+    "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, record BLOB NOT NULL)"
+)
+MIN_CAPACITY = 1024
+ENCODE_CHUNK = 16384
+
+
+class LocalRecipeVectorRepository:
+    """In-process vector index with the same interface as `RecipeVectorRepository`.
+
+    Vectors are L2-normalized and held in one contiguous float32 matrix, so a
+    search is a single matrix-vector product followed by `argpartition`.
+    With a `path` the matrix is a memory-mapped file and metadata lives in a
+    SQLite side store next to it, otherwise everything is kept in memory.
+    Passing an `ann` index swaps exact search for approximate search once the
+    index has enough vectors to train on.
+    Passing a `codec` keeps only compressed codes resident: candidates are
+    scored on the codes and the best `rerank_factor * n` are rescored against
+    the full-precision vectors, which are only paged in for those rows.
+    Recipes are stored in their packed binary form and read back as lazily
+    decoded `RecipeView`s. Names and summaries are also kept in a separate
+    `SummaryStore`, which is all `search_summaries` reads.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        *,
+        dim: int = 1536,
+        ann: IVFIndex | None = None,
+        codec: VectorCodec | None = None,
+        rerank_factor: int = 4,
+    ) -> None:
+        self.path = path
+        self.dim = dim
+        self.ann = ann
+        self.codec = codec
+        self.rerank_factor = rerank_factor
+        self._lock = threading.Lock()
+        if path is None:
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        else:
+            path.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path / METADATA_FILE, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._migrate()
+        self._conn.execute(RECIPES_TABLE)
+        self._conn.commit()
+        self.summaries = SummaryStore(None if path is None else path / SUMMARIES_FILE)
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM recipes").fetchone()
+        self._count: int = count
+        if len(self.summaries) < count:
+            self._backfill_summaries()
+        self._matrix = self._allocate(max(MIN_CAPACITY, 2 * count))
+        self._codes: npt.NDArray[Any] | None = None
+        self._scales = np.ones(len(self._matrix), dtype=np.float32)
+        self._ann_pending: list[int] | None = None
+        self._codec_training = False
+        if codec is not None:
+            self._load_codec(codec)
+        if ann is not None:
+            self._load_ann(ann)
+
+    def _migrate(self) -> None:
+        """Pack rows written with one column per field into records."""
+        columns = {r[1] for r in self._conn.execute("PRAGMA table_info(recipes)")}
+        if not columns or "record" in columns:
+            return
+        html = "html" if "html" in columns else "NULL"
+        rows = self._conn.execute(
+            f"SELECT row, id, name, summary, content, {html} FROM recipes"
+        ).fetchall()
+        self._conn.execute("DROP TABLE recipes")
+        self._conn.execute(RECIPES_TABLE)
+        self._conn.executemany(
+            "INSERT INTO recipes VALUES (?, ?, ?)",
+            [
+                (
+                    r[0],
+                    r[1],
+                    Recipe(
+                        id=r[1],
+                        name=r[2],
+                        summary=r[3],
+                        content=r[4],
+                        rendered_html=r[5],
+                    ).to_bytes(),
+                )
+                for r in rows
+            ],
+        )
+        self._conn.commit()
+
+    def _backfill_summaries(self) -> None:
+        records = self._conn.execute("SELECT record FROM recipes")
+        self.summaries.put_many(RecipeView(r[0]).to_summary() for r in records)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _allocate(self, capacity: int) -> npt.NDArray[np.float32]:
+        if self.path is None:
+            matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+            if self._count:
+                matrix[: self._count] = self._matrix[: self._count]
+            return matrix
+        if isinstance(getattr(self, "_matrix", None), np.memmap):
+            self._matrix.flush()  # pyright: ignore[reportAttributeAccessIssue]
+        vectors_path = self.path / VECTORS_FILE
+        with open(vectors_path, "ab") as f:
+            f.truncate(max(f.tell(), capacity * self.dim * 4))
+        return np.memmap(
+            vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+        )
+
+    def _grow(self) -> None:
+        capacity = 2 * len(self._matrix)
+        self._matrix = self._allocate(capacity)
+        scales = np.ones(capacity, dtype=np.float32)
+        scales[: self._count] = self._scales[: self._count]
+        self._scales = scales
+        if self._codes is not None:
+            codes = np.zeros((capacity, self._codes.shape[1]), self._codes.dtype)
+            codes[: self._count] = self._codes[: self._count]
+            self._codes = codes
+
+    def _load_ann(self, ann: IVFIndex) -> None:
+        if self.path is not None and (self.path / ANN_FILE).exists():
+            ann.load(self.path / ANN_FILE)
+            start, stop = len(ann), self._count
+            if start < stop:
+                ann.add(list(range(start, stop)), self._matrix[start:stop])
+        elif ann.needs_training(self._count):
+            self._train_ann(ann)
+
+    def _train_ann(self, ann: IVFIndex) -> None:
+        ann.train(self._matrix[: self._count])
+        if self.path is not None:
+            ann.save(self.path / ANN_FILE)
+
+    def _load_codec(self, codec: VectorCodec) -> None:
+        if self.path is not None and (self.path / CODEC_FILE).exists():
+            codec.load(self.path / CODEC_FILE)
+        if codec.needs_training(self._count):
+            codec.train(self._matrix[: self._count])
+            if self.path is not None:
+                codec.save(self.path / CODEC_FILE)
+        if codec.trained:
+            self._encode_all(codec)
+
+    def _encode_all(self, codec: VectorCodec) -> None:
+        """Rebuild codes from the float32 matrix, a chunk at a time."""
+        self._codes = None
+        for start in range(0, self._count, ENCODE_CHUNK):
+            stop = min(start + ENCODE_CHUNK, self._count)
+            self._store_codes(codec, start, self._matrix[start:stop])
+
+    def _store_codes(
+        self,
+        codec: VectorCodec,
+        start: int,
+        vectors: npt.NDArray[np.float32],
+    ) -> None:
+        codes, scales = codec.encode(vectors)
+        if self._codes is None:
+            self._codes = np.zeros((len(self._matrix), codes.shape[1]), codes.dtype)
+        self._codes[start : start + len(codes)] = codes
+        self._scales[start : start + len(codes)] = scales
+
+    def _add(self, recipe: Recipe, vector: Vector) -> None:
+        values = normalize(as_vector(vector))
+        if values.shape != (self.dim,):
+            raise ValueError(f"Expected a vector of length {self.dim}.")
+        with self._lock:
+            existing = self._conn.execute(
+                "SELECT row FROM recipes WHERE id = ?", (recipe.id,)
+            ).fetchone()
+            if existing is None:
+                row = self._count
+                if row >= len(self._matrix):
+                    self._grow()
+            else:
+                (row,) = existing
+            self._matrix[row] = values
+            self._conn.execute(
+                "INSERT OR REPLACE INTO recipes VALUES (?, ?, ?)",
+                (row, recipe.id, recipe.to_bytes()),
+            )
+            self._conn.commit()
+            self.summaries.put_many([recipe.to_summary()])
+            if existing is None:
+                self._count += 1
+            codec_snapshot = None
+            if self.codec is not None:
+                if self.codec.trained:
+                    self._store_codes(self.codec, row, values)
+                elif self.codec.needs_training(self._count):
+                    if not self._codec_training:
+                        codec_snapshot = self._matrix[: self._count]
+                        self._codec_training = True
+            snapshot = None
+            if self.ann is not None:
+                if self._ann_pending is not None:
+                    self._ann_pending.append(row)
+                if (
+                    existing is None
+                    and self._ann_pending is None
+                    and self.ann.needs_training(self._count)
+                ):
+                    snapshot = self._matrix[: self._count]
+                    self._ann_pending = []
+                else:
+                    self.ann.add([row], values)
+        if codec_snapshot is not None:
+            self._train_codec(codec_snapshot)
+        if snapshot is not None:
+            self._retrain_ann(snapshot)
+
+    def _train_codec(self, snapshot: npt.NDArray[np.float32]) -> None:
+        """Train the codec on `snapshot` without holding the lock.
+
+        Searches stay exact meanwhile. Once it is swapped in every row is
+        encoded, including those written while training.
+        """
+        assert self.codec is not None
+        try:
+            fitted = self.codec.fit(snapshot)
+        except BaseException:
+            with self._lock:
+                self._codec_training = False
+            raise
+        with self._lock:
+            self._codec_training = False
+            self.codec.install(fitted)
+            if self.path is not None:
+                self.codec.save(self.path / CODEC_FILE)
+            self._encode_all(self.codec)
+
+    def _retrain_ann(self, snapshot: npt.NDArray[np.float32]) -> None:
+        """Retrain the ANN index on `snapshot` without holding the lock.
+
+        Searches keep using the current index (or exact search) meanwhile.
+        Rows written while training are recorded in `_ann_pending` and are
+        reassigned against the new centroids when it is swapped in.
+        """
+        assert self.ann is not None
+        try:
+            centroids, labels = self.ann.fit(snapshot)
+        except BaseException:
+            with self._lock:
+                self._ann_pending = None
+            raise
+        with self._lock:
+            pending = sorted(set(self._ann_pending or []))
+            self._ann_pending = None
+            self.ann.install(centroids, labels)
+            if pending:
+                self.ann.add(pending, self._matrix[pending])
+            if self.path is not None:
+                self.ann.save(self.path / ANN_FILE)
+
+    def _get(self, id: str) -> RecipeView:
+        with self._lock:
+            res = self._conn.execute(
+                "SELECT record FROM recipes WHERE id = ?", (id,)
+            ).fetchone()
+        if res is None:
+            raise KeyError(id)
+        return RecipeView(res[0])
+
+    def _top(
+        self,
+        rows: npt.NDArray[np.int64] | None,
+        scores: npt.NDArray[np.float32],
+        k: int,
+    ) -> npt.NDArray[np.int64]:
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top if rows is None else rows[top]
+
+    def _nearest(self, query: Vector, n: int) -> list[int]:
+        candidates = None
+        if self.ann is not None and self.ann.trained:
+            candidates = self.ann.candidates(query)
+            if not len(candidates):
+                return []
+        if self.codec is not None and self._codes is not None:
+            if candidates is None:
+                codes = self._codes[: self._count]
+                scales = self._scales[: self._count]
+            else:
+                codes, scales = self._codes[candidates], self._scales[candidates]
+            approx = self.codec.scores(codes, scales, query)
+            candidates = self._top(candidates, approx, self.rerank_factor * n)
+        if candidates is None:
+            scores = self._matrix[: self._count] @ query
+        else:
+            scores = self._matrix[candidates] @ query
+        return self._top(candidates, scores, n).tolist()
+
+    def _search(self, vector: Vector, n: int) -> list[RecipeView]:
+        query = as_vector(vector)
+        with self._lock:
+            if not self._count or n <= 0:
+                return []
+            rows = self._nearest(query, n)
+            if not rows:
+                return []
+            placeholders = ",".join("?" * len(rows))
+            res = self._conn.execute(
+                f"SELECT row, record FROM recipes WHERE row IN ({placeholders})",
+                rows,
+            ).fetchall()
+        by_row = {r[0]: RecipeView(r[1]) for r in res}
+        return [by_row[row] for row in rows]
+
+    def _search_summaries(self, vector: Vector, n: int) -> list[RecipeSummary]:
+        query = as_vector(vector)
+        with self._lock:
+            if not self._count or n <= 0:
+                return []
+            rows = self._nearest(query, n)
+            if not rows:
+                return []
+            placeholders = ",".join("?" * len(rows))
+            res = self._conn.execute(
+                f"SELECT row, id FROM recipes WHERE row IN ({placeholders})", rows
+            ).fetchall()
+        id_by_row = dict(res)
+        ids = [id_by_row[row] for row in rows]
+        found = self.summaries.get_many(ids)
+        return [found[id] for id in ids if id in found]
+
+    @traced("repository")
+    async def add(self, *, recipe: Recipe, vector: Vector) -> None:
+        async with AsyncJolt():
+            await asyncio.to_thread(self._add, recipe, vector)
+
+    @traced("repository")
+    async def get(self, id: str) -> RecipeView:
+        async with AsyncJolt():
+            return await asyncio.to_thread(self._get, id)
+
+    @traced("repository")
+    async def search(self, vector: Vector, *, n: int = 3) -> list[RecipeView]:
+        async with AsyncJolt():
+            return await asyncio.to_thread(self._search, vector, n)
+
+    @traced("repository")
+    async def search_summaries(
+        self,
+        vector: Vector,
+        *,
+        n: int = 3,
+    ) -> list[RecipeSummary]:
+        async with AsyncJolt():
+            return await asyncio.to_thread(self._search_summaries, vector, n)
+
+    def close(self) -> None:
+        with self._lock:
+            if isinstance(self._matrix, np.memmap):
+                self._matrix.flush()
+            if self.ann is not None and self.path is not None:
+                self.ann.save(self.path / ANN_FILE)
+            self._conn.close()
+            self.summaries.close()
@@ -0,0 +1,279 @@
+from abc import ABC, abstractmethod
+import bisect
+import contextlib
+import functools
+import math
+import threading
+import time
+from typing import Any, Callable, Coroutine, Iterator, ParamSpec, TypeVar
+
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]: ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str) -> None:
+        super().__init__(name, help)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_labels(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[_labels(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        *,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: a count per bucket (plus +Inf), the sum and the count.
+        self._values: dict[Labels, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        values = self._values.get(_labels(labels))
+        return 0 if values is None else sum(values[0])
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(k, (list(c), t[0])) for k, (c, t) in self._values.items()]
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = (("le", _format_value(bound)),)
+                yield f"{self.name}_bucket{_format_labels(labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+class Registry:
+    """Counters, gauges and histograms rendered in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name!r} is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        metric = Counter(name, help)
+        self.register(metric)
+        return metric
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        metric = Gauge(name, help)
+        self.register(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        *,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, help, buckets=buckets)
+        self.register(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "colunch_http_request_duration_seconds",
+    "Time to serve an HTTP request, by route, method and status.",
+)
+SPAN_SECONDS = REGISTRY.histogram(
+    "colunch_span_duration_seconds",
+    "Time spent in an instrumented call, by component, operation and outcome.",
+)
+LLM_TOKENS = REGISTRY.counter(
+    "colunch_llm_tokens_total",
+    "Tokens reported by the OpenAI API, by model and kind.",
+)
+FETCHED_BYTES = REGISTRY.counter(
+    "colunch_fetched_bytes_total",
+    "Bytes downloaded from recipe sources, by source.",
+)
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.histogram(
+    "colunch_openai_queue_seconds",
+    "Time OpenAI requests waited for a rate-limit slot, by endpoint and priority.",
+)
+RATE_LIMIT_RETRIES = REGISTRY.counter(
+    "colunch_openai_retries_total",
+    "OpenAI requests retried, by endpoint and status code or error.",
+)
+CACHE_HITS = REGISTRY.gauge(
+    "colunch_cache_hits",
+    "Cache hits since start, by cache.",
+)
+CACHE_MISSES = REGISTRY.gauge(
+    "colunch_cache_misses",
+    "Cache misses since start, by cache.",
+)
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "colunch_cache_hit_ratio",
+    "Fraction of cache lookups that hit since start, by cache.",
+)
+
+
+def traced(
+    component: str,
+) -> Callable[
+    [Callable[P, Coroutine[Any, Any, T]]], Callable[P, Coroutine[Any, Any, T]]
+]:
+    """Time every call of an async function into `SPAN_SECONDS`."""
+
+    def decorator(
+        fn: Callable[P, Coroutine[Any, Any, T]],
+    ) -> Callable[P, Coroutine[Any, Any, T]]:
+        operation = fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await fn(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                SPAN_SECONDS.observe(
+                    time.perf_counter() - start,
+                    component=component,
+                    operation=operation,
+                    outcome=outcome,
+                )
+
+        return wrapper
+
+    return decorator
+
+
+def record_usage(usage: Any, *, model: str) -> None:
+    """Count the tokens in an OpenAI `usage` object, if there is one."""
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if isinstance(usage, dict):
+            tokens = usage.get(kind)
+        else:
+            tokens = getattr(usage, kind, None)
+        if tokens:
+            LLM_TOKENS.inc(tokens, model=model, kind=kind.removesuffix("_tokens"))
+
+
+def record_cache(name: str, *, hits: int, misses: int) -> None:
+    CACHE_HITS.set(hits, cache=name)
+    CACHE_MISSES.set(misses, cache=name)
+    lookups = hits + misses
+    CACHE_HIT_RATIO.set(hits / lookups if lookups else 0.0, cache=name)
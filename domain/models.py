@@ -1,30 +1,160 @@
-import markdown2  # pyright: ignore[reportMissingTypeStubs]
+from dataclasses import dataclass
+import struct
+from typing import Any
 
+from pydantic import BaseModel, Field
 
+from domain.rendering import render_markdown
+
+
+# Magic, format version, then the byte lengths of id, name, summary, content and
+# html, followed by the fields as UTF-8 in that order. No html is NO_HTML.
+HEADER = struct.Struct("<2sB5I")
+MAGIC = b"RC"
+VERSION = 1
+NO_HTML = 0xFFFFFFFF
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class RecipeSummary:
+    """The fields a list of recipes shows."""
+
+    id: str
+    name: str
+    summary: str
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
 class Recipe:
-    def __init__(
-        self,
-        *,
-        id: str,
-        name: str,
-        summary: str,
-        content: str,
-    ) -> None:
-        self.id = id
-        self.name = name
-        self.summary = summary
-        self.content = content
+    id: str
+    name: str
+    summary: str
+    content: str
+    rendered_html: str | None = None
 
     @property
     def html(self) -> str:
-        return markdown2.markdown(  # pyright: ignore[reportUnknownVariableType, reportUnknownMemberType]
-            self.content
-        )
+        """HTML rendered when the recipe was created, or on demand for older ones."""
+        if self.rendered_html is None:
+            return render_markdown(self.content)
+        return self.rendered_html
+
+    def to_summary(self) -> RecipeSummary:
+        return RecipeSummary(id=self.id, name=self.name, summary=self.summary)
 
     def to_dict(self) -> dict[str, str]:
+        """The source fields, without the rendered HTML.
+
+        Used as Pinecone metadata, which is size limited, so the HTML is
+        rendered again on read and cached by `domain.rendering` instead.
+        """
         return {
             "id": self.id,
             "name": self.name,
             "summary": self.summary,
             "content": self.content,
         }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any], *, id: str | None = None) -> "Recipe":
+        return cls(
+            id=data["id"] if id is None else id,
+            name=data.get("name", "No name"),
+            summary=data.get("summary", "No summary"),
+            content=data["content"],
+            # Recipes stored while the HTML was kept in Pinecone have it.
+            rendered_html=data.get("html"),
+        )
+
+    def to_bytes(self) -> bytes:
+        fields = [s.encode() for s in (self.id, self.name, self.summary, self.content)]
+        html = b"" if self.rendered_html is None else self.rendered_html.encode()
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            *(len(f) for f in fields),
+            NO_HTML if self.rendered_html is None else len(html),
+        )
+        return b"".join([header, *fields, html])
+
+    @classmethod
+    def from_bytes(cls, data: bytes | memoryview) -> "Recipe":
+        return RecipeView(data).to_recipe()
+
+
+class RecipeView:
+    """Read-only recipe over its `Recipe.to_bytes` encoding.
+
+    Only the header is parsed up front. Each field is decoded from the buffer
+    when it is read, so listing recipes never decodes their content.
+    """
+
+    __slots__ = ("_buffer", "_offsets", "_has_html")
+
+    def __init__(self, data: bytes | memoryview) -> None:
+        buffer = memoryview(data)
+        magic, version, *lengths = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not an encoded recipe.")
+        self._has_html = lengths[-1] != NO_HTML
+        if not self._has_html:
+            lengths[-1] = 0
+        offsets = [HEADER.size]
+        for length in lengths:
+            offsets.append(offsets[-1] + length)
+        if offsets[-1] > len(buffer):
+            raise ValueError("Truncated recipe.")
+        self._buffer = buffer
+        self._offsets = offsets
+
+    def _field(self, i: int) -> str:
+        return str(self._buffer[self._offsets[i] : self._offsets[i + 1]], "utf-8")
+
+    @property
+    def id(self) -> str:
+        return self._field(0)
+
+    @property
+    def name(self) -> str:
+        return self._field(1)
+
+    @property
+    def summary(self) -> str:
+        return self._field(2)
+
+    @property
+    def content(self) -> str:
+        return self._field(3)
+
+    @property
+    def rendered_html(self) -> str | None:
+        return self._field(4) if self._has_html else None
+
+    @property
+    def html(self) -> str:
+        html = self.rendered_html
+        return render_markdown(self.content) if html is None else html
+
+    def to_recipe(self) -> Recipe:
+        return Recipe(
+            id=self.id,
+            name=self.name,
+            summary=self.summary,
+            content=self.content,
+            rendered_html=self.rendered_html,
+        )
+
+    def to_summary(self) -> RecipeSummary:
+        return RecipeSummary(id=self.id, name=self.name, summary=self.summary)
+
+    def to_dict(self) -> dict[str, str]:
+        return self.to_recipe().to_dict()
+
+
+RecipeRecord = Recipe | RecipeView
+
+
+class GeneratedRecipe(BaseModel):
+    name: str = Field(min_length=1)
+    summary: str = Field(min_length=1)
+    content: str = Field(min_length=1)
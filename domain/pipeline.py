@@ -0,0 +1,112 @@
+import asyncio
+from dataclasses import dataclass, field
+import logging
+import time
+from typing import Any, Awaitable, Callable, Sequence
+
+from domain.metrics import SPAN_SECONDS
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Stage:
+    """A named step called with the results of `deps` as keyword arguments."""
+
+    name: str
+    fn: Callable[..., Awaitable[Any]]
+    deps: tuple[str, ...] = ()
+
+
+@dataclass
+class PipelineRun:
+    results: dict[str, Any] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)
+
+    def __getitem__(self, name: str) -> Any:
+        return self.results[name]
+
+
+class Pipeline:
+    """Runs a DAG of stages, starting each as soon as its dependencies finish.
+
+    Stage names and the keyword inputs passed to `run` share one namespace, so a
+    stage can depend on either. If any stage fails the rest are cancelled and the
+    error is raised.
+    """
+
+    def __init__(self, name: str, stages: Sequence[Stage]) -> None:
+        self.name = name
+        self.stages = list(stages)
+        names = [s.name for s in self.stages]
+        if len(set(names)) != len(names):
+            raise ValueError("Stage names must be unique.")
+        self._check_acyclic()
+
+    def _check_acyclic(self) -> None:
+        by_name = {s.name: s for s in self.stages}
+        done: set[str] = set()
+        visiting: set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in done or name not in by_name:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle through stage {name!r}.")
+            visiting.add(name)
+            for dep in by_name[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in by_name:
+            visit(name)
+
+    async def run(self, **inputs: Any) -> PipelineRun:
+        run = PipelineRun()
+        missing = {
+            dep
+            for s in self.stages
+            for dep in s.deps
+            if dep not in inputs and dep not in {t.name for t in self.stages}
+        }
+        if missing:
+            raise ValueError(f"Missing pipeline inputs: {sorted(missing)}.")
+
+        start = time.perf_counter()
+        tasks: dict[str, asyncio.Task[Any]] = {}
+
+        async def execute(stage: Stage) -> Any:
+            kwargs: dict[str, Any] = {}
+            for dep in stage.deps:
+                kwargs[dep] = inputs[dep] if dep in inputs else await tasks[dep]
+            began = time.perf_counter()
+            result = await stage.fn(**kwargs)
+            run.timings[stage.name] = time.perf_counter() - began
+            SPAN_SECONDS.observe(
+                run.timings[stage.name],
+                component="pipeline",
+                operation=f"{self.name}.{stage.name}",
+                outcome="ok",
+            )
+            run.results[stage.name] = result
+            return result
+
+        for stage in self.stages:
+            tasks[stage.name] = asyncio.create_task(execute(stage))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        total = time.perf_counter() - start
+        logger.info(
+            "Pipeline %s finished in %.2fs: %s",
+            self.name,
+            total,
+            ", ".join(f"{k}={v:.2f}s" for k, v in run.timings.items()),
+        )
+        return run
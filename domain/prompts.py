@@ -66,3 +66,14 @@ Use this example to format your responses:
     One last chance to really sell the dish here.
 
 """.strip()
+
+
+STRUCTURED_RECIPE_PROMPT = f"""
+{CREATE_RECIPE_PROMPT}
+
+Respond with a JSON object with exactly these keys:
+
+- "name": an informative but concise name for the recipe.
+- "summary": an exciting but informative summary of around 25 words.
+- "content": the full recipe, formatted as in the example above.
+""".strip()
@@ -0,0 +1,344 @@
+import asyncio
+import contextlib
+import contextvars
+from enum import IntEnum
+import heapq
+import itertools
+import logging
+import random
+import re
+import time
+from typing import AsyncIterator, Callable, Iterator
+
+import httpx
+
+from domain.metrics import RATE_LIMIT_RETRIES, RATE_LIMIT_WAIT_SECONDS
+
+
+logger = logging.getLogger(__name__)
+
+
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+# OpenAI API paths, by the endpoint class that limits them.
+ENDPOINTS = {
+    "chat": "/chat/completions",
+    "embeddings": "/embeddings",
+    "audio": "/audio/",
+}
+
+
+class Priority(IntEnum):
+    interactive = 0
+    background = 1
+
+
+PRIORITY: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "priority", default=Priority.interactive
+)
+
+
+@contextlib.contextmanager
+def priority(value: Priority) -> Iterator[None]:
+    """Run the OpenAI calls made in this block, and tasks it starts, at `value`."""
+    token = PRIORITY.set(value)
+    try:
+        yield
+    finally:
+        PRIORITY.reset(token)
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Seconds in an OpenAI reset header such as "1m30.5s" or "20ms"."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * DURATION_UNITS[unit] for n, unit in parts)
+
+
+def retry_after(headers: httpx.Headers) -> float | None:
+    if (ms := headers.get("retry-after-ms")) is not None:
+        with contextlib.suppress(ValueError):
+            return float(ms) / 1000
+    return parse_duration(headers.get("retry-after"))
+
+
+class RateLimiter:
+    """Admits requests to one endpoint class in priority order.
+
+    At most `max_concurrency` requests are in flight, of which background ones
+    may use all but `reserve`, so interactive requests never queue behind a
+    backlog of background work. Once the API has reported its requests-per-
+    minute limit a token bucket paces request starts to it, and when the API
+    says the quota is spent, or answers 429, admission pauses until it resets.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_concurrency: int = 8,
+        reserve: int = 1,
+        requests_per_minute: float | None = None,
+    ) -> None:
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.reserve = min(reserve, max_concurrency - 1)
+        self.active = 0
+        self._background = 0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._order = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+        self._paused_until = 0.0
+        self._capacity = requests_per_minute
+        self._tokens = requests_per_minute or 0.0
+        self._refilled = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+    def _refill(self, now: float) -> None:
+        if self._capacity is None:
+            return
+        rate = self._capacity / 60
+        self._tokens = min(self._capacity, self._tokens + (now - self._refilled) * rate)
+        self._refilled = now
+
+    def _delay(self, now: float) -> float:
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._capacity is None:
+            return 0.0
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / (self._capacity / 60)
+
+    def _wake(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._waiters and self.active < self.max_concurrency:
+            level, _, fut = self._waiters[0]
+            if fut.done():
+                heapq.heappop(self._waiters)
+                continue
+            if (
+                level == Priority.background
+                and self._background >= self.max_concurrency - self.reserve
+            ):
+                # Everything queued behind a background waiter is background too.
+                return
+            now = time.monotonic()
+            delay = self._delay(now)
+            if delay > 0:
+                if self._timer is None:
+                    loop = asyncio.get_running_loop()
+                    self._timer = loop.call_later(delay, self._wake)
+                return
+            heapq.heappop(self._waiters)
+            self.active += 1
+            if level == Priority.background:
+                self._background += 1
+            if self._capacity is not None:
+                self._tokens -= 1
+            fut.set_result(None)
+
+    async def acquire(self, level: Priority | None = None) -> Priority:
+        """Wait for a slot; pass the returned priority to `release`."""
+        level = PRIORITY.get() if level is None else level
+        fut: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (level, next(self._order), fut))
+        start = time.perf_counter()
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Admitted, but cancelled before it could run.
+                self.release(level)
+            raise
+        RATE_LIMIT_WAIT_SECONDS.observe(
+            time.perf_counter() - start, endpoint=self.name, priority=level.name
+        )
+        return level
+
+    def release(self, level: Priority) -> None:
+        self.active -= 1
+        if level == Priority.background:
+            self._background -= 1
+        self._dispatch()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, level: Priority | None = None) -> AsyncIterator[None]:
+        level = await self.acquire(level)
+        try:
+            yield
+        finally:
+            self.release(level)
+
+    def pause(self, seconds: float) -> None:
+        """Admit nothing for `seconds`; later pauses only ever extend it."""
+        until = time.monotonic() + seconds
+        if until > self._paused_until:
+            logger.warning("Pausing %s requests for %.1fs.", self.name, seconds)
+            self._paused_until = until
+
+    def update(self, headers: httpx.Headers) -> None:
+        """Adapt to the rate-limit headers of an API response."""
+        limit = headers.get("x-ratelimit-limit-requests")
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        with contextlib.suppress(ValueError):
+            if limit is not None and float(limit) > 0:
+                now = time.monotonic()
+                self._refill(now)
+                if self._capacity is None:
+                    self._tokens = float(limit)
+                self._capacity = float(limit)
+            if remaining is not None and self._capacity is not None:
+                # The API's count includes other clients sharing the key.
+                self._tokens = min(self._tokens, float(remaining))
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None or remaining.strip() not in ("0", "0.0"):
+                continue
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if reset:
+                self.pause(reset)
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Holds a rate-limit slot until a response body has been read or closed."""
+
+    def __init__(
+        self,
+        stream: httpx.AsyncByteStream,
+        release: Callable[[], None],
+    ) -> None:
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class RateLimits:
+    """One `RateLimiter` per OpenAI endpoint class, plus the retry policy."""
+
+    def __init__(
+        self,
+        *,
+        chat: int = 16,
+        embeddings: int = 8,
+        audio: int = 4,
+        reserve: int = 2,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+    ) -> None:
+        self.limiters = {
+            name: RateLimiter(name, max_concurrency=concurrency, reserve=reserve)
+            for name, concurrency in (
+                ("chat", chat),
+                ("embeddings", embeddings),
+                ("audio", audio),
+            )
+        }
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def for_path(self, path: str) -> RateLimiter | None:
+        for name, fragment in ENDPOINTS.items():
+            if fragment in path:
+                return self.limiters[name]
+        return None
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter, so retries from many callers spread out."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Sends OpenAI requests through `RateLimits`, retrying transient failures.
+
+    Wrapping the transport covers every call, streamed or not, made with the
+    SDK or raw, without each caller handling 429s. Clients using it should not
+    retry themselves.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limits: RateLimits) -> None:
+        self.transport = transport
+        self.limits = limits
+        self._closed = False
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = self.limits.for_path(request.url.path)
+        if limiter is None:
+            return await self.transport.handle_async_request(request)
+        attempt = 0
+        while True:
+            retrying = attempt < self.limits.max_retries
+            level = await limiter.acquire()
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                limiter.release(level)
+                if not retrying:
+                    raise
+                RATE_LIMIT_RETRIES.inc(endpoint=limiter.name, reason=type(e).__name__)
+                await asyncio.sleep(self.limits.backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                limiter.release(level)
+                raise
+            limiter.update(response.headers)
+            if not (retrying and response.status_code in RETRY_STATUSES):
+                if response.is_closed:
+                    # Already read in full, as some transports do.
+                    limiter.release(level)
+                    return response
+                assert isinstance(response.stream, httpx.AsyncByteStream)
+                response.stream = _ReleasingStream(
+                    response.stream, lambda: limiter.release(level)
+                )
+                return response
+            await response.aclose()
+            limiter.release(level)
+            RATE_LIMIT_RETRIES.inc(
+                endpoint=limiter.name, reason=str(response.status_code)
+            )
+            delay = retry_after(response.headers)
+            if response.status_code == 429:
+                # Pausing holds back every caller, not just this one.
+                limiter.pause(self.limits.backoff(attempt) if delay is None else delay)
+                delay = None
+            if delay is None:
+                delay = self.limits.backoff(attempt)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        # Shared by several clients, each of which closes it.
+        if not self._closed:
+            self._closed = True
+            await self.transport.aclose()
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+import hashlib
+import threading
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    import markdown2  # pyright: ignore[reportMissingTypeStubs]
+
+
+class MarkdownRenderer:
+    """Renders markdown with a reused converter, caching by content hash.
+
+    `markdown2.markdown` builds and compiles a new converter on every call. A
+    `Markdown` instance holds per-conversion state, so each thread gets its own.
+    """
+
+    def __init__(self, *, max_entries: int = 512) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[bytes, str] = OrderedDict()
+
+    def _converter(self) -> "markdown2.Markdown":
+        converter = getattr(self._local, "converter", None)
+        if converter is None:
+            # Imported on first use, as most processes only serve stored HTML.
+            import markdown2  # pyright: ignore[reportMissingTypeStubs]
+
+            converter = self._local.converter = markdown2.Markdown()
+        return converter
+
+    def render(self, content: str) -> str:
+        key = hashlib.blake2b(content.encode(), digest_size=16).digest()
+        with self._lock:
+            html = self._cache.get(key)
+            if html is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+        convert = self._converter().convert  # pyright: ignore[reportUnknownMemberType]
+        html = str(convert(content))
+        with self._lock:
+            self._cache[key] = html
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return html
+
+
+RENDERER = MarkdownRenderer()
+
+
+def render_markdown(content: str) -> str:
+    return RENDERER.render(content)
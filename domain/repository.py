@@ -1,37 +1,82 @@
 import asyncio
-
-import pinecone  # pyright: ignore[reportMissingTypeStubs]
+from typing import TYPE_CHECKING, Any, Coroutine, Protocol, Sequence
 
 from ajolt import AsyncJolt
-from domain.models import Recipe
+from domain.metrics import traced
+from domain.models import Recipe, RecipeRecord, RecipeSummary
+from domain.summary_store import SummaryStore
+
+
+if TYPE_CHECKING:
+    import pinecone  # pyright: ignore[reportMissingTypeStubs]
+
+    from domain.vectors import Vector
+
+
+class RecipeRepository(Protocol):
+    # Declared as returning coroutines, rather than as `async def`, so methods
+    # wrapped by `traced` match too: pyright infers a narrower type for the
+    # coroutine an `async def` returns.
+    def add(self, *, recipe: Recipe, vector: "Vector") -> Coroutine[Any, Any, None]: ...
+
+    def get(self, id: str) -> Coroutine[Any, Any, RecipeRecord]: ...
+
+    def search(
+        self,
+        vector: "Vector",
+        *,
+        n: int = 3,
+    ) -> Coroutine[Any, Any, Sequence[RecipeRecord]]:
+        """Nearest recipes first, as `Recipe`s or lazily decoded `RecipeView`s."""
+        ...
+
+    def search_summaries(
+        self,
+        vector: "Vector",
+        *,
+        n: int = 3,
+    ) -> Coroutine[Any, Any, list[RecipeSummary]]:
+        """Like `search`, but only the fields a list of results shows."""
+        ...
+
+    def close(self) -> None: ...
 
 
 class RecipeVectorRepository:
     def __init__(
         self,
         *,
-        client: pinecone.Pinecone | None = None,
+        client: "pinecone.Pinecone | None" = None,
         index_name: str = "recipes",
+        summaries: SummaryStore | None = None,
     ) -> None:
+        # Imported here, as it is slow and only this backend needs it.
+        import pinecone  # pyright: ignore[reportMissingTypeStubs]
+
         self.client = pinecone.Pinecone() if client is None else client
+        self.summaries = summaries
         idx = self.client.Index(index_name)  # pyright: ignore[reportUnknownMemberType]
         if idx is None:
             raise ValueError
         self.idx = idx
 
-    async def add(self, *, recipe: Recipe, vector: list[float]) -> None:
+    @traced("repository")
+    async def add(self, *, recipe: Recipe, vector: "Vector") -> None:
         async with AsyncJolt():
             await asyncio.to_thread(
                 self.idx.upsert,  # pyright: ignore[reportUnknownArgumentType, reportUnknownMemberType]
                 vectors=[
                     {
                         "id": recipe.id,
-                        "values": vector,
+                        "values": vector.tolist(),
                         "metadata": recipe.to_dict(),
                     }
                 ],
             )
+        if self.summaries is not None:
+            await self.summaries.put(recipe.to_summary())
 
+    @traced("repository")
     async def get(self, id: str) -> Recipe:
         async with AsyncJolt():
             res = await asyncio.to_thread(
@@ -39,28 +84,56 @@ class RecipeVectorRepository:
                 ids=[id],
             )
         recipe = res["vectors"][id]
-        return Recipe(
-            **(
-                {"id": id, "name": "No name", "summary": "No summary"}
-                | recipe["metadata"]
-            )
-        )
+        return Recipe.from_dict(recipe["metadata"], id=id)
 
-    async def search(self, vector: list[float], *, n: int = 3) -> list[Recipe]:
+    @traced("repository")
+    async def search(self, vector: "Vector", *, n: int = 3) -> list[RecipeRecord]:
         async with AsyncJolt():
             res = await asyncio.to_thread(
                 self.idx.query,  # pyright: ignore[reportUnknownArgumentType, reportUnknownMemberType]
-                vector=vector,
+                vector=vector.tolist(),
                 top_k=n,
                 include_metadata=True,
             )
 
-        return [
-            Recipe(
-                **(
-                    {"id": m["id"], "name": "No name", "summary": "No summary"}
-                    | m["metadata"]
-                )
+        return [Recipe.from_dict(m["metadata"], id=m["id"]) for m in res["matches"]]
+
+    @traced("repository")
+    async def search_summaries(
+        self,
+        vector: "Vector",
+        *,
+        n: int = 3,
+    ) -> list[RecipeSummary]:
+        """Query ids only and look the list fields up in the summary store."""
+        if self.summaries is None:
+            return [r.to_summary() for r in await self.search(vector, n=n)]
+        async with AsyncJolt():
+            res = await asyncio.to_thread(
+                self.idx.query,  # pyright: ignore[reportUnknownArgumentType, reportUnknownMemberType]
+                vector=vector.tolist(),
+                top_k=n,
+                include_metadata=False,
             )
-            for m in res["matches"]
-        ]
+        ids: list[str] = [m["id"] for m in res["matches"]]
+        found = await self.summaries.get(ids)
+        missing = [id for id in ids if id not in found]
+        if missing:
+            # Recipes stored before there was a summary store.
+            async with AsyncJolt():
+                fetched = await asyncio.to_thread(
+                    self.idx.fetch,  # pyright: ignore[reportUnknownArgumentType, reportUnknownMemberType]
+                    ids=missing,
+                )
+            backfill = [
+                Recipe.from_dict(v["metadata"], id=id).to_summary()
+                for id, v in fetched["vectors"].items()
+            ]
+            async with AsyncJolt():
+                await asyncio.to_thread(self.summaries.put_many, backfill)
+            found.update((s.id, s) for s in backfill)
+        return [found[id] for id in ids if id in found]
+
+    def close(self) -> None:
+        if self.summaries is not None:
+            self.summaries.close()
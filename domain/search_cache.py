@@ -0,0 +1,151 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+import sqlite3
+import threading
+import time
+
+from ajolt import AsyncJolt
+from domain.text import normalize_text
+
+
+@dataclass(frozen=True)
+class CachedSearch:
+    ids: list[str]
+    fragment: str
+
+
+Entry = tuple[int, float, CachedSearch]
+
+
+class SearchResultCache:
+    """Bounded, TTL'd cache of search results keyed by normalized query and `n`.
+
+    Every entry is stamped with the cache version at the time the search started.
+    `invalidate` bumps the version, so results computed before a new recipe was
+    stored are never served again, including searches still in flight.
+    With a `path` the version also follows a SQLite file shared by every
+    process, so a recipe stored by a standalone worker invalidates the web
+    process's cache too. The shared part is kept in memory and only re-read
+    by `sync`, at most every `poll_interval` seconds, so lookups do no I/O.
+    `data_version` only changes for commits made by other connections, so our
+    own bumps are counted locally.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 1024,
+        ttl: float | None = 300,
+        path: Path | None = None,
+        poll_interval: float = 1.0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.poll_interval = poll_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, int], Entry] = OrderedDict()
+        self._local_version = 0
+        self._shared_version = 0
+        self._polled_at = -float("inf")
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _shared(self) -> sqlite3.Connection | None:
+        # Connected on first use so building the cache does no I/O.
+        if self.path is None or self._conn is not None:
+            return self._conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generation ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)"
+        )
+        self._conn.execute("INSERT OR IGNORE INTO generation VALUES (0, 0)")
+        self._conn.commit()
+        return self._conn
+
+    def _read_shared(self) -> int:
+        with self._lock:
+            conn = self._shared()
+            if conn is None:
+                return 0
+            (shared,) = conn.execute("PRAGMA data_version").fetchone()
+            return shared
+
+    def _bump_shared(self) -> None:
+        with self._lock:
+            conn = self._shared()
+            if conn is not None:
+                conn.execute("UPDATE generation SET value = value + 1")
+                conn.commit()
+
+    @property
+    def version(self) -> int:
+        return self._local_version + self._shared_version
+
+    async def sync(self) -> None:
+        """Pick up invalidations made by other processes."""
+        if self.path is None:
+            return
+        now = time.monotonic()
+        if now - self._polled_at < self.poll_interval:
+            return
+        self._polled_at = now
+        async with AsyncJolt():
+            shared = await asyncio.to_thread(self._read_shared)
+        if shared != self._shared_version:
+            self._shared_version = shared
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, query: str, n: int) -> CachedSearch | None:
+        key = (normalize_text(query), n)
+        entry = self._entries.get(key)
+        if entry is not None:
+            version, stored_at, result = entry
+            expired = self.ttl is not None and time.monotonic() - stored_at > self.ttl
+            if version == self.version and not expired:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def set(
+        self,
+        query: str,
+        n: int,
+        result: CachedSearch,
+        *,
+        version: int,
+    ) -> None:
+        if version != self.version:
+            return
+        key = (normalize_text(query), n)
+        self._entries[key] = (version, time.monotonic(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def invalidate(self) -> None:
+        # Bumped before the write, so in-flight searches are dropped at once.
+        self._local_version += 1
+        self._entries.clear()
+        if self.path is not None:
+            async with AsyncJolt():
+                await asyncio.to_thread(self._bump_shared)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,45 +1,339 @@
+import asyncio
 import io
-from typing import Sequence
+import logging
+from typing import TYPE_CHECKING, Awaitable, BinaryIO, Callable, Sequence
 import uuid
 
-from domain.llm_service import LLMService
-from domain.models import Recipe
-from domain.repository import RecipeVectorRepository
+from pydantic import ValidationError
+
+from ajolt import AsyncJolt
+from domain.events import DONE, ERROR, RESET, STAGE, Emit, Event, EventHub
+from domain.jobs import Job, JobQueue
+from domain.lexical import LexicalIndex, reciprocal_rank_fusion, tokenize
+from domain.models import GeneratedRecipe, Recipe, RecipeRecord, RecipeSummary
+from domain.pipeline import Pipeline, Stage
+from domain.rate_limit import Priority, priority
+from domain.rendering import render_markdown
+from domain.repository import RecipeRepository
+from domain.search_cache import SearchResultCache
+
+
+if TYPE_CHECKING:
+    # The OpenAI SDK and numpy are slow to import and only needed once there is
+    # an LLM or a repository, which import them.
+    from domain.llm_service import LLMService
+    from domain.vectors import Vector
+
+
+logger = logging.getLogger(__name__)
+
+# Queries this short whose terms all appear in enough recipes are answered
+# from the lexical index alone, without embedding the query.
+EXACT_MAX_TERMS = 3
+
+
+async def _recipe_stored(
+    recipe: Recipe,
+    *,
+    search_cache: SearchResultCache | None,
+    lexical: LexicalIndex | None,
+) -> None:
+    if lexical is not None:
+        async with AsyncJolt():
+            await asyncio.to_thread(lexical.add, recipe.to_summary(), recipe.content)
+    if search_cache is not None:
+        await search_cache.invalidate()
 
 
 async def store_recipe(
     recipe: Recipe,
     *,
-    repository: RecipeVectorRepository,
-    llm: LLMService,
+    repository: RecipeRepository,
+    llm: "LLMService",
+    search_cache: SearchResultCache | None = None,
+    lexical: LexicalIndex | None = None,
+    vector: "Vector | None" = None,
 ) -> None:
-    vector = await llm.embeddings(recipe)
+    """Index and store `recipe`, embedding it unless its `vector` is given."""
+    if vector is None:
+        vector = await llm.embeddings(recipe)
     await repository.add(recipe=recipe, vector=vector)
+    await _recipe_stored(recipe, search_cache=search_cache, lexical=lexical)
+
+
+async def _lexical_search(
+    query: str,
+    *,
+    lexical: LexicalIndex,
+    n: int,
+    require_all: bool = False,
+) -> list[str]:
+    # Searching may first reload the index after another process wrote to it.
+    async with AsyncJolt():
+        hits = await asyncio.to_thread(
+            lexical.search, query, n=n, require_all=require_all
+        )
+    return [id for id, _ in hits]
+
+
+async def _exact_matches(
+    query: str,
+    *,
+    lexical: LexicalIndex,
+    n: int,
+) -> list[str] | None:
+    if len(tokenize(query)) > EXACT_MAX_TERMS:
+        return None
+    ids = await _lexical_search(query, lexical=lexical, n=n, require_all=True)
+    return ids if len(ids) >= n else None
+
+
+async def _lexical_summaries(
+    ids: list[str],
+    *,
+    lexical: LexicalIndex,
+) -> list[RecipeSummary]:
+    async with AsyncJolt():
+        return await asyncio.to_thread(lexical.summaries, ids)
 
 
 async def search_recipes(
-    content: Recipe | str,
+    content: RecipeRecord | str,
     *,
-    repository: RecipeVectorRepository,
-    llm: LLMService,
+    repository: RecipeRepository,
+    llm: "LLMService",
     n: int = 3,
-) -> list[Recipe]:
-    if isinstance(content, Recipe):
+    lexical: LexicalIndex | None = None,
+) -> list[RecipeRecord]:
+    """Semantic search, or hybrid search fused with `lexical` when given."""
+    if not isinstance(content, str):
         content = content.content
+    if lexical is None:
+        vector = await llm.embeddings(content)
+        return list(await repository.search(vector, n=n))
+
+    ids = await _exact_matches(content, lexical=lexical, n=n)
+    found: dict[str, RecipeRecord] = {}
+    if ids is None:
+        vector = await llm.embeddings(content)
+        semantic = await repository.search(vector, n=n)
+        found = {r.id: r for r in semantic}
+        lexical_ids = await _lexical_search(content, lexical=lexical, n=n)
+        ids = reciprocal_rank_fusion([list(found), lexical_ids])[:n]
+    missing = [id for id in ids if id not in found]
+    for record in await asyncio.gather(*(repository.get(id) for id in missing)):
+        found[record.id] = record
+    return [found[id] for id in ids]
+
+
+async def search_summaries(
+    content: str,
+    *,
+    repository: RecipeRepository,
+    llm: "LLMService",
+    n: int = 3,
+    lexical: LexicalIndex | None = None,
+) -> list[RecipeSummary]:
+    """Like `search_recipes`, returning only the fields a result list shows."""
+    if lexical is None:
+        vector = await llm.embeddings(content)
+        return await repository.search_summaries(vector, n=n)
+
+    ids = await _exact_matches(content, lexical=lexical, n=n)
+    if ids is not None:
+        return await _lexical_summaries(ids, lexical=lexical)
     vector = await llm.embeddings(content)
-    return await repository.search(vector, n=n)
+    semantic = await repository.search_summaries(vector, n=n)
+    lexical_ids = await _lexical_search(content, lexical=lexical, n=n)
+    found = {s.id: s for s in await _lexical_summaries(lexical_ids, lexical=lexical)}
+    found.update((s.id, s) for s in semantic)
+    ids = reciprocal_rank_fusion([[s.id for s in semantic], lexical_ids])[:n]
+    return [found[id] for id in ids]
 
 
 async def create_recipe(
     *,
     description: str,
-    images: Sequence[io.BufferedReader],
-    repository: RecipeVectorRepository,
-    llm: LLMService,
+    images: Sequence[BinaryIO],
+    repository: RecipeRepository,
+    llm: "LLMService",
+    search_cache: SearchResultCache | None = None,
+    lexical: LexicalIndex | None = None,
+    structured: bool = False,
+    emit: Emit | None = None,
+) -> Recipe:
+    """Generate, name, summarise, embed and store a new recipe.
+
+    With `structured` the links are extracted locally and the recipe, name and
+    summary come back from one JSON completion, falling back to separate calls
+    if the reply does not validate. With `emit` the stages and the recipe text
+    are reported as they happen.
+    """
+    if not (description or images):
+        raise ValueError("Provide a description or images.")
+
+    async def embed(content: str) -> "Vector":
+        if emit is not None:
+            emit(Event(STAGE, "indexing"))
+        return await llm.embeddings(content)
+
+    async def store(name: str, summary: str, content: str, vector: "Vector") -> Recipe:
+        # Recipes never change, so render once here rather than on every view.
+        async with AsyncJolt():
+            html = await asyncio.to_thread(render_markdown, content)
+        recipe = Recipe(
+            id=uuid.uuid4().hex,
+            name=name,
+            summary=summary,
+            content=content,
+            rendered_html=html,
+        )
+        await store_recipe(
+            recipe,
+            repository=repository,
+            llm=llm,
+            search_cache=search_cache,
+            lexical=lexical,
+            vector=vector,
+        )
+        return recipe
+
+    if structured:
+        return await _create_structured_recipe(
+            description=description,
+            images=images,
+            llm=llm,
+            embed=embed,
+            store=store,
+            emit=emit,
+        )
+
+    # The name, summary and embedding only depend on the generated content.
+    pipeline = Pipeline(
+        "create_recipe",
+        [
+            Stage(
+                "content",
+                lambda: llm.create_recipe(
+                    description=description, images=images, emit=emit
+                ),
+            ),
+            Stage("name", lambda content: llm.recipe_name(content), deps=("content",)),
+            Stage(
+                "summary",
+                lambda content: llm.recipe_summary(content),
+                deps=("content",),
+            ),
+            Stage("vector", embed, deps=("content",)),
+            Stage("recipe", store, deps=("name", "summary", "content", "vector")),
+        ],
+    )
+    run = await pipeline.run()
+    return run["recipe"]
+
+
+async def _create_structured_recipe(
+    *,
+    description: str,
+    images: Sequence[BinaryIO],
+    llm: "LLMService",
+    embed: Callable[[str], Awaitable["Vector"]],
+    store: Callable[[str, str, str, "Vector"], Awaitable[Recipe]],
+    emit: Emit | None = None,
 ) -> Recipe:
-    content = await llm.create_recipe(description=description, images=images)
-    name = await llm.recipe_name(content)
-    summary = await llm.recipe_summary(content)
-    recipe = Recipe(id=uuid.uuid4().hex, name=name, summary=summary, content=content)
-    await store_recipe(recipe, repository=repository, llm=llm)
-    return recipe
+    async def expand() -> str:
+        if not description:
+            return ""
+        return await llm.expand_description(description, local_links=True, emit=emit)
+
+    async def generate(text: str) -> GeneratedRecipe:
+        try:
+            return await llm.generate_structured_recipe(
+                text=text, images=images, emit=emit
+            )
+        except ValidationError:
+            logger.warning("Structured recipe did not validate, using separate calls.")
+        if emit is not None:
+            emit(Event(RESET))
+        content = await llm.generate_recipe(text=text, images=images, emit=emit)
+        name, summary = await asyncio.gather(
+            llm.recipe_name(content), llm.recipe_summary(content)
+        )
+        return GeneratedRecipe(name=name, summary=summary, content=content)
+
+    pipeline = Pipeline(
+        "create_structured_recipe",
+        [
+            Stage("text", expand),
+            Stage("generated", generate, deps=("text",)),
+            Stage(
+                "vector",
+                lambda generated: embed(generated.content),
+                deps=("generated",),
+            ),
+            Stage(
+                "recipe",
+                lambda generated, vector: store(
+                    generated.name, generated.summary, generated.content, vector
+                ),
+                deps=("generated", "vector"),
+            ),
+        ],
+    )
+    run = await pipeline.run()
+    return run["recipe"]
+
+
+CREATE_RECIPE_JOB = "create_recipe"
+
+
+async def enqueue_create_recipe(
+    *,
+    description: str,
+    images: Sequence[bytes],
+    queue: JobQueue,
+    max_attempts: int = 3,
+) -> str:
+    return await queue.enqueue(
+        CREATE_RECIPE_JOB,
+        {"description": description},
+        blobs=list(images),
+        max_attempts=max_attempts,
+    )
+
+
+async def run_create_recipe_job(
+    job: Job,
+    *,
+    queue: JobQueue,
+    repository: RecipeRepository,
+    llm: "LLMService",
+    search_cache: SearchResultCache | None = None,
+    lexical: LexicalIndex | None = None,
+    structured: bool = False,
+    events: EventHub | None = None,
+) -> str:
+    emit = None if events is None else events.emitter(job.id)
+    if emit is not None and job.attempts > 1:
+        emit(Event(RESET))
+    images = [io.BytesIO(blob) for blob in await queue.blobs(job.id)]
+    try:
+        # Background work queues behind interactive searches for OpenAI.
+        with priority(Priority.background):
+            recipe = await create_recipe(
+                description=job.payload["description"],
+                images=images,
+                repository=repository,
+                llm=llm,
+                search_cache=search_cache,
+                lexical=lexical,
+                structured=structured,
+                emit=emit,
+            )
+    except Exception as e:
+        if emit is not None:
+            emit(Event(ERROR, repr(e)))
+        raise
+    if emit is not None:
+        emit(Event(DONE, recipe.id))
+    return recipe.id
@@ -0,0 +1,67 @@
+import asyncio
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Iterable
+
+from ajolt import AsyncJolt
+from domain.models import RecipeSummary
+
+
+class SummaryStore:
+    """SQLite store of the fields search results show: id, name and summary.
+
+    Kept apart from the recipes so listing search results never reads, or
+    transfers, recipe bodies.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        if path is None:
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "id TEXT PRIMARY KEY, name TEXT NOT NULL, summary TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()
+        return count
+
+    def put_many(self, summaries: Iterable[RecipeSummary]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?)",
+                [(s.id, s.name, s.summary) for s in summaries],
+            )
+            self._conn.commit()
+
+    def get_many(self, ids: list[str]) -> dict[str, RecipeSummary]:
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, name, summary FROM summaries WHERE id IN ({placeholders})",
+                ids,
+            ).fetchall()
+        return {r[0]: RecipeSummary(id=r[0], name=r[1], summary=r[2]) for r in rows}
+
+    async def put(self, summary: RecipeSummary) -> None:
+        async with AsyncJolt():
+            await asyncio.to_thread(self.put_many, [summary])
+
+    async def get(self, ids: list[str]) -> dict[str, RecipeSummary]:
+        async with AsyncJolt():
+            return await asyncio.to_thread(self.get_many, ids)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,6 @@
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split()).casefold()
@@ -0,0 +1,133 @@
+import bisect
+from collections import Counter
+from dataclasses import dataclass
+import heapq
+from operator import itemgetter
+import threading
+
+from domain.lexical import LexicalIndex
+from domain.models import RecipeSummary
+from domain.text import normalize_text
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    text: str
+    recipe_id: str | None = None
+
+
+class PrefixIndex:
+    """Typeahead over recipe names and popular past queries.
+
+    Keys live in one sorted list, so the matches for a prefix are a contiguous
+    run found with `bisect`. Every word start in a name is a key, so "lasa"
+    finds "Beef lasagne". Queries are suggested once they have been searched
+    `min_query_count` times.
+
+    `update_names` reads SQLite, so it is meant to run in a thread; a lock
+    keeps lookups on the event loop from seeing a half-merged index.
+    """
+
+    def __init__(
+        self,
+        *,
+        min_query_count: int = 2,
+        max_queries: int = 10_000,
+        scan_limit: int = 256,
+    ) -> None:
+        self.min_query_count = min_query_count
+        self.max_queries = max_queries
+        self.scan_limit = scan_limit
+        self._keys: list[str] = []
+        self._entries: list[Suggestion] = []
+        self._recipe_ids: set[str] = set()
+        self._queries: Counter[str] = Counter()
+        self._lexical_generation = -1
+        self._lexical_cursor = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _insert(self, suggestions: list[Suggestion]) -> None:
+        """Add the keys of `suggestions`, merging them into the sorted list in one pass.
+
+        A batch costs O(N + k log k) instead of an O(N) `list.insert` per key.
+        """
+        pairs: list[tuple[str, Suggestion]] = []
+        for suggestion in suggestions:
+            words = normalize_text(suggestion.text).split(" ")
+            pairs.extend((" ".join(words[i:]), suggestion) for i in range(len(words)))
+        if not pairs:
+            return
+        pairs.sort(key=itemgetter(0))
+        merged = list(
+            heapq.merge(zip(self._keys, self._entries), pairs, key=itemgetter(0))
+        )
+        self._keys = [key for key, _ in merged]
+        self._entries = [suggestion for _, suggestion in merged]
+
+    def _names(self, summaries: list[RecipeSummary]) -> list[Suggestion]:
+        # Recipes never change, so a recipe is only indexed once.
+        suggestions: list[Suggestion] = []
+        for summary in summaries:
+            if not normalize_text(summary.name) or summary.id in self._recipe_ids:
+                continue
+            self._recipe_ids.add(summary.id)
+            suggestions.append(Suggestion(summary.name, summary.id))
+        return suggestions
+
+    def add_name(self, recipe_id: str, name: str) -> None:
+        with self._lock:
+            summary = RecipeSummary(id=recipe_id, name=name, summary="")
+            self._insert(self._names([summary]))
+
+    def update_names(self, lexical: LexicalIndex) -> None:
+        """Index the names of recipes added to `lexical` since the last call.
+
+        Only recipes stored since the last call are read, and only when the
+        lexical index has changed.
+        """
+        generation = lexical.refresh()
+        if generation == self._lexical_generation:
+            return
+        summaries, cursor = lexical.summaries_after(self._lexical_cursor)
+        with self._lock:
+            self._insert(self._names(summaries))
+            self._lexical_generation = generation
+            self._lexical_cursor = max(cursor, self._lexical_cursor)
+
+    def record_query(self, query: str) -> None:
+        text = normalize_text(query)
+        if not text:
+            return
+        with self._lock:
+            self._queries[text] += 1
+            if self._queries[text] == self.min_query_count:
+                self._insert([Suggestion(text)])
+            if len(self._queries) > self.max_queries:
+                # Forget one-off queries; they have no keys in the index.
+                rare = [q for q, c in self._queries.items() if c < self.min_query_count]
+                for q in rare:
+                    del self._queries[q]
+
+    def _weight(self, suggestion: Suggestion) -> int:
+        if suggestion.recipe_id is not None:
+            return self.min_query_count
+        return self._queries[suggestion.text]
+
+    def suggest(self, prefix: str, *, n: int = 8) -> list[Suggestion]:
+        """The best `n` suggestions with text, or a word in it, starting `prefix`."""
+        text = normalize_text(prefix)
+        if not text:
+            return []
+        matches: dict[Suggestion, int] = {}
+        with self._lock:
+            start = bisect.bisect_left(self._keys, text)
+            stop = min(start + self.scan_limit, len(self._keys))
+            for i in range(start, stop):
+                if not self._keys[i].startswith(text):
+                    break
+                suggestion = self._entries[i]
+                matches[suggestion] = self._weight(suggestion)
+        return heapq.nlargest(n, matches, key=lambda s: matches[s])
@@ -0,0 +1,204 @@
+from pathlib import Path
+from typing import Any, Protocol
+
+import numpy as np
+import numpy.typing as npt
+
+from domain.ann import kmeans, nearest_centroids
+
+
+Vector = npt.NDArray[np.float32]
+
+SCORE_CHUNK = 16384
+
+
+def as_vector(values: Any) -> Vector:
+    return np.ascontiguousarray(values, dtype=np.float32)
+
+
+def normalize(vector: Vector) -> Vector:
+    norm = np.linalg.norm(vector, axis=-1, keepdims=True)
+    return (vector / np.where(norm == 0, 1, norm)).astype(np.float32, copy=False)
+
+
+class VectorCodec(Protocol):
+    """Compresses float32 vectors into codes that can be scored directly."""
+
+    @property
+    def trained(self) -> bool: ...
+
+    def needs_training(self, count: int) -> bool: ...
+
+    def fit(self, vectors: npt.NDArray[np.float32]) -> Any:
+        """Train on `vectors` without changing the codec, for `install`."""
+        ...
+
+    def install(self, fitted: Any) -> None: ...
+
+    def train(self, vectors: npt.NDArray[np.float32]) -> None: ...
+
+    def encode(
+        self, vectors: npt.NDArray[np.float32]
+    ) -> tuple[npt.NDArray[Any], npt.NDArray[np.float32]]: ...
+
+    def scores(
+        self,
+        codes: npt.NDArray[Any],
+        scales: npt.NDArray[np.float32],
+        query: Vector,
+    ) -> npt.NDArray[np.float32]: ...
+
+    def save(self, path: Path) -> None: ...
+
+    def load(self, path: Path) -> None: ...
+
+
+class Int8Codec:
+    """Symmetric scalar quantization with one float32 scale per vector (4x smaller)."""
+
+    trained = True
+
+    def needs_training(self, count: int) -> bool:
+        return False
+
+    def fit(self, vectors: npt.NDArray[np.float32]) -> None:
+        pass
+
+    def install(self, fitted: None) -> None:
+        pass
+
+    def train(self, vectors: npt.NDArray[np.float32]) -> None:
+        pass
+
+    def encode(
+        self, vectors: npt.NDArray[np.float32]
+    ) -> tuple[npt.NDArray[np.int8], npt.NDArray[np.float32]]:
+        vectors = np.atleast_2d(vectors)
+        peak = np.abs(vectors).max(axis=1)
+        scales = (np.where(peak == 0, 1, peak) / 127).astype(np.float32)
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales
+
+    def scores(
+        self,
+        codes: npt.NDArray[np.int8],
+        scales: npt.NDArray[np.float32],
+        query: Vector,
+    ) -> npt.NDArray[np.float32]:
+        out = np.empty(len(codes), dtype=np.float32)
+        for i in range(0, len(codes), SCORE_CHUNK):
+            block = codes[i : i + SCORE_CHUNK].astype(np.float32)
+            out[i : i + SCORE_CHUNK] = block @ query
+        return out * scales
+
+    def save(self, path: Path) -> None:
+        pass
+
+    def load(self, path: Path) -> None:
+        pass
+
+
+class ProductQuantizer:
+    """Product quantization with 256 centroids per subspace, one byte per subspace.
+
+    With `m` subspaces a 1536-d float32 vector shrinks from 6 KB to `m` bytes.
+    Scores use asymmetric distance computation: the query is compared with every
+    subspace centroid once and codes are scored by table lookup.
+    """
+
+    def __init__(
+        self,
+        *,
+        m: int = 96,
+        ksub: int = 256,
+        train_factor: int = 16,
+        max_train_size: int = 65536,
+        seed: int = 0,
+    ) -> None:
+        if ksub > 256:
+            raise ValueError("ksub must fit in one byte.")
+        self.m = m
+        self.ksub = ksub
+        self.train_factor = train_factor
+        self.max_train_size = max_train_size
+        self.seed = seed
+        self.codebooks: npt.NDArray[np.float32] | None = None
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    def needs_training(self, count: int) -> bool:
+        return self.codebooks is None and count >= self.train_factor * self.ksub
+
+    def _split(self, vectors: npt.NDArray[np.float32]) -> npt.NDArray[np.float32]:
+        n, dim = vectors.shape
+        if dim % self.m:
+            raise ValueError(f"Dimension {dim} is not divisible by m={self.m}.")
+        return vectors.reshape(n, self.m, dim // self.m)
+
+    def fit(self, vectors: npt.NDArray[np.float32]) -> npt.NDArray[np.float32]:
+        """Codebooks for `vectors`, without changing the quantizer."""
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.max_train_size:
+            idx = rng.choice(len(vectors), self.max_train_size, replace=False)
+            vectors = vectors[np.sort(idx)]
+        subs = self._split(np.asarray(vectors, dtype=np.float32))
+        return np.stack(
+            [
+                kmeans(
+                    np.ascontiguousarray(subs[:, j]),
+                    self.ksub,
+                    iterations=10,
+                    seed=self.seed,
+                    spherical=False,
+                )
+                for j in range(self.m)
+            ]
+        )
+
+    def install(self, fitted: npt.NDArray[np.float32]) -> None:
+        """Use codebooks from `fit`."""
+        self.codebooks = fitted
+
+    def train(self, vectors: npt.NDArray[np.float32]) -> None:
+        self.install(self.fit(vectors))
+
+    def encode(
+        self, vectors: npt.NDArray[np.float32]
+    ) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.float32]]:
+        if self.codebooks is None:
+            raise ValueError("Quantizer is not trained.")
+        subs = self._split(np.atleast_2d(vectors))
+        codes = np.empty((len(subs), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = nearest_centroids(
+                np.ascontiguousarray(subs[:, j]), self.codebooks[j], spherical=False
+            )
+        return codes, np.ones(len(codes), dtype=np.float32)
+
+    def scores(
+        self,
+        codes: npt.NDArray[np.uint8],
+        scales: npt.NDArray[np.float32],
+        query: Vector,
+    ) -> npt.NDArray[np.float32]:
+        if self.codebooks is None:
+            raise ValueError("Quantizer is not trained.")
+        q = self._split(query.reshape(1, -1))[0]
+        table = np.einsum("jkd,jd->jk", self.codebooks, q)
+        out = np.empty(len(codes), dtype=np.float32)
+        cols = np.arange(self.m)
+        for i in range(0, len(codes), SCORE_CHUNK):
+            block = codes[i : i + SCORE_CHUNK]
+            out[i : i + SCORE_CHUNK] = table[cols, block].sum(axis=1)
+        return out
+
+    def save(self, path: Path) -> None:
+        if self.codebooks is None:
+            return
+        with open(path, "wb") as f:
+            np.save(f, self.codebooks)
+
+    def load(self, path: Path) -> None:
+        self.codebooks = np.load(path)
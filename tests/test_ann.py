@@ -0,0 +1,100 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from domain.ann import IVFIndex
+from domain.local_repository import LocalRecipeVectorRepository
+from domain.models import Recipe
+
+
+def normalized(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    data = np.random.default_rng(seed).standard_normal((n, dim), dtype=np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+def test_full_probe_matches_exact_search() -> None:
+    vectors = normalized(500, 16)
+    index = IVFIndex(nlist=8)
+    index.train(vectors)
+    query = vectors[42]
+
+    rows, scores = index.search(query, vectors, n=5, nprobe=8)
+
+    expected = np.argsort(-(vectors @ query))[:5]
+    assert rows.tolist() == expected.tolist()
+    assert scores[0] == pytest.approx(1.0)
+
+
+def test_incremental_add_reassigns_rows() -> None:
+    vectors = normalized(100, 8)
+    index = IVFIndex(nlist=4)
+    index.train(vectors[:50])
+    index.add(list(range(50, 100)), vectors[50:])
+    vectors[0] = vectors[99]
+    index.add([0], vectors[0])
+
+    assert len(index) == 100
+    rows, _ = index.search(vectors[99], vectors, n=2, nprobe=4)
+    assert set(rows.tolist()) == {0, 99}
+
+
+def test_save_and_load_round_trip(tmp_path: Path) -> None:
+    vectors = normalized(200, 8)
+    index = IVFIndex(nlist=4)
+    index.train(vectors)
+    index.save(tmp_path / "ivf.npz")
+
+    loaded = IVFIndex(nlist=4)
+    loaded.load(tmp_path / "ivf.npz")
+
+    assert len(loaded) == 200
+    assert (
+        loaded.candidates(vectors[3], nprobe=1).tolist()
+        == index.candidates(vectors[3], nprobe=1).tolist()
+    )
+
+
+@pytest.mark.asyncio
+async def test_repository_trains_index_once_large_enough() -> None:
+    vectors = normalized(40, 4)
+    ann = IVFIndex(nlist=2, nprobe=2, train_factor=10)
+    repo = LocalRecipeVectorRepository(dim=4, ann=ann)
+    for i, vector in enumerate(vectors):
+        recipe = Recipe(id=str(i), name="", summary="", content="")
+        await repo.add(recipe=recipe, vector=vector)
+
+    assert ann.trained
+    assert len(ann) == 40
+    got = await repo.search(vectors[7], n=1)
+    assert [r.id for r in got] == ["7"]
+
+
+@pytest.mark.asyncio
+async def test_repository_trains_outside_the_lock(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    vectors = normalized(41, 4)
+    ann = IVFIndex(nlist=2, nprobe=2, train_factor=20)
+    repo = LocalRecipeVectorRepository(dim=4, ann=ann)
+    for i, vector in enumerate(vectors[:39]):
+        recipe = Recipe(id=str(i), name="", summary="", content="")
+        await repo.add(recipe=recipe, vector=vector)
+    fit = ann.fit
+    late = Recipe(id="late", name="", summary="", content="")
+
+    def fit_while_adding(snapshot: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # Would deadlock if training held the repository lock.
+        repo._add(late, vectors[40])
+        repo._add(Recipe(id="0", name="", summary="", content=""), vectors[40])
+        return fit(snapshot)
+
+    monkeypatch.setattr(ann, "fit", fit_while_adding)
+    await repo.add(
+        recipe=Recipe(id="39", name="", summary="", content=""), vector=vectors[39]
+    )
+
+    assert ann.trained
+    assert len(ann) == 41
+    got = await repo.search(vectors[40], n=2)
+    assert sorted(r.id for r in got) == ["0", "late"]
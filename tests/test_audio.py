@@ -0,0 +1,125 @@
+import asyncio
+import io
+from typing import AsyncGenerator
+import wave
+
+import numpy as np
+import pytest
+
+from domain.audio import PcmChunker, map_ordered, wav_bytes, wav_chunks
+
+
+RATE = 1000
+
+
+def noise(seconds: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.integers(-8000, 8000, int(seconds * RATE)).astype(np.int16)
+
+
+def test_chunker_cuts_at_silence() -> None:
+    audio = noise(25)
+    audio[8000:8200] = 0  # A pause 2s before the 10s target.
+    chunker = PcmChunker(
+        rate=RATE, chunk_seconds=10, search_seconds=4, frame_seconds=0.1
+    )
+
+    chunks = chunker.feed(audio.tobytes())
+    tail = chunker.flush()
+
+    assert 8000 <= len(chunks[0]) <= 8200
+    assert tail is not None
+    np.testing.assert_array_equal(np.concatenate([*chunks, tail]), audio)
+
+
+def test_chunker_accepts_odd_sized_reads() -> None:
+    audio = noise(12)
+    data = audio.tobytes()
+    chunker = PcmChunker(rate=RATE, chunk_seconds=5, frame_seconds=0.1)
+
+    chunks = []
+    for i in range(0, len(data), 333):
+        chunks.extend(chunker.feed(data[i : i + 333]))
+    tail = chunker.flush()
+
+    assert len(chunks) == 2
+    assert tail is not None
+    np.testing.assert_array_equal(np.concatenate([*chunks, tail]), audio)
+
+
+def test_chunker_drops_tiny_tails() -> None:
+    chunker = PcmChunker(rate=RATE, chunk_seconds=5)
+    assert chunker.feed(noise(0.3).tobytes()) == []
+    assert chunker.flush() is None
+
+
+def test_wav_bytes_round_trip() -> None:
+    audio = noise(1)
+    with wave.open(io.BytesIO(wav_bytes(audio, rate=RATE))) as wav:
+        assert (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) == (
+            1,
+            2,
+            RATE,
+        )
+        frames = wav.readframes(wav.getnframes())
+    np.testing.assert_array_equal(np.frombuffer(frames, dtype="<i2"), audio)
+
+
+@pytest.mark.asyncio
+async def test_wav_chunks() -> None:
+    audio = noise(12).tobytes()
+
+    async def pcm() -> AsyncGenerator[bytes, None]:
+        for i in range(0, len(audio), 4096):
+            yield audio[i : i + 4096]
+
+    chunks = [c async for c in wav_chunks(pcm(), rate=RATE, chunk_seconds=5)]
+
+    assert len(chunks) == 3
+    assert all(c.startswith(b"RIFF") for c in chunks)
+
+
+@pytest.mark.asyncio
+async def test_map_ordered_bounds_parallelism_and_keeps_order() -> None:
+    consumed = 0
+    running = peak = 0
+
+    async def items() -> AsyncGenerator[bytes, None]:
+        nonlocal consumed
+        for i in range(10):
+            consumed += 1
+            yield bytes([i])
+
+    async def fn(i: int, item: bytes) -> int:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        assert consumed <= i + 1 + 3
+        # Later items finish first.
+        await asyncio.sleep(0.01 * (10 - i))
+        running -= 1
+        return item[0]
+
+    assert await map_ordered(items(), fn, max_parallel=3) == list(range(10))
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_map_ordered_stops_on_error() -> None:
+    consumed = 0
+
+    async def items() -> AsyncGenerator[bytes, None]:
+        nonlocal consumed
+        for i in range(100):
+            consumed += 1
+            yield bytes([i])
+
+    async def fn(i: int, item: bytes) -> int:
+        if i == 2:
+            raise ValueError("boom")
+        await asyncio.sleep(0.01)
+        return i
+
+    with pytest.raises(ValueError):
+        await map_ordered(items(), fn, max_parallel=2)
+    assert consumed < 10
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from domain.batching import Coalescer
+
+
+@pytest.mark.asyncio
+async def test_coalescer_merges_concurrent_requests() -> None:
+    calls: list[list[str]] = []
+
+    async def upper(items: list[str]) -> list[str]:
+        calls.append(items)
+        return [i.upper() for i in items]
+
+    coalescer = Coalescer(upper, window=0.01)
+    got = await asyncio.gather(*(coalescer.submit(i) for i in ["a", "b", "a", "c"]))
+
+    assert got == ["A", "B", "A", "C"]
+    assert calls == [["a", "b", "c"]]
+    assert (coalescer.batches, coalescer.items) == (1, 4)
+
+
+@pytest.mark.asyncio
+async def test_coalescer_flushes_full_batches_early() -> None:
+    calls: list[list[str]] = []
+
+    async def echo(items: list[str]) -> list[str]:
+        calls.append(items)
+        return items
+
+    coalescer = Coalescer(echo, window=60, max_batch=2)
+    got = await asyncio.gather(*(coalescer.submit(i) for i in ["a", "b", "c", "d"]))
+
+    assert got == ["a", "b", "c", "d"]
+    assert calls == [["a", "b"], ["c", "d"]]
+
+
+@pytest.mark.asyncio
+async def test_coalescer_propagates_errors_to_every_caller() -> None:
+    async def fail(items: list[str]) -> list[str]:
+        raise RuntimeError("upstream")
+
+    coalescer = Coalescer(fail, window=0)
+    results = await asyncio.gather(
+        coalescer.submit("a"), coalescer.submit("b"), return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
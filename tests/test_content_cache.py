@@ -0,0 +1,90 @@
+import asyncio
+from pathlib import Path
+
+import httpx
+import pytest
+
+from data import text_from_webpage
+from domain.content_cache import ContentCache
+
+
+PAGE = "<html><body><p>Stew</p></body></html>"
+
+
+def origin(requests: list[httpx.Request]) -> httpx.AsyncClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text=PAGE, headers={"ETag": '"v1"'})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_fresh_entries_skip_the_origin() -> None:
+    requests: list[httpx.Request] = []
+    cache = ContentCache()
+    async with origin(requests) as client:
+        fetches = [
+            text_from_webpage("https://a.com/stew#x", http_client=client, cache=cache)
+            for _ in range(3)
+        ]
+        texts = await asyncio.gather(*fetches)
+
+    assert texts == ["Stew"] * 3
+    assert len(requests) == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_entries_are_revalidated() -> None:
+    requests: list[httpx.Request] = []
+    cache = ContentCache(ttl=0)
+    async with origin(requests) as client:
+        await text_from_webpage("https://a.com/stew", http_client=client, cache=cache)
+        text = await text_from_webpage(
+            "https://a.com/stew", http_client=client, cache=cache
+        )
+
+    assert text == "Stew"
+    assert requests[1].headers["if-none-match"] == '"v1"'
+    assert (cache.hits, cache.revalidations, cache.misses) == (0, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used_past_max_bytes() -> None:
+    cache = ContentCache(max_bytes=10)
+    await cache.set("https://a.com", "aaaaa")
+    await cache.set("https://b.com", "bbbbb")
+    await cache.get("https://a.com")
+    await cache.set("https://c.com", "ccccc")
+
+    assert await cache.get("https://b.com") is None
+    assert await cache.get("https://a.com") is not None
+    assert cache.size == 10
+
+
+@pytest.mark.asyncio
+async def test_evicts_what_other_processes_stored(tmp_path: Path) -> None:
+    path = tmp_path / "content.db"
+    mine, theirs = ContentCache(path, max_bytes=10), ContentCache(path, max_bytes=10)
+    await mine.set("https://a.com", "aaaaa")
+    await theirs.set("https://b.com", "bbbbb")
+    await mine.set("https://c.com", "ccccc")
+
+    assert await theirs.get("https://a.com") is None
+    assert mine.size == theirs.size == 10
+    mine.close()
+    theirs.close()
+
+
+@pytest.mark.asyncio
+async def test_non_expiring_entries_stay_fresh() -> None:
+    cache = ContentCache(ttl=0)
+    await cache.set("https://www.youtube.com/watch?v=1", "transcript", expires=False)
+
+    entry = await cache.get("https://www.youtube.com/watch?v=1")
+
+    assert entry is not None and cache.is_fresh(entry)
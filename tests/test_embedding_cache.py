@@ -0,0 +1,73 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from domain.embedding_cache import (
+    EmbeddingCache,
+    MemoryEmbeddingStore,
+    SqliteEmbeddingStore,
+    embedding_key,
+)
+
+
+def vec(*values: float) -> np.ndarray:
+    return np.array(values, dtype=np.float32)
+
+
+def test_embedding_key_normalizes_text() -> None:
+    assert embedding_key("m", "Warming  winter\nStew ") == embedding_key(
+        "m", "warming winter stew"
+    )
+    assert embedding_key("m", "stew") != embedding_key("other", "stew")
+
+
+def test_memory_store_evicts_least_recently_used() -> None:
+    store = MemoryEmbeddingStore(max_entries=2)
+    store.set("a", vec(1.0))
+    store.set("b", vec(2.0))
+    assert store.get("a") == vec(1.0)
+    store.set("c", vec(3.0))
+    assert store.get("b") is None
+    assert store.get("a") == vec(1.0)
+    assert store.get("c") == vec(3.0)
+
+
+def test_memory_store_expires_entries() -> None:
+    store = MemoryEmbeddingStore(ttl=-1)
+    store.set("a", vec(1.0))
+    assert store.get("a") is None
+
+
+def test_sqlite_store_persists_and_evicts(tmp_path: Path) -> None:
+    path = tmp_path / "embeddings.db"
+    store = SqliteEmbeddingStore(path, max_entries=2)
+    store.set("a", vec(0.5, 0.25))
+    store.set("b", vec(1.0, 2.0))
+    store.set("c", vec(3.0, 4.0))
+    store.close()
+
+    store = SqliteEmbeddingStore(path, max_entries=2)
+    assert len(store) == 2
+    assert store.get("a") is None
+    got = store.get("c")
+    assert got is not None and got.dtype == np.float32
+    assert got.tolist() == [3.0, 4.0]
+
+
+@pytest.mark.asyncio
+async def test_cache_counts_hits_and_promotes_disk_entries(tmp_path: Path) -> None:
+    disk = SqliteEmbeddingStore(tmp_path / "embeddings.db")
+    await EmbeddingCache(disk=disk).set("m", "stew", vec(0.5))
+
+    cache = EmbeddingCache(disk=disk)
+    assert await cache.get("m", "lasagne") is None
+    assert await cache.get("m", "Stew") == vec(0.5)
+    assert await cache.get("m", "stew") == vec(0.5)
+    assert cache.stats() == {
+        "hits": 2,
+        "disk_hits": 1,
+        "misses": 1,
+        "hit_ratio": 2 / 3,
+        "memory_entries": 1,
+    }
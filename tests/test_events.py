@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from domain.events import DONE, RESET, STAGE, TOKEN, Event, EventHub
+
+
+@pytest.mark.asyncio
+async def test_late_subscribers_replay_then_follow() -> None:
+    hub = EventHub()
+    emit = hub.emitter("job")
+    emit(Event(STAGE, "generating"))
+    emit(Event(TOKEN, "Stew"))
+    subscription = hub.subscribe("job")
+
+    async def finish() -> None:
+        await asyncio.sleep(0.01)
+        emit(Event(DONE, "recipe"))
+
+    task = asyncio.create_task(finish())
+    events = [await subscription.get(timeout=1) for _ in range(3)]
+    await task
+
+    assert [e.kind for e in events if e] == [STAGE, TOKEN, DONE]
+    assert await subscription.get(timeout=0.01) is None
+
+
+@pytest.mark.asyncio
+async def test_reset_drops_earlier_tokens() -> None:
+    hub = EventHub()
+    subscription = hub.subscribe("job")
+    hub.publish("job", Event(TOKEN, "a"))
+    hub.publish("job", Event(TOKEN, "b"))
+    assert await subscription.get() == Event(TOKEN, "a")
+
+    hub.publish("job", Event(RESET))
+    hub.publish("job", Event(TOKEN, "c"))
+
+    assert await subscription.get() == Event(RESET)
+    assert await subscription.get() == Event(TOKEN, "c")
+    late = hub.subscribe("job")
+    assert [await late.get(), await late.get()] == [Event(RESET), Event(TOKEN, "c")]
+
+
+def test_idle_channels_without_subscribers_are_pruned() -> None:
+    hub = EventHub(retention=0)
+    hub.subscribe("waiting").close()
+    hub.publish("job", Event(DONE, "recipe"))
+    hub.prune()
+
+    assert len(hub) == 0
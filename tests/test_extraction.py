@@ -0,0 +1,138 @@
+import json
+
+import httpx
+import pytest
+
+from data import fetch_page, text_from_webpage
+from domain.content_cache import ContentCache
+from domain.extraction import decode_html, extract_text, json_ld_recipe
+
+
+RECIPE = {
+    "@type": ["Recipe"],
+    "name": "Beef  lasagne",
+    "recipeYield": ["6", "6 servings"],
+    "totalTime": "PT2H",
+    "recipeIngredient": ["500g beef mince", "12 lasagne sheets"],
+    "recipeInstructions": [
+        {
+            "@type": "HowToSection",
+            "name": "For the ragu",
+            "itemListElement": [{"@type": "HowToStep", "text": "Brown the mince."}],
+        },
+        {"@type": "HowToStep", "text": "Layer and bake."},
+    ],
+}
+CHROME = """
+<head><title>Lasagne</title><style>body {}</style></head>
+<body>
+<header><p>Colunch Kitchen</p></header>
+<nav><a href="/">Home</a><a href="/recipes">Recipes</a></nav>
+<script>var tracking = "everything";</script>
+<div class="ad-slot">Buy now!</div>
+"""
+ARTICLE = """
+<article>
+<header class="entry-header"><h1>Beef lasagne</h1></header>
+<p>A rich, slow-cooked lasagne that is well worth the effort for a weekend
+lunch with friends and family, with plenty left over for the week.</p>
+<ul class="ingredients"><li>500g beef mince</li><li>12 lasagne sheets</li></ul>
+<p>Brown the mince, then layer with the sheets and bake for 45 minutes.</p>
+</article>
+<div class="sidebar"><p>Popular this week</p></div>
+<footer>Copyright</footer>
+</body>
+"""
+
+
+def test_json_ld_recipe_is_preferred() -> None:
+    graph = {"@context": "https://schema.org", "@graph": [{"@type": "WebPage"}, RECIPE]}
+    html = (
+        CHROME
+        + '<script type="application/ld+json">not json</script>'
+        + f'<script type="application/ld+json">{json.dumps(graph)}</script>'
+        + ARTICLE
+    )
+
+    assert json_ld_recipe(html) == RECIPE
+    assert extract_text(html) == (
+        "# Beef lasagne\n"
+        "Serves: 6, 6 servings\n"
+        "Total time: PT2H\n"
+        "## Ingredients\n"
+        "- 500g beef mince\n"
+        "- 12 lasagne sheets\n"
+        "## Method\n"
+        "1. For the ragu:\n"
+        "2. Brown the mince.\n"
+        "3. Layer and bake."
+    )
+
+
+def test_main_content_drops_chrome() -> None:
+    text = extract_text(CHROME + ARTICLE)
+
+    assert text.splitlines()[0] == "## Beef lasagne"
+    assert "500g beef mince\n12 lasagne sheets" in text
+    for boilerplate in (
+        "Colunch Kitchen",
+        "Home",
+        "tracking",
+        "Buy now",
+        "Popular",
+        "Copyright",
+    ):
+        assert boilerplate not in text
+
+
+def test_page_without_main_keeps_body_text() -> None:
+    text = extract_text("<body><p>Toast</p><div><p>Butter it.<br>Eat it.</div>")
+    assert text == "Toast\nButter it.\nEat it."
+
+
+def test_extract_text_is_bounded() -> None:
+    html = "<p>" + "word " * 10_000 + "</p>"
+    assert len(extract_text(html, max_chars=100)) == 100
+
+
+def test_decode_html_uses_meta_charset() -> None:
+    body = '<meta charset="iso-8859-1"><p>Crème brûlée</p>'.encode("iso-8859-1")
+    assert "Crème brûlée" in decode_html(body)
+    assert "Crème" in decode_html("<p>Crème</p>".encode(), "no-such-codec")
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_stops_at_the_byte_cap() -> None:
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(200, content=b"x" * 10_000)
+    )
+    async with httpx.AsyncClient(transport=transport) as client:
+        _, body = await fetch_page(
+            "https://example.com", http_client=client, max_bytes=100
+        )
+    assert body == b"x" * 100
+
+
+@pytest.mark.asyncio
+async def test_text_from_webpage_raises_for_errors_and_revalidates() -> None:
+    statuses = iter([200, 304, 404])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status = next(statuses)
+        return httpx.Response(
+            status,
+            headers={"content-type": "text/html; charset=utf-8", "etag": '"v1"'},
+            content=CHROME.encode() + ARTICLE.encode() if status == 200 else b"",
+        )
+
+    cache = ContentCache(ttl=0)
+    url = "https://example.com/lasagne"
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        first = await text_from_webpage(url, http_client=client, cache=cache)
+        second = await text_from_webpage(url, http_client=client, cache=cache)
+        with pytest.raises(httpx.HTTPStatusError):
+            await text_from_webpage("https://example.com/gone", http_client=client)
+
+    assert "Beef lasagne" in first
+    assert second == first
+    assert cache.revalidations == 1
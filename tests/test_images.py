@@ -0,0 +1,91 @@
+import io
+
+from PIL import Image
+import pytest
+
+from domain.images import (
+    MAX_LONG_SIDE,
+    MAX_SHORT_SIDE,
+    ImageProcessor,
+    image_mime,
+    prepare_image,
+)
+
+
+def encode(image: Image.Image, format: str, **params: object) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **params)
+    return buffer.getvalue()
+
+
+def photo(width: int, height: int) -> Image.Image:
+    # Noise, so the encoded sizes behave like a photo's.
+    return Image.effect_noise((width, height), 64).convert("RGB")
+
+
+def test_image_mime() -> None:
+    image = photo(8, 8)
+    assert image_mime(encode(image, "JPEG")) == "image/jpeg"
+    assert image_mime(encode(image, "PNG")) == "image/png"
+    assert image_mime(encode(image, "WEBP")) == "image/webp"
+    assert image_mime(encode(image, "GIF")) == "image/gif"
+
+
+def test_large_photos_are_downscaled_to_jpeg() -> None:
+    data = encode(photo(2400, 1800), "JPEG", quality=95)
+
+    prepared = prepare_image(data)
+
+    image = Image.open(io.BytesIO(prepared))
+    assert image.format == "JPEG"
+    assert max(image.size) <= MAX_LONG_SIDE
+    assert min(image.size) == MAX_SHORT_SIDE
+    assert image.size == (1024, 768)
+    assert len(prepared) < len(data) / 3
+
+
+def test_transparent_images_stay_png() -> None:
+    image = Image.new("RGBA", (1600, 1600), (255, 0, 0, 128))
+
+    prepared = Image.open(io.BytesIO(prepare_image(encode(image, "PNG"))))
+
+    assert prepared.format == "PNG"
+    assert prepared.size == (768, 768)
+    assert prepared.mode == "RGBA"
+
+
+def test_small_images_are_kept() -> None:
+    data = encode(photo(300, 200), "JPEG", quality=50)
+    assert prepare_image(data) == data
+
+
+def test_exif_orientation_is_applied() -> None:
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotated 90 degrees clockwise.
+    data = encode(photo(300, 200), "JPEG", exif=exif)
+
+    prepared = Image.open(io.BytesIO(prepare_image(data)))
+
+    assert prepared.size == (200, 300)
+
+
+def test_unreadable_images_are_rejected() -> None:
+    with pytest.raises(ValueError):
+        prepare_image(b"not an image")
+
+
+@pytest.mark.asyncio
+async def test_processor_deduplicates_and_caches() -> None:
+    a = encode(photo(1000, 1000), "JPEG")
+    b = encode(photo(500, 500), "PNG")
+    processor = ImageProcessor(max_workers=1)
+    try:
+        first = await processor.prepare([a, b, a])
+        second = await processor.prepare([b])
+    finally:
+        processor.close()
+
+    assert len(first) == 2
+    assert second == first[1:]
+    assert Image.open(io.BytesIO(first[0])).size == (768, 768)
+    assert (processor.hits, processor.misses) == (1, 2)
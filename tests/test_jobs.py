@@ -0,0 +1,172 @@
+import asyncio
+from pathlib import Path
+import threading
+
+import pytest
+
+from domain.jobs import Job, JobQueue, JobStatus, JobWorker
+
+
+@pytest.mark.asyncio
+async def test_jobs_survive_restart_and_return_blobs(tmp_path: Path) -> None:
+    queue = JobQueue(tmp_path / "jobs.db")
+    id = await queue.enqueue("k", {"a": 1}, blobs=[b"one", b"two"])
+    queue.close()
+
+    queue = JobQueue(tmp_path / "jobs.db")
+    job = await queue.claim()
+    assert job is not None
+    assert (job.id, job.status, job.attempts, job.payload) == (
+        id,
+        JobStatus.running,
+        1,
+        {"a": 1},
+    )
+    assert await queue.blobs(id) == [b"one", b"two"]
+    assert await queue.claim() is None
+
+
+@pytest.mark.asyncio
+async def test_failures_retry_until_max_attempts() -> None:
+    queue = JobQueue()
+    id = await queue.enqueue("k", {}, max_attempts=2)
+
+    job = await queue.claim()
+    assert job is not None
+    await queue.fail(job, "boom", retry_in=0)
+    job = await queue.claim()
+    assert job is not None and job.attempts == 2
+    await queue.fail(job, "boom", retry_in=0)
+
+    failed = await queue.get(id)
+    assert failed is not None
+    assert (failed.status, failed.error) == (JobStatus.failed, "boom")
+    assert await queue.claim() is None
+
+
+@pytest.mark.asyncio
+async def test_expired_leases_are_reclaimed() -> None:
+    queue = JobQueue(lease=-1)
+    id = await queue.enqueue("k", {})
+    assert await queue.claim() is not None
+
+    job = await queue.claim()
+    assert job is not None and (job.id, job.attempts) == (id, 2)
+
+
+@pytest.mark.asyncio
+async def test_expired_leases_fail_after_max_attempts() -> None:
+    queue = JobQueue(lease=-1)
+    id = await queue.enqueue("k", {}, max_attempts=2)
+    assert await queue.claim() is not None
+    assert await queue.claim() is not None
+
+    assert await queue.claim() is None
+    failed = await queue.get(id)
+    assert failed is not None
+    assert (failed.status, failed.attempts) == (JobStatus.failed, 2)
+
+
+@pytest.mark.asyncio
+async def test_blobs_are_kept_for_retries_and_deleted_on_final_failure() -> None:
+    queue = JobQueue()
+    id = await queue.enqueue("k", {}, blobs=[b"img"], max_attempts=2)
+    job = await queue.claim()
+    assert job is not None
+    await queue.fail(job, "boom", retry_in=0)
+    assert await queue.blobs(id) == [b"img"]
+
+    job = await queue.claim()
+    assert job is not None
+    await queue.fail(job, "boom", retry_in=0)
+    assert await queue.blobs(id) == []
+
+    expiring = JobQueue(lease=-1)
+    id = await expiring.enqueue("k", {}, blobs=[b"img"], max_attempts=1)
+    assert await expiring.claim() is not None
+    assert await expiring.claim() is None
+    assert await expiring.blobs(id) == []
+
+
+def test_each_job_is_claimed_once_across_connections(tmp_path: Path) -> None:
+    queues = [JobQueue(tmp_path / "jobs.db") for _ in range(4)]
+    ids = [queues[0]._enqueue("k", {}, [], 3) for _ in range(20)]
+    claimed: list[str] = []
+
+    def drain(queue: JobQueue) -> None:
+        while (job := queue._claim()) is not None:
+            claimed.append(job.id)
+
+    threads = [threading.Thread(target=drain, args=(q,)) for q in queues]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(ids)
+
+
+@pytest.mark.asyncio
+async def test_stopping_releases_running_jobs() -> None:
+    queue = JobQueue()
+    started = asyncio.Event()
+
+    async def handler(job: Job) -> str:
+        started.set()
+        await asyncio.sleep(60)
+        return ""
+
+    worker = JobWorker(queue, {"k": handler}, concurrency=1, poll_interval=0.01)
+    worker.start()
+    id = await queue.enqueue("k", {})
+    await asyncio.wait_for(started.wait(), 1)
+    await worker.stop()
+
+    job = await queue.get(id)
+    assert job is not None
+    assert (job.status, job.attempts) == (JobStatus.queued, 0)
+
+
+@pytest.mark.asyncio
+async def test_running_jobs_keep_their_lease() -> None:
+    queue = JobQueue(lease=0.05)
+
+    async def handler(job: Job) -> str:
+        await asyncio.sleep(0.2)
+        return "done"
+
+    worker = JobWorker(queue, {"k": handler}, concurrency=1, poll_interval=0.01)
+    id = await queue.enqueue("k", {})
+    job = await queue.claim()
+    assert job is not None
+    running = asyncio.create_task(worker.run_one(job))
+    await asyncio.sleep(0.1)
+    assert await queue.claim() is None
+    await running
+
+    done = await queue.get(id)
+    assert done is not None and done.result == "done"
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_handlers_and_records_results() -> None:
+    queue = JobQueue()
+    seen: list[str] = []
+
+    async def handler(job: Job) -> str:
+        seen.append(job.payload["name"])
+        return job.payload["name"].upper()
+
+    worker = JobWorker(queue, {"k": handler}, concurrency=2, poll_interval=0.01)
+    worker.start()
+    ids = [await queue.enqueue("k", {"name": n}) for n in ("a", "b", "c")]
+    jobs: list[Job | None] = []
+    for _ in range(100):
+        jobs = [await queue.get(id) for id in ids]
+        if all(j is not None and j.done for j in jobs):
+            break
+        await asyncio.sleep(0.01)
+    await worker.stop()
+
+    assert sorted(seen) == ["a", "b", "c"]
+    assert [j.result for j in jobs if j is not None] == ["A", "B", "C"]
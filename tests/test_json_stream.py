@@ -0,0 +1,22 @@
+import json
+
+from domain.json_stream import JsonStringField
+
+
+def test_decodes_field_chunk_by_chunk() -> None:
+    content = 'Mix "well"\n\\ then bake é \U0001f372'
+    raw = json.dumps({"name": 'Say "content": x', "content": content, "n": 1})
+    field = JsonStringField("content")
+
+    decoded = "".join(field.feed(c) for c in raw)
+
+    assert decoded == content
+    assert field.done
+
+
+def test_ignores_chunks_before_the_field() -> None:
+    field = JsonStringField("content")
+
+    assert field.feed('{"name": "Stew", ') == ""
+    assert field.feed('"content": "Ste') == "Ste"
+    assert field.feed('w"}') == "w"
@@ -0,0 +1,64 @@
+from pathlib import Path
+
+from domain.lexical import LexicalIndex, ingredients, reciprocal_rank_fusion, tokenize
+from domain.models import RecipeSummary
+
+
+CONTENT = """🍴 Serves: 4
+
+#### 📝 Ingredients
+
+- Tomatoes (400 grams)
+- Basil
+
+#### 🔪 Method
+
+1. Simmer the lasagne sheets.
+"""
+
+
+def summary(id: str, name: str, text: str = "") -> RecipeSummary:
+    return RecipeSummary(id=id, name=name, summary=text)
+
+
+def test_tokenize_and_ingredients() -> None:
+    assert tokenize("The Tomatoes and Eggs!") == ["tomato", "egg"]
+    assert tokenize("cakes sausages dishes glasses") == [
+        "cake",
+        "sausage",
+        "dish",
+        "glass",
+    ]
+    assert "Basil" in ingredients(CONTENT)
+    assert "lasagne" not in ingredients(CONTENT)
+
+
+def test_ranks_name_matches_first_and_can_require_all_terms() -> None:
+    index = LexicalIndex()
+    index.add(summary("a", "Tomato soup"))
+    index.add(summary("b", "Pasta bake"), CONTENT)
+    index.add(summary("c", "Green salad", "With a tomato dressing"))
+
+    assert [id for id, _ in index.search("tomato", n=3)] == ["a", "b", "c"]
+    assert [id for id, _ in index.search("tomato basil", require_all=True)] == ["b"]
+
+
+def test_plural_queries_find_singular_names() -> None:
+    index = LexicalIndex()
+    index.add(summary("a", "Chocolate cake"))
+
+    assert [id for id, _ in index.search("cakes")] == ["a"]
+
+
+def test_reloads_writes_from_other_connections(tmp_path: Path) -> None:
+    index = LexicalIndex(tmp_path / "lexical.db")
+    other = LexicalIndex(tmp_path / "lexical.db")
+    other.add(summary("a", "Lasagne"))
+    other.add(summary("a", "Beef lasagne"))
+
+    assert [id for id, _ in index.search("beef")] == ["a"]
+    assert index.summaries(["a"]) == [summary("a", "Beef lasagne")]
+
+
+def test_reciprocal_rank_fusion() -> None:
+    assert reciprocal_rank_fusion([["a", "b", "c"], ["c", "b"]]) == ["c", "b", "a"]
@@ -0,0 +1,72 @@
+import pytest
+
+from domain.links import extract_links, strip_links
+
+
+@pytest.mark.parametrize(
+    "description,expected",
+    (
+        (
+            "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita",
+            ["https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita"],
+        ),
+        (
+            (
+                "Here is the link: "
+                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita"
+            ),
+            ["https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita"],
+        ),
+        (
+            (
+                "Here is the link: "
+                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita."
+            ),
+            ["https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita"],
+        ),
+        (
+            (
+                "Here is the link: "
+                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita "
+                "There are so many links "
+                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita-again "
+            ),
+            [
+                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita",
+                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita-again",
+            ],
+        ),
+        (
+            (
+                "Here is the link: "
+                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita "
+                "There are so many links "
+                "(https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita-again), "
+                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita"
+            ),
+            [
+                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita",
+                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita-again",
+            ],
+        ),
+        (
+            "Watch www.youtube.com/watch?v=dG6UZu85AcQ&t=1s!",
+            ["https://www.youtube.com/watch?v=dG6UZu85AcQ&t=1s"],
+        ),
+        (
+            "https://en.wikipedia.org/wiki/Ragù_(disambiguation)",
+            ["https://en.wikipedia.org/wiki/Ragù_(disambiguation)"],
+        ),
+        ("Bread and butter pudding.", []),
+    ),
+)
+def test_extract_links(description: str, expected: list[str]) -> None:
+    assert extract_links(description) == expected
+
+
+def test_strip_links() -> None:
+    given = (
+        "Meaty lasagne, don't use the béchamel though "
+        "https://www.bbcgoodfood.com/recipes/lasagne"
+    )
+    assert strip_links(given) == "Meaty lasagne, don't use the béchamel though"
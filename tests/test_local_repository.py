@@ -0,0 +1,91 @@
+from pathlib import Path
+import sqlite3
+
+import numpy as np
+import pytest
+
+from domain.local_repository import LocalRecipeVectorRepository
+from domain.models import Recipe, RecipeSummary
+
+
+def recipe(id: str) -> Recipe:
+    return Recipe(id=id, name=f"{id} name", summary=f"{id} summary", content=id)
+
+
+def unit(dim: int, i: int) -> np.ndarray:
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[i] = 1.0
+    return vector
+
+
+@pytest.mark.asyncio
+async def test_search_returns_nearest_first() -> None:
+    repo = LocalRecipeVectorRepository(dim=4)
+    for i in range(4):
+        await repo.add(recipe=recipe(str(i)), vector=unit(4, i))
+
+    got = await repo.search(np.array([0.1, 0.0, 0.9, 0.3], dtype=np.float32), n=2)
+
+    assert [r.id for r in got] == ["2", "3"]
+    assert got[0].name == "2 name"
+
+
+@pytest.mark.asyncio
+async def test_add_overwrites_existing_ids() -> None:
+    repo = LocalRecipeVectorRepository(dim=2)
+    await repo.add(recipe=recipe("a"), vector=unit(2, 0))
+    await repo.add(
+        recipe=Recipe(id="a", name="new", summary="", content=""), vector=unit(2, 1)
+    )
+
+    assert len(repo) == 1
+    assert (await repo.get("a")).name == "new"
+    assert [r.id for r in await repo.search(unit(2, 1), n=5)] == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_persists_across_instances(tmp_path: Path) -> None:
+    repo = LocalRecipeVectorRepository(tmp_path, dim=3)
+    for i in range(3):
+        await repo.add(recipe=recipe(str(i)), vector=unit(3, i))
+    repo.close()
+
+    repo = LocalRecipeVectorRepository(tmp_path, dim=3)
+    assert len(repo) == 3
+    assert [r.id for r in await repo.search(unit(3, 1), n=1)] == ["1"]
+    with pytest.raises(KeyError):
+        await repo.get("missing")
+
+
+@pytest.mark.asyncio
+async def test_stored_html_and_legacy_rows(tmp_path: Path) -> None:
+    legacy = sqlite3.connect(tmp_path / "recipes.db")
+    legacy.execute(
+        "CREATE TABLE recipes (row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+        "name TEXT NOT NULL, summary TEXT NOT NULL, content TEXT NOT NULL)"
+    )
+    legacy.execute("INSERT INTO recipes VALUES (0, 'old', '', '', '# Old')")
+    legacy.commit()
+    legacy.close()
+
+    repo = LocalRecipeVectorRepository(tmp_path, dim=2)
+    new = Recipe(id="new", name="", summary="", content="", rendered_html="<p>New</p>")
+    await repo.add(recipe=new, vector=unit(2, 0))
+
+    assert (await repo.get("new")).html == "<p>New</p>"
+    assert (await repo.get("old")).html.strip() == "<h1>Old</h1>"
+
+
+@pytest.mark.asyncio
+async def test_search_summaries_reads_only_the_summary_store(tmp_path: Path) -> None:
+    repo = LocalRecipeVectorRepository(tmp_path, dim=3)
+    for i in range(3):
+        await repo.add(recipe=recipe(str(i)), vector=unit(3, i))
+    repo.close()
+    (tmp_path / "summaries.db").unlink()
+
+    reopened = LocalRecipeVectorRepository(tmp_path, dim=3)
+    got = await reopened.search_summaries(unit(3, 2), n=2)
+
+    assert got[0] == RecipeSummary(id="2", name="2 name", summary="2 summary")
+    assert len(got) == 2
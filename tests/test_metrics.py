@@ -0,0 +1,73 @@
+import pytest
+
+from domain.metrics import LLM_TOKENS, SPAN_SECONDS, Registry, record_usage, traced
+
+
+def test_render_counter_and_gauge() -> None:
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests.")
+    ratio = registry.gauge("hit_ratio", "Hit ratio.")
+    requests.inc(route="/a")
+    requests.inc(2, route="/a")
+    requests.inc(route='/"b"')
+    ratio.set(0.25, cache="search")
+
+    text = registry.render()
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a"} 3' in text
+    assert 'requests_total{route="/\\"b\\""} 1' in text
+    assert "# TYPE hit_ratio gauge" in text
+    assert 'hit_ratio{cache="search"} 0.25' in text
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, route="/")
+
+    text = registry.render()
+
+    assert 'latency_seconds_bucket{route="/",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{route="/",le="1"} 3' in text
+    assert 'latency_seconds_bucket{route="/",le="+Inf"} 4' in text
+    assert 'latency_seconds_sum{route="/"} 3.65' in text
+    assert 'latency_seconds_count{route="/"} 4' in text
+
+
+def test_duplicate_names_are_rejected() -> None:
+    registry = Registry()
+    registry.counter("x", "X.")
+    with pytest.raises(ValueError):
+        registry.gauge("x", "X.")
+
+
+@pytest.mark.asyncio
+async def test_traced_records_outcome() -> None:
+    @traced("test")
+    async def flaky(fail: bool) -> int:
+        if fail:
+            raise RuntimeError
+        return 1
+
+    assert await flaky(False) == 1
+    with pytest.raises(RuntimeError):
+        await flaky(True)
+
+    labels = {"component": "test", "operation": "flaky"}
+    assert SPAN_SECONDS.count(**labels, outcome="ok") == 1
+    assert SPAN_SECONDS.count(**labels, outcome="error") == 1
+
+
+def test_record_usage_accepts_objects_and_dicts() -> None:
+    class Usage:
+        prompt_tokens = 10
+        completion_tokens = 5
+
+    record_usage(Usage(), model="test-model")
+    record_usage({"prompt_tokens": 1, "completion_tokens": 2}, model="test-model")
+    record_usage(None, model="test-model")
+
+    assert LLM_TOKENS.value(model="test-model", kind="prompt") == 11
+    assert LLM_TOKENS.value(model="test-model", kind="completion") == 7
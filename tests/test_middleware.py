@@ -0,0 +1,51 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from starlette.types import Message
+
+from app.middleware import limit_body
+
+
+def client(max_bytes: int) -> TestClient:
+    async def upload(request: Request) -> PlainTextResponse:
+        request = limit_body(request, max_bytes=max_bytes)
+        async with request.form() as form:
+            return PlainTextResponse(",".join(form))
+
+    return TestClient(Starlette(routes=[Route("/", upload, methods=["POST"])]))
+
+
+def test_small_uploads_are_parsed() -> None:
+    resp = client(1024).post("/", files={"image": ("a.png", b"x" * 100)})
+
+    assert (resp.status_code, resp.text) == (200, "image")
+
+
+def test_declared_oversized_bodies_are_refused_up_front() -> None:
+    resp = client(1024).post("/", files={"image": ("a.png", b"x" * 2048)})
+
+    assert resp.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_streamed_bodies_are_refused_while_parsing() -> None:
+    sent = 0
+
+    async def receive() -> Message:
+        nonlocal sent
+        sent += 1
+        return {"type": "http.request", "body": b"x" * 1024, "more_body": True}
+
+    scope = {"type": "http", "method": "POST", "headers": []}
+    request = limit_body(Request(scope, receive), max_bytes=4096)
+
+    with pytest.raises(HTTPException) as raised:
+        async for _ in request.stream():
+            pass
+
+    assert raised.value.status_code == 413
+    assert sent == 5
@@ -0,0 +1,43 @@
+import dataclasses
+
+import pytest
+
+from domain.models import Recipe, RecipeView
+
+
+def test_binary_round_trip() -> None:
+    recipe = Recipe(id="a", name="Stew", summary="Warm", content="# Stew ü")
+    rendered = dataclasses.replace(recipe, rendered_html="<h1>Stew ü</h1>")
+
+    assert Recipe.from_bytes(recipe.to_bytes()) == recipe
+    assert Recipe.from_bytes(rendered.to_bytes()) == rendered
+
+
+def test_view_decodes_fields_on_access() -> None:
+    recipe = Recipe(id="a", name="Stew", summary="", content="# Hi")
+    view = RecipeView(recipe.to_bytes())
+
+    assert (view.id, view.name, view.summary) == ("a", "Stew", "")
+    assert view.rendered_html is None
+    assert view.html.strip() == "<h1>Hi</h1>"
+
+
+def test_rejects_other_data() -> None:
+    with pytest.raises(ValueError):
+        RecipeView(b"XX" + bytes(30))
+
+
+def test_is_frozen() -> None:
+    recipe = Recipe(id="a", name="", summary="", content="")
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        recipe.name = "b"  # pyright: ignore[reportAttributeAccessIssue]
+
+
+def test_dict_leaves_out_rendered_html() -> None:
+    recipe = Recipe(
+        id="a", name="Stew", summary="", content="# Hi", rendered_html="<h1>Hi</h1>"
+    )
+
+    assert "html" not in recipe.to_dict()
+    assert Recipe.from_dict(recipe.to_dict()).html.strip() == "<h1>Hi</h1>"
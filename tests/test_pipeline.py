@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from domain.pipeline import Pipeline, Stage
+
+
+@pytest.mark.asyncio
+async def test_independent_stages_run_concurrently() -> None:
+    async def slow(value: int) -> int:
+        await asyncio.sleep(0.05)
+        return value
+
+    pipeline = Pipeline(
+        "p",
+        [
+            Stage("a", lambda x: slow(x), deps=("x",)),
+            Stage("b", lambda a: slow(a + 1), deps=("a",)),
+            Stage("c", lambda a: slow(a + 2), deps=("a",)),
+            Stage("d", lambda b, c: slow(b + c), deps=("b", "c")),
+        ],
+    )
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    run = await pipeline.run(x=1)
+
+    assert run["d"] == 5
+    assert loop.time() - start < 0.19  # a, then b and c together, then d
+    assert set(run.timings) == {"a", "b", "c", "d"}
+
+
+@pytest.mark.asyncio
+async def test_failures_cancel_remaining_stages() -> None:
+    cancelled = asyncio.Event()
+
+    async def fail() -> None:
+        raise RuntimeError("boom")
+
+    async def wait() -> None:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    pipeline = Pipeline("p", [Stage("fail", fail), Stage("wait", wait)])
+    with pytest.raises(RuntimeError):
+        await pipeline.run()
+    assert cancelled.is_set()
+
+
+def test_rejects_cycles() -> None:
+    async def noop(**kwargs: object) -> None:
+        pass
+
+    with pytest.raises(ValueError):
+        Pipeline("p", [Stage("a", noop, deps=("b",)), Stage("b", noop, deps=("a",))])
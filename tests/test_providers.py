@@ -0,0 +1,82 @@
+import asyncio
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from app import config, providers
+from app.providers import Providers
+
+
+def offline_config() -> config.Config:
+    return config.Config(
+        llm_backend=config.LLMBackend.fake,
+        vector_backend=config.VectorBackend.memory,
+        job_queue_path=None,
+        lexical_index_path=None,
+        content_cache_path=None,
+        embedding_cache_path=None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_providers_are_built_once_on_first_use(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "offline")
+    built = Providers(offline_config())
+    assert built.peek("repository") is None
+    assert not built.ready
+
+    first, second = await asyncio.gather(built.repository(), built.repository())
+    await built.warm()
+
+    assert first is second is built.peek("repository")
+    assert built.ready
+    await built.aclose()
+
+
+@pytest.mark.asyncio
+async def test_aclose_closes_every_store(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "offline")
+    built = Providers(offline_config().model_copy(update={"hybrid_search": True}))
+    await built.warm()
+    jobs, lexical = await built.jobs(), await built.lexical()
+    assert lexical is not None
+
+    await built.aclose()
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        await jobs.get("x")
+    with pytest.raises(sqlite3.ProgrammingError):
+        lexical.refresh()
+
+
+@pytest.mark.asyncio
+async def test_failed_builds_are_retried(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = 0
+    factory = providers.repository_factory
+
+    def flaky(conf: config.Config) -> object:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise ConnectionError("blip")
+        return factory(conf)
+
+    monkeypatch.setattr(providers, "repository_factory", flaky)
+    built = Providers(offline_config())
+
+    with pytest.raises(ConnectionError):
+        await built.repository()
+    assert await built.repository() is not None
+    assert calls == 2
+
+
+def test_importing_the_app_loads_neither_pillow_nor_numpy() -> None:
+    code = "import sys, app.app; print('PIL' in sys.modules, 'numpy' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.split() == ["False", "False"]
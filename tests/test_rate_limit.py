@@ -0,0 +1,128 @@
+import asyncio
+
+import httpx
+import pytest
+
+from domain.rate_limit import (
+    Priority,
+    RateLimitedTransport,
+    RateLimiter,
+    RateLimits,
+    parse_duration,
+    priority,
+)
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    (("1s", 1.0), ("6m0s", 360.0), ("1m30.5s", 90.5), ("20ms", 0.02), ("2", 2.0)),
+)
+def test_parse_duration(value: str, expected: float) -> None:
+    assert parse_duration(value) == pytest.approx(expected)
+
+
+def test_parse_duration_rejects_garbage() -> None:
+    assert parse_duration("soon") is None
+    assert parse_duration(None) is None
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_go_first() -> None:
+    limiter = RateLimiter("chat", max_concurrency=1, reserve=0)
+    order: list[str] = []
+
+    async def call(name: str, level: Priority) -> None:
+        async with limiter.slot(level):
+            order.append(name)
+
+    async with limiter.slot():
+        background = asyncio.create_task(call("background", Priority.background))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(call("interactive", Priority.interactive))
+        await asyncio.sleep(0)
+        assert len(limiter) == 2
+    await asyncio.gather(background, interactive)
+
+    assert order == ["interactive", "background"]
+
+
+@pytest.mark.asyncio
+async def test_background_work_leaves_a_reserve() -> None:
+    limiter = RateLimiter("chat", max_concurrency=2, reserve=1)
+    first = await limiter.acquire(Priority.background)
+    second = asyncio.create_task(limiter.acquire(Priority.background))
+    await asyncio.sleep(0)
+    assert not second.done()
+
+    # The reserved slot still admits interactive requests straight away.
+    with priority(Priority.interactive):
+        level = await asyncio.wait_for(limiter.acquire(), timeout=1)
+    limiter.release(level)
+    limiter.release(first)
+    limiter.release(await second)
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_exhausted_quota_pauses_admission() -> None:
+    limiter = RateLimiter("embeddings")
+    headers = {
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "50ms",
+    }
+    limiter.update(httpx.Headers(headers))
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    async with limiter.slot():
+        pass
+    assert loop.time() - start >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_transport_retries_rate_limited_requests() -> None:
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            return httpx.Response(429, headers={"retry-after-ms": "10"})
+        return httpx.Response(200, json={"ok": True})
+
+    limits = RateLimits(backoff_base=0.001)
+    transport = RateLimitedTransport(httpx.MockTransport(handler), limits)
+    async with httpx.AsyncClient(transport=transport) as client:
+        resp = await client.post("https://api.openai.com/v1/embeddings", json={})
+
+    assert resp.json() == {"ok": True}
+    assert calls == 3
+    assert limits.limiters["embeddings"].active == 0
+
+
+@pytest.mark.asyncio
+async def test_transport_gives_up_after_max_retries() -> None:
+    transport = RateLimitedTransport(
+        httpx.MockTransport(lambda request: httpx.Response(503)),
+        RateLimits(max_retries=2, backoff_base=0.001),
+    )
+    async with httpx.AsyncClient(transport=transport) as client:
+        resp = await client.post("https://api.openai.com/v1/chat/completions")
+    assert resp.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_shared_transport_closes_once() -> None:
+    closes = 0
+
+    class Inner(httpx.MockTransport):
+        async def aclose(self) -> None:
+            nonlocal closes
+            closes += 1
+
+    transport = RateLimitedTransport(
+        Inner(lambda request: httpx.Response(200)), RateLimits()
+    )
+    for _ in range(2):
+        await httpx.AsyncClient(transport=transport).aclose()
+
+    assert closes == 1
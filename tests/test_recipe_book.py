@@ -1,12 +1,14 @@
 import io
+from typing import Any
 
+import numpy as np
 import pytest
 
-from domain.recipe_book import (
-    create_recipe_from_text_and_images,
-    parse_part_description,
-    parse_links,
-)
+from domain.events import RESET, Event
+from domain.fakes import FakeLLMService, InMemoryRecipeVectorRepository
+from domain.lexical import LexicalIndex
+from domain.models import GeneratedRecipe
+from domain.services import create_recipe, search_recipes
 
 
 def assert_recipe(recipe: str) -> None:
@@ -14,82 +16,102 @@ def assert_recipe(recipe: str) -> None:
     assert all(kword.lower() in recipe.lower() for kword in kwords)
 
 
+def test_fake_embeddings_are_deterministic() -> None:
+    a = FakeLLMService(seed=1).embed_text("Beef lasagne")
+    b = FakeLLMService(seed=1).embed_text("beef  LASAGNE")
+    other = FakeLLMService(seed=2).embed_text("Beef lasagne")
+
+    np.testing.assert_array_equal(a, b)
+    assert not np.array_equal(a, other)
+    assert float(np.linalg.norm(a)) == pytest.approx(1.0)
+
+
+@pytest.mark.asyncio
+async def test_fake_llm_never_goes_online() -> None:
+    llm = FakeLLMService()
+
+    with pytest.raises(RuntimeError):
+        await llm.web_client.get("https://example.com")
+
+
+@pytest.mark.parametrize("structured", (False, True))
 @pytest.mark.parametrize(
-    "description,expected",
+    "description",
     (
-        (
-            "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita",
-            ["https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita"],
-        ),
-        (
-            (
-                "Here is the link: "
-                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita"
-            ),
-            ["https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita"],
-        ),
-        (
-            (
-                "Here is the link: "
-                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita "
-                "There are so many links "
-                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita-again "
-            ),
-            [
-                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita",
-                "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita-again",
-            ],
-        ),
-        (
-            "Bread and butter pudding.",
-            [],
-        ),
+        "Bread and butter pudding.",
+        "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita",
+        "https://www.youtube.com/watch?v=dG6UZu85AcQ",
     ),
 )
 @pytest.mark.asyncio
-async def test_parse_links(description: str, expected: list[str]) -> None:
-    got = await parse_links(description)
-    assert got == expected
-
-
-@pytest.mark.asyncio
-async def test_parse_part_description() -> None:
-    given = (
-        "Please remove all the text from this description pertaining to links. "
-        "Respond only with the remaining text. "
-        "Text: Meaty lasagne, don't use the béchamel though "
-        "https://www.bbcgoodfood.com/recipes/lasagne"
+async def test_create_recipe(description: str, structured: bool) -> None:
+    repository = InMemoryRecipeVectorRepository()
+    recipe = await create_recipe(
+        description=description,
+        images=[],
+        repository=repository,
+        llm=FakeLLMService(),
+        structured=structured,
     )
-    exp = "Meaty lasagne, don't use the béchamel though"
-    got = await parse_part_description(given)
-    got = got[:-1] if got.endswith(".") else got
-    assert got.lower() == exp.lower()
+    assert_recipe(recipe.content)
+    assert recipe.rendered_html is not None
+    assert await repository.get(recipe.id) == recipe
 
 
-@pytest.mark.asyncio
-async def test_create_recipe_from_text_and_images() -> None:
-    description = "Bread and butter pudding."
-    got = await create_recipe_from_text_and_images(description, [])
-    assert_recipe(got)
+class UnparseableLLMService(FakeLLMService):
+    async def generate_structured_recipe(self, **kwargs: Any) -> GeneratedRecipe:
+        return GeneratedRecipe.model_validate({"name": "", "content": "Stew"})
 
 
 @pytest.mark.asyncio
-async def test_create_recipe_from_text_and_images_link() -> None:
-    description = "https://www.bbcgoodfood.com/recipes/vegan-pizza-margherita"
-    got = await create_recipe_from_text_and_images(description, [])
-    assert_recipe(got)
+async def test_structured_creation_falls_back_to_separate_calls() -> None:
+    events: list[Event] = []
+    recipe = await create_recipe(
+        description="Bread and butter pudding.",
+        images=[],
+        repository=InMemoryRecipeVectorRepository(),
+        llm=UnparseableLLMService(),
+        structured=True,
+        emit=events.append,
+    )
+    assert_recipe(recipe.content)
+    assert recipe.name == "Bread and butter pudding."
+    assert recipe.summary
+    assert any(event.kind == RESET for event in events)
 
 
 @pytest.mark.asyncio
-async def test_create_recipe_from_text_and_images_youtube() -> None:
-    description = "https://www.youtube.com/watch?v=dG6UZu85AcQ"
-    got = await create_recipe_from_text_and_images(description, [])
-    assert_recipe(got)
+async def test_create_recipe_from_image() -> None:
+    with open("tests/data/imgs/brownies.jpeg", "rb") as f:
+        bites = io.BytesIO(f.read())
+    recipe = await create_recipe(
+        description="",
+        images=[bites],  # pyright: ignore[reportArgumentType]
+        repository=InMemoryRecipeVectorRepository(),
+        llm=FakeLLMService(),
+    )
+    assert_recipe(recipe.content)
 
 
 @pytest.mark.asyncio
-async def test_create_recipe_from_text_and_images_image() -> None:
-    with open("tests/data/imgs/brownies.jpeg", "rb") as f:
-        bites = io.BytesIO(f.read())
-    got = await create_recipe_from_text_and_images("", [bites])
-    assert_recipe(got)
+async def test_search_finds_created_recipes() -> None:
+    repository = InMemoryRecipeVectorRepository()
+    llm = FakeLLMService()
+    lexical = LexicalIndex()
+    created = {}
+    for description in ("Beef lasagne", "Lemon tart", "Mushroom risotto"):
+        created[description] = await create_recipe(
+            description=description,
+            images=[],
+            repository=repository,
+            llm=llm,
+            lexical=lexical,
+        )
+
+    semantic = await search_recipes("lasagne", repository=repository, llm=llm, n=1)
+    hybrid = await search_recipes(
+        "mushroom", repository=repository, llm=llm, n=1, lexical=lexical
+    )
+
+    assert [r.id for r in semantic] == [created["Beef lasagne"].id]
+    assert [r.id for r in hybrid] == [created["Mushroom risotto"].id]
@@ -0,0 +1,13 @@
+from domain.rendering import MarkdownRenderer
+
+
+def test_renders_and_caches_by_content() -> None:
+    renderer = MarkdownRenderer(max_entries=1)
+
+    first = renderer.render("# Stew")
+    again = renderer.render("# Stew")
+    renderer.render("# Soup")
+    renderer.render("# Stew")
+
+    assert first == again == "<h1>Stew</h1>\n"
+    assert (renderer.hits, renderer.misses) == (1, 3)
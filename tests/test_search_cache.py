@@ -0,0 +1,78 @@
+from pathlib import Path
+
+import pytest
+
+from domain.search_cache import CachedSearch, SearchResultCache
+
+
+def result(*ids: str) -> CachedSearch:
+    return CachedSearch(ids=list(ids), fragment=",".join(ids))
+
+
+def test_hits_on_normalized_query_and_n() -> None:
+    cache = SearchResultCache()
+    cache.set("Winter  stew", 5, result("a"), version=cache.version)
+
+    assert cache.get("winter stew", 5) == result("a")
+    assert cache.get("winter stew", 3) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_invalidate_drops_entries_and_in_flight_results() -> None:
+    cache = SearchResultCache()
+    cache.set("stew", 5, result("a"), version=cache.version)
+    in_flight = cache.version
+
+    await cache.invalidate()
+    cache.set("stew", 5, result("a"), version=in_flight)
+
+    assert cache.get("stew", 5) is None
+
+
+def test_bounded_size_and_ttl() -> None:
+    cache = SearchResultCache(max_entries=1)
+    cache.set("a", 5, result("a"), version=0)
+    cache.set("b", 5, result("b"), version=0)
+    assert cache.get("a", 5) is None
+    assert cache.get("b", 5) == result("b")
+
+    expired = SearchResultCache(ttl=-1)
+    expired.set("a", 5, result("a"), version=0)
+    assert expired.get("a", 5) is None
+
+
+@pytest.mark.asyncio
+async def test_invalidation_is_shared_through_path(tmp_path: Path) -> None:
+    web = SearchResultCache(path=tmp_path / "search.db", poll_interval=0)
+    worker = SearchResultCache(path=tmp_path / "search.db")
+    await web.sync()
+    web.set("stew", 5, result("a"), version=web.version)
+    in_flight = web.version
+    assert web.get("stew", 5) == result("a")
+
+    await worker.invalidate()
+    await web.sync()
+    web.set("soup", 5, result("b"), version=in_flight)
+
+    assert web.get("stew", 5) is None
+    assert web.get("soup", 5) is None
+    web.close()
+    worker.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_version_is_polled_at_most_every_interval(
+    tmp_path: Path,
+) -> None:
+    web = SearchResultCache(path=tmp_path / "search.db", poll_interval=60)
+    worker = SearchResultCache(path=tmp_path / "search.db")
+    await web.sync()
+    web.set("stew", 5, result("a"), version=web.version)
+
+    await worker.invalidate()
+    await web.sync()
+
+    assert web.get("stew", 5) == result("a")
+    web.close()
+    worker.close()
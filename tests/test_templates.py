@@ -0,0 +1,119 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from starlette.testclient import TestClient
+
+from app.caching import CachedStaticFiles, conditional_html, etag
+from app.templates import FragmentCache, Templates
+
+
+@dataclass
+class Card:
+    id: str
+    name: str
+
+
+@pytest.fixture
+def templates(tmp_path: Path) -> Templates:
+    (tmp_path / "card.html").write_text("<p>{{ recipe.name }}</p>")
+    (tmp_path / "list.html").write_text("{% for card in cards %}{{ card }}{% endfor %}")
+    templates = Templates(tmp_path)
+    templates.precompile()
+    return templates
+
+
+@pytest.mark.asyncio
+async def test_fragments_are_cached_by_key(templates: Templates) -> None:
+    cards = [Card("1", "Pie & mash"), Card("2", "Stew")]
+    first = await templates.fragments_for("card.html", cards)
+    # A cached card is reused, whatever is passed to render it.
+    again = await templates.fragments_for("card.html", [Card("1", "Changed")])
+
+    assert first == ["<p>Pie &amp; mash</p>", "<p>Stew</p>"]
+    assert again == first[:1]
+    assert (templates.fragments.hits, templates.fragments.misses) == (1, 2)
+    # Cached fragments are not escaped again when included.
+    assert await templates.render("list.html", cards=first) == (
+        "<p>Pie &amp; mash</p><p>Stew</p>"
+    )
+
+
+@pytest.mark.asyncio
+async def test_template_changes_change_the_version(tmp_path: Path) -> None:
+    (tmp_path / "card.html").write_text("<p>{{ recipe.name }}</p>")
+    templates = Templates(tmp_path, auto_reload=True)
+    before = templates.version
+    await templates.fragment("card.html", "1", recipe=Card("1", "Stew"))
+
+    (tmp_path / "card.html").write_text("<h5>{{ recipe.name }}</h5>")
+
+    assert templates.version != before
+    assert await templates.fragment("card.html", "1", recipe=Card("1", "Stew")) == (
+        "<h5>Stew</h5>"
+    )
+
+
+def test_version_only_rereads_changed_templates(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / "card.html").write_text("<p>{{ recipe.name }}</p>")
+    templates = Templates(tmp_path, auto_reload=True)
+    reads = 0
+    get_source = templates.loader.get_source
+
+    def counting_get_source(*args: Any) -> Any:
+        nonlocal reads
+        reads += 1
+        return get_source(*args)
+
+    monkeypatch.setattr(templates.loader, "get_source", counting_get_source)
+    before = templates.version
+    assert templates.version == before
+    assert reads == 1
+
+    (tmp_path / "card.html").write_text("<h5>{{ recipe.name }}</h5>")
+    assert templates.version != before
+    assert reads == 2
+
+
+def test_fragment_cache_evicts_least_recently_used() -> None:
+    cache = FragmentCache(max_entries=2)
+    for key in "abc":
+        cache.set(key, key)  # pyright: ignore[reportArgumentType]
+    assert cache.get("a") is None
+    assert len(cache) == 2
+
+
+def test_conditional_responses(tmp_path: Path) -> None:
+    (tmp_path / "app.js").write_text("console.log(1)")
+    tag = etag("page", "v1")
+
+    async def page(request: Request) -> Response:
+        return conditional_html(request, "<p>Hi</p>", tag=tag)
+
+    app = Starlette(
+        routes=[
+            Route("/", page),
+            Mount("/assets", CachedStaticFiles(directory=tmp_path)),
+        ]
+    )
+    client = TestClient(app)
+
+    first = client.get("/")
+    assert first.headers["etag"] == tag
+    assert client.get("/", headers={"if-none-match": tag}).status_code == 304
+    assert client.get("/", headers={"if-none-match": '"stale"'}).status_code == 200
+
+    asset = client.get("/assets/app.js")
+    assert asset.headers["cache-control"] == "public, max-age=86400"
+    revalidated = client.get(
+        "/assets/app.js", headers={"if-none-match": asset.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.headers["cache-control"] == "public, max-age=86400"
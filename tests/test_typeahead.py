@@ -0,0 +1,58 @@
+from pathlib import Path
+
+from domain.lexical import LexicalIndex
+from domain.models import RecipeSummary
+from domain.typeahead import PrefixIndex, Suggestion
+
+
+def test_suggests_names_by_any_word_prefix() -> None:
+    index = PrefixIndex()
+    index.add_name("a", "Beef Lasagne")
+    index.add_name("b", "Lamb stew")
+
+    assert index.suggest("LA") == [
+        Suggestion("Lamb stew", "b"),
+        Suggestion("Beef Lasagne", "a"),
+    ]
+    assert index.suggest("stew") == [Suggestion("Lamb stew", "b")]
+    assert index.suggest("x") == []
+
+
+def test_popular_queries_rank_by_count() -> None:
+    index = PrefixIndex(min_query_count=2)
+    index.add_name("a", "Winter soup")
+    for query in ["winter stew"] * 3 + ["winter salad"]:
+        index.record_query(query)
+
+    assert index.suggest("wint") == [
+        Suggestion("winter stew"),
+        Suggestion("Winter soup", "a"),
+    ]
+
+
+def test_update_names_from_lexical_index() -> None:
+    lexical = LexicalIndex()
+    index = PrefixIndex()
+    lexical.add(RecipeSummary(id="a", name="Pho", summary=""))
+    index.update_names(lexical)
+    lexical.add(RecipeSummary(id="b", name="Paella", summary=""))
+    index.update_names(lexical)
+
+    assert [s.recipe_id for s in index.suggest("p")] == ["b", "a"]
+
+
+def test_update_names_reads_only_new_recipes(tmp_path: Path) -> None:
+    path = tmp_path / "lexical.db"
+    lexical = LexicalIndex(path)
+    index = PrefixIndex()
+    lexical.add(RecipeSummary(id="a", name="Pho", summary=""))
+    index.update_names(lexical)
+    # Another process, such as a standalone worker, stores a recipe.
+    LexicalIndex(path).add(RecipeSummary(id="b", name="Paella", summary=""))
+
+    assert lexical.summaries_after(1) == (
+        [RecipeSummary(id="b", name="Paella", summary="")],
+        2,
+    )
+    index.update_names(lexical)
+    assert [s.recipe_id for s in index.suggest("p")] == ["b", "a"]
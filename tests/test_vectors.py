@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from domain.local_repository import LocalRecipeVectorRepository
+from domain.models import Recipe
+from domain.vectors import Int8Codec, ProductQuantizer, normalize
+
+
+def normalized(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    data = np.random.default_rng(seed).standard_normal((n, dim), dtype=np.float32)
+    return normalize(data)
+
+
+def test_normalize_keeps_float32() -> None:
+    vectors = normalize(np.array([[3, 4], [0, 0]], dtype=np.float32))
+
+    assert vectors.dtype == np.float32
+    np.testing.assert_allclose(vectors, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_int8_scores_approximate_dot_products() -> None:
+    vectors = normalized(100, 64)
+    codec = Int8Codec()
+    codes, scales = codec.encode(vectors)
+
+    assert codes.dtype == np.int8
+    np.testing.assert_allclose(
+        codec.scores(codes, scales, vectors[0]), vectors @ vectors[0], atol=0.02
+    )
+
+
+def test_product_quantizer_ranks_self_first() -> None:
+    vectors = normalized(512, 32)
+    pq = ProductQuantizer(m=8, ksub=16)
+    assert pq.needs_training(512)
+    pq.train(vectors)
+    codes, scales = pq.encode(vectors)
+
+    assert codes.shape == (512, 8)
+    assert codes.dtype == np.uint8
+    assert int(np.argmax(pq.scores(codes, scales, vectors[5]))) == 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "codec", [Int8Codec(), ProductQuantizer(m=4, ksub=8, train_factor=4)]
+)
+async def test_repository_reranks_quantized_candidates(codec) -> None:
+    vectors = normalized(64, 16)
+    repo = LocalRecipeVectorRepository(dim=16, codec=codec, rerank_factor=2)
+    for i, vector in enumerate(vectors):
+        recipe = Recipe(id=str(i), name="", summary="", content="")
+        await repo.add(recipe=recipe, vector=vector)
+
+    assert codec.trained
+    got = [int(r.id) for r in await repo.search(vectors[9], n=3)]
+    exact = vectors[got] @ vectors[9]
+    assert got[0] == 9
+    assert exact.tolist() == sorted(exact.tolist(), reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_repository_trains_codec_outside_the_lock(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    vectors = normalized(34, 16)
+    codec = ProductQuantizer(m=4, ksub=8, train_factor=4)
+    repo = LocalRecipeVectorRepository(dim=16, codec=codec)
+    for i, vector in enumerate(vectors[:31]):
+        recipe = Recipe(id=str(i), name="", summary="", content="")
+        await repo.add(recipe=recipe, vector=vector)
+    fit = codec.fit
+
+    def fit_while_adding(snapshot: np.ndarray) -> np.ndarray:
+        # Would deadlock if training held the repository lock.
+        for i in (32, 33):
+            repo._add(Recipe(id=str(i), name="", summary="", content=""), vectors[i])
+        return fit(snapshot)
+
+    monkeypatch.setattr(codec, "fit", fit_while_adding)
+    await repo.add(
+        recipe=Recipe(id="31", name="", summary="", content=""), vector=vectors[31]
+    )
+
+    assert codec.trained
+    got = await repo.search(vectors[33], n=1)
+    assert [r.id for r in got] == ["33"]